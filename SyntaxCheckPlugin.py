@@ -3,13 +3,15 @@ import sublime_plugin
 import os
 import time
 from .rust import (messages, rust_proc, rust_thread, util, target_detect,
-                   cargo_settings, semver, log)
+                   cargo_settings, semver, log, ingest, build_progress,
+                   dep_graph, shadow, check_target)
 
 
 """On-save syntax checking.
 
 This contains the code for displaying message phantoms for errors/warnings
-whenever you save a Rust file.
+whenever you save a Rust file, or (with `rust_check_as_you_type`) shortly
+after you stop typing.
 """
 
 
@@ -40,10 +42,56 @@ class RustSyntaxCheckEvent(sublime_plugin.EventListener):
         t.start()
 
 
+class RustCheckAsYouTypeEvent(sublime_plugin.EventListener):
+
+    """Checks unsaved buffers once typing pauses (see `shadow`)."""
+
+    # Set of buffer IDs that were checked with unsaved changes since they
+    # were last saved.
+    shadowed = set()
+
+    def on_modified_async(self, view):
+        if not util.get_setting('rust_syntax_checking', True) or \
+                not util.get_setting('rust_check_as_you_type', False):
+            return
+        if not view.file_name() or not util.active_view_is_rust(view=view):
+            return
+        change_count = view.change_count()
+        delay = util.get_setting('rust_check_as_you_type_delay', 1000)
+        sublime.set_timeout_async(
+            lambda: self._check(view, change_count), delay)
+
+    def on_post_save(self, view):
+        # The on-save check replaces the messages.
+        self.shadowed.discard(view.buffer_id())
+
+    def _check(self, view, change_count):
+        # Only the last modification within the delay starts a check.
+        if view.change_count() != change_count or view.window() is None:
+            return
+        if view.is_dirty():
+            self.shadowed.add(view.buffer_id())
+        elif view.buffer_id() in self.shadowed:
+            # Undone back to the saved text, the messages of the unsaved
+            # text are stale.  Check the files on disk unless other buffers
+            # are still modified.
+            self.shadowed.discard(view.buffer_id())
+            if not shadow.modified_buffers(view.window()):
+                messages.erase_status(view)
+                RustSyntaxCheckThread(view).start()
+                return
+        else:
+            return
+        messages.erase_status(view)
+        t = RustSyntaxCheckThread(view, shadow=True)
+        t.start()
+
+
 class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
 
     # Thread name.
     name = 'Syntax Check'
+    job_class = 'check'
     # The Sublime view that triggered the check.
     view = None
     # The Sublime window that triggered the check.
@@ -54,6 +102,8 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
     cwd = None
     # Base path for relative paths in messages.
     msg_rel_path = None
+    # Version of rustc used for the check.
+    rustc_version = None
     # This flag is used to terminate early. In situations where we can't
     # auto-detect the appropriate Cargo target, we compile multiple targets.
     # If we receive any messages for the current view, we might as well stop.
@@ -62,12 +112,30 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
     # The path to the top-level Cargo target filename (like main.rs or
     # lib.rs).
     current_target_src = None
+    # The message partition `(package, target, profile)` of the target
+    # currently being checked.  Only messages for this partition are
+    # replaced, messages from other targets are left intact.  See
+    # `messages.begin_partition`.
+    current_partition = None
+    # `ingest.MessageIngester` for the target currently being checked.
+    ingester = None
+    # `build_progress.BuildProgress` of the current check, or None.
+    progress = None
+    # If True, check the unsaved buffers in a mirror of the workspace.
+    shadow = False
+    # `shadow.ShadowTree` the check is run in, or None.
+    shadow_tree = None
+    # `CARGO_TARGET_DIR` of the check, or None to use Cargo's default (see
+    # `check_target`).
+    target_dir = None
     done = False
 
-    def __init__(self, view):
+    def __init__(self, view, shadow=False):
         self.view = view
         self.window = view.window()
-        super(RustSyntaxCheckThread, self).__init__(view.window())
+        self.shadow = shadow
+        super(RustSyntaxCheckThread, self).__init__(view.window(),
+                                                    view.file_name())
 
     def run(self):
         self.triggered_file_name = os.path.abspath(self.view.file_name())
@@ -80,12 +148,27 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
                 A Cargo.toml manifest is required.
             """), self.triggered_file_name)
             return
+        workspace = util.find_workspace_root(self.cwd) or self.cwd
+        if self.shadow:
+            self.shadow_tree = shadow.sync_for_check(self.window, self.cwd)
+            if self.shadow_tree is None:
+                return
+            self.target_dir = self.shadow_tree.target_dir
+        elif check_target.enabled():
+            self.target_dir = check_target.target_dir(workspace)
 
         self.update_status()
         self.this_view_found = False
         CHECK_FAIL_MSG = 'Rust check failed, see console or debug log.'
+        if self.target_dir:
+            check_target.acquire(self.target_dir, workspace)
         try:
-            messages.clear_messages(self.window)
+            # Messages from a regular build are not associated with any
+            # partition, and would be stale after this check (unless the
+            # build is still running).
+            if not any(t.job_class == 'build'
+                       for t in rust_thread.window_threads(self.window)):
+                messages.clear_messages(self.window, partitions=[None])
             try:
                 rc = self.get_rustc_messages()
             except rust_proc.ProcessTerminatedError:
@@ -96,6 +179,8 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
                 raise
         finally:
             self.done = True
+            if self.target_dir:
+                check_target.release(self.window, self.target_dir)
         messages.messages_finished(self.window)
         counts = messages.message_counts(self.window)
         if counts:
@@ -124,7 +209,10 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
                 num = -1
             num += 1
 
-            self.window.status_message(status_msg + status_chars[num])
+            status = status_msg + status_chars[num]
+            if self.progress and self.progress.done:
+                status += ' ' + self.progress.text()
+            self.window.status_message(status)
             sublime.set_timeout(lambda: self.update_status(count + 1), status_update_delay)
         except Exception as e:
             self.window.status_message('Error setting status text!')
@@ -165,24 +253,85 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
             return -1
         rc = 0
         for (target_src, target_args) in targets:
-            cmd = settings.get_command(method, command_info, self.cwd, self.cwd,
-                initial_settings={'target': ' '.join(target_args)},
-                force_json=True, metadata=metadata)
-            self.msg_rel_path = cmd['msg_rel_path']
-            if (util.get_setting('rust_syntax_checking_include_tests', True) and
-                semver.match(cmd['rustc_version'], '>=1.23.0')):
-                # Including the test harness has a few drawbacks.
-                # missing_docs lint is disabled (see
-                # https://github.com/rust-lang/sublime-rust/issues/156)
-                # It also disables the "main function not found" error for
-                # binaries.
-                cmd['command'].append('--profile=test')
-            p = rust_proc.RustProc()
-            self.current_target_src = target_src
-            p.run(self.window, cmd['command'], self.cwd, self, env=cmd['env'])
-            rc = p.wait()
+            rc = self._check_target(settings, method, command_info, self.cwd,
+                                    target_src, target_args, metadata)
+            self.this_view_found = messages.has_message_for_path(
+                self.window, self.triggered_file_name,
+                partitions=[self.current_partition])
             if self.this_view_found:
-                return rc
+                break
+        if rc == 0 and util.get_setting('rust_syntax_checking_dependents', False):
+            rc = self._check_dependents(settings, method, command_info,
+                                        toolchain, metadata)
+        return rc
+
+    def _check_target(self, settings, method, command_info, cwd, target_src,
+                      target_args, metadata):
+        """Run the check of one target.
+
+        :returns: Returns the process return code.
+        """
+        cmd = settings.get_command(method, command_info, cwd, cwd,
+            initial_settings={'target': ' '.join(target_args)},
+            force_json=True, metadata=metadata)
+        self.msg_rel_path = cmd['msg_rel_path']
+        self.rustc_version = cmd['rustc_version']
+        profile = 'dev'
+        if (util.get_setting('rust_syntax_checking_include_tests', True) and
+            semver.match(cmd['rustc_version'], '>=1.23.0')):
+            # Including the test harness has a few drawbacks.
+            # missing_docs lint is disabled (see
+            # https://github.com/rust-lang/sublime-rust/issues/156)
+            # It also disables the "main function not found" error for
+            # binaries.
+            cmd['command'].append('--profile=test')
+            profile = 'test'
+        p = rust_proc.RustProc()
+        self.current_target_src = target_src
+        self.current_partition = (cwd, ' '.join(target_args), profile)
+        # Existing messages for this target are only removed once the
+        # check is done, so that unchanged messages are not redrawn.
+        messages.begin_partition(self.window, self.current_partition)
+        self.ingester = ingest.MessageIngester(self.window,
+            self.msg_rel_path, target_src, self.current_partition)
+        env = cmd['env']
+        if self.shadow_tree:
+            # The partition and message paths use the real workspace, so
+            # that results replace those of the on-save check.
+            cwd = self.shadow_tree.shadow_path(cwd)
+        if self.target_dir:
+            env = dict(env or {}, CARGO_TARGET_DIR=self.target_dir)
+        try:
+            p.run(self.window, cmd['command'], cwd, self, env=env)
+            return p.wait()
+        finally:
+            self.ingester.finish()
+            messages.end_partition(self.window, self.current_partition)
+
+    def _check_dependents(self, settings, method, command_info, toolchain,
+                          metadata):
+        """Check the workspace packages that depend on the package of the
+        saved file and have a file open in the window.
+
+        :returns: Returns the return code of the last failed check, or 0.
+        """
+        graph = dep_graph.get_graph(self.window, self.cwd, toolchain,
+                                    self.rustc_version)
+        if graph is None:
+            return 0
+        dependents = dep_graph.open_dependents(self.window, graph,
+                                               self.triggered_file_name)
+        td = target_detect.TargetDetector(self.window)
+        rc = 0
+        for package_dir, file_name in dependents:
+            log.log(self.window, 'Checking dependent package %s', package_dir,
+                    category='check')
+            targets = td.determine_targets(file_name, metadata=metadata)
+            for (target_src, target_args) in targets:
+                target_rc = self._check_target(settings, method, command_info,
+                    package_dir, target_src, target_args, metadata)
+                if target_rc:
+                    rc = target_rc
         return rc
 
     #########################################################################
@@ -190,23 +339,28 @@ class RustSyntaxCheckThread(rust_thread.RustThread, rust_proc.ProcListener):
     #########################################################################
 
     def on_begin(self, proc):
-        pass
+        if util.get_setting('rust_build_progress', True):
+            # Compile times of builds do not apply to checks.
+            self.progress = build_progress.BuildProgress.for_workspace(
+                proc.cwd, eta=False)
 
     def on_data(self, proc, data):
-        log.log(self.window, data)
+        log.log(self.window, data, category='cargo')
 
     def on_error(self, proc, message):
         log.critical(self.window, 'Rust Error: %s', message)
 
     def on_json(self, proc, obj):
-        messages.add_rust_messages(self.window, self.msg_rel_path, obj,
-                                   self.current_target_src, msg_cb=None)
-        if messages.has_message_for_path(self.window,
-                                         self.triggered_file_name):
-            self.this_view_found = True
+        # Path resolution and such is done on a separate thread so that the
+        # output of the process is read as fast as possible.
+        if self.shadow_tree:
+            self.shadow_tree.unshadow(obj)
+        self.ingester.add(obj)
+        if self.progress:
+            self.progress.on_json(obj)
 
     def on_finished(self, proc, rc):
-        log.log(self.window, 'On-save check finished.')
+        log.log(self.window, 'On-save check finished.', category='check')
 
     def on_terminated(self, proc):
-        log.log(self.window, 'Process Interrupted')
+        log.log(self.window, 'Process Interrupted', category='check')
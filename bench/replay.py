@@ -0,0 +1,286 @@
+"""Offline benchmark of the diagnostics pipeline.
+
+Replays recorded `cargo check --message-format=json` output through the
+same code used during a build (`RustProc`'s stdout reader, the output panel
+listener, `add_rust_messages`, `_save_batches`, sorting) and then renders the
+messages into views (phantoms, region highlights, and hover popups).  This
+runs outside of Sublime using the stand-in `sublime` module in
+`tests/headless`, so it does not need Cargo or an editor.
+
+Usage:
+
+    python bench/replay.py record           # Re-record bench/streams/
+    python bench/replay.py run              # Run all streams
+    python bench/replay.py run --synthetic 5000 --repeat 10 error-tests
+
+The report lists, for each stream, the median time of each stage, the
+throughput of the replay stage, and the peak memory allocated by Python
+during a replay.  The per-operation timings of the plugin (see
+`rust/profile.py`) are printed at the end.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[0:0] = [os.path.join(ROOT, 'tests', 'headless'), ROOT]
+
+import sublime  # noqa: E402
+import cargo_replay  # noqa: E402
+from rust import messages, opanel, profile  # noqa: E402
+
+STREAMS_DIR = os.path.join(HERE, 'streams')
+# Fixtures recorded by `record`.
+FIXTURES = ('error-tests', 'multi-targets', 'workspace')
+# Replaces the fixture directory in recorded streams so that they can be
+# replayed from any checkout.
+PLACEHOLDER = '$ROOT$'
+RUSTC_VERSION = '1.90.0'
+
+
+def record(fixtures, cargo='cargo'):
+    """Run Cargo on the fixtures and save the JSON output."""
+    os.makedirs(STREAMS_DIR, exist_ok=True)
+    for name in fixtures:
+        cwd = os.path.join(ROOT, 'tests', name)
+        cmd = [cargo, 'check', '--message-format=json', '--all-targets',
+               '--workspace', '--keep-going']
+        target_dir = tempfile.mkdtemp(prefix='replay-target-')
+        try:
+            env = dict(os.environ, CARGO_TARGET_DIR=target_dir)
+            p = subprocess.Popen(cmd, cwd=cwd, env=env,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL)
+            output = p.communicate()[0].decode('utf-8')
+        finally:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        # JSON escapes backslashes in Windows paths.
+        escaped_cwd = json.dumps(cwd)[1:-1]
+        lines = [line.replace(escaped_cwd, PLACEHOLDER)
+                 for line in output.splitlines() if line.startswith('{')]
+        path = os.path.join(STREAMS_DIR, name + '.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        print('Recorded %i messages to %s' % (len(lines), path))
+
+
+def load_stream(name):
+    """Returns `(cwd, lines)` for a recorded stream."""
+    cwd = os.path.join(ROOT, 'tests', name)
+    escaped_cwd = json.dumps(cwd)[1:-1]
+    with open(os.path.join(STREAMS_DIR, name + '.jsonl'),
+              encoding='utf-8') as f:
+        lines = [line.replace(PLACEHOLDER, escaped_cwd)
+                 for line in f.read().splitlines() if line]
+    return cwd, lines
+
+
+def synthetic_stream(tmp, count, files=50, lines_per_file=400):
+    """Create a crate with `files` source files and a stream of `count`
+    diagnostics spread across them.
+
+    :returns: `(cwd, lines)`
+    """
+    src = os.path.join(tmp, 'src')
+    os.makedirs(src)
+    source_line = '    let value: u32 = compute_something(argument, other);\n'
+    for i in range(files):
+        with open(os.path.join(src, 'f%i.rs' % (i,)), 'w') as f:
+            f.write('fn f%i() {\n' % (i,))
+            f.write(source_line * lines_per_file)
+            f.write('}\n')
+    target = {'kind': ['lib'], 'name': 'synthetic',
+              'src_path': os.path.join(src, 'lib.rs')}
+    result = []
+    for n in range(count):
+        file_name = 'src/f%i.rs' % (n % files,)
+        line = (n // files) % lines_per_file + 2
+        level = 'error' if n % 3 == 0 else 'warning'
+
+        def span(label, start, end, primary=True):
+            return {
+                'file_name': file_name,
+                'byte_start': 0, 'byte_end': 0,
+                'line_start': line, 'line_end': line,
+                'column_start': start, 'column_end': end,
+                'is_primary': primary,
+                'text': [{'text': source_line.rstrip(),
+                          'highlight_start': start, 'highlight_end': end}],
+                'label': label,
+                'suggested_replacement': None,
+                'suggestion_applicability': None,
+                'expansion': None,
+            }
+
+        message = {
+            'message': 'mismatched types in synthetic diagnostic %i' % (n,),
+            'code': {'code': 'E0308', 'explanation': 'Explanation.'},
+            'level': level,
+            'spans': [span('expected `u32`, found `i64`', 20, 51),
+                      span('expected due to this', 16, 19, primary=False)],
+            'children': [{
+                'message': 'you can convert an `i64` to a `u32`',
+                'code': None, 'level': 'help',
+                'spans': [dict(span(None, 20, 51),
+                               suggested_replacement='x.try_into().unwrap()',
+                               suggestion_applicability='MachineApplicable')],
+                'children': [], 'rendered': None,
+            }],
+            'rendered': '%s[E0308]: mismatched types\n' % (level,),
+        }
+        result.append(json.dumps({
+            'reason': 'compiler-message',
+            'package_id': 'synthetic 0.1.0 (path+file://%s)' % (tmp,),
+            'target': target,
+            'message': message,
+        }))
+    return tmp, result
+
+
+def replay(window, cwd, lines):
+    """Feed the lines through a `RustProc` with the output panel listener,
+    as `CargoExecThread` does."""
+    listener = opanel.OutputListener(window, cwd, 'check', RUSTC_VERSION)
+    cargo_replay.replay(window, cwd, lines, listener)
+
+
+def render(window):
+    """Open every file with messages, draw them, and show the hover popup
+    of each message.
+
+    :returns: Number of batches rendered.
+    """
+    winfo = messages.WINDOW_MESSAGES.get(window.id(), {'paths': {}})
+    count = 0
+    for path, batches in list(winfo['paths'].items()):
+        if not os.path.exists(path):
+            continue
+        view = window.open_file(path)
+        messages.show_messages_for_view(view)
+        for batch in batches:
+            region = batch.first().sublime_region(view)
+            messages.message_popup(view, region.begin(), sublime.HOVER_TEXT)
+            count += 1
+    return count
+
+
+def run_once(cwd, lines):
+    """Run all stages once in a new window.
+
+    :returns: Dictionary of stage name to seconds, and the number of
+        batches rendered.
+    """
+    messages.clear_all_messages()
+    window = sublime.new_window([cwd])
+    try:
+        times = {}
+        start = time.perf_counter()
+        replay(window, cwd, lines)
+        times['replay'] = time.perf_counter() - start
+        start = time.perf_counter()
+        messages.messages_finished(window)
+        times['sort'] = time.perf_counter() - start
+        start = time.perf_counter()
+        rendered = render(window)
+        times['render'] = time.perf_counter() - start
+        sublime.run_timeouts()
+        return times, rendered
+    finally:
+        messages.clear_all_messages()
+        sublime.close_window(window)
+
+
+def peak_memory(cwd, lines):
+    """Returns the peak bytes allocated by Python during a run."""
+    tracemalloc.start()
+    try:
+        run_once(cwd, lines)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+def bench(name, cwd, lines, repeat):
+    diagnostics = sum(1 for line in lines if '"compiler-message"' in line)
+    # Warm up caches (such as settings and regular expressions).
+    run_once(cwd, lines)
+    profile.reset()
+    profile.ENABLED = True
+    runs = []
+    try:
+        for _ in range(repeat):
+            runs.append(run_once(cwd, lines))
+    finally:
+        profile.ENABLED = False
+    stages = {stage: median([times[stage] for times, _ in runs])
+              for stage in runs[0][0]}
+    peak = peak_memory(cwd, lines)
+    print('%s: %i lines, %i diagnostics, %i batches rendered' % (
+        name, len(lines), diagnostics, runs[0][1]))
+    for stage in ('replay', 'sort', 'render'):
+        print('  %-8s %9.2f ms' % (stage, stages[stage] * 1000))
+    replay_time = stages['replay'] or 1e-9
+    print('  throughput: %.0f lines/s, %.0f diagnostics/s' % (
+        len(lines) / replay_time, diagnostics / replay_time))
+    print('  peak memory: %.1f MiB' % (peak / 1024 / 1024,))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    sub = parser.add_subparsers(dest='action')
+    rec = sub.add_parser('record', help='record streams with Cargo')
+    rec.add_argument('fixtures', nargs='*', default=FIXTURES)
+    rec.add_argument('--cargo', default='cargo')
+    run = sub.add_parser('run', help='replay streams')
+    run.add_argument('streams', nargs='*',
+                     help='recorded streams to run (default all)')
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--synthetic', type=int, default=0, metavar='N',
+                     help='also run a synthetic stream of N diagnostics')
+    args = parser.parse_args()
+
+    if args.action == 'record':
+        record(args.fixtures, args.cargo)
+        return
+    if args.action != 'run':
+        parser.print_help()
+        return
+    names = args.streams
+    if not names:
+        names = sorted(os.path.splitext(n)[0]
+                       for n in os.listdir(STREAMS_DIR)
+                       if n.endswith('.jsonl'))
+    for name in names:
+        cwd, lines = load_stream(name)
+        bench(name, cwd, lines, args.repeat)
+    if args.synthetic:
+        tmp = tempfile.mkdtemp(prefix='replay-synthetic-')
+        try:
+            cwd, lines = synthetic_stream(os.path.realpath(tmp),
+                                          args.synthetic)
+            bench('synthetic', cwd, lines, args.repeat)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    print('Plugin operations (all streams):')
+    print(profile.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,19 @@
 """Sublime commands for the cargo build system."""
 
+import bisect
 import functools
+import os
+import shlex
 import sublime
 import sublime_plugin
 import sys
 from .rust import (rust_proc, rust_thread, opanel, util, messages,
-                   cargo_settings, target_detect)
+                   cargo_settings, target_detect, toolchains, libtest,
+                   test_history, build_timing, build_history, profile,
+                   semver)
 from .rust.cargo_config import *
-from .rust.log import (log, clear_log, RustOpenLog, RustLogEvent)
+from .rust.log import (log, clear_log, RustOpenLog, RustFilterLog,
+                       RustExportLog, RustLogEvent)
 
 # Maps command to an input string. Used to pre-populate the input panel with
 # the last entered value.
@@ -179,11 +185,15 @@ class CargoExecThread(rust_thread.RustThread):
 
     silently_interruptible = False
     name = 'Cargo Exec'
+    job_class = 'build'
+    # All builds of a window write to the same output panel and messages.
+    per_workspace = False
 
     def __init__(self, window, settings,
                  command_name, command_info,
                  initial_settings, settings_path, working_dir):
-        super(CargoExecThread, self).__init__(window)
+        super(CargoExecThread, self).__init__(window,
+                                              working_dir or settings_path)
         self.settings = settings
         self.command_name = command_name
         self.command_info = command_info
@@ -199,13 +209,19 @@ class CargoExecThread(rust_thread.RustThread):
                                         self.initial_settings)
         if not cmd:
             return
-        messages.clear_messages(self.window)
+        messages.clear_messages(self.window, keep_pending=True)
         p = rust_proc.RustProc()
-        listener = opanel.OutputListener(self.window, cmd['msg_rel_path'],
-                                         self.command_name,
-                                         cmd['rustc_version'])
         decode_json = util.get_setting('show_errors_inline', True) and \
             self.command_info.get('allows_json', False)
+        test_json = decode_json and \
+            self.command_info.get('command') == 'test' and \
+            libtest.json_available(cmd['rustc_version'])
+        if test_json:
+            libtest.add_json_args(cmd['command'])
+        listener = opanel.OutputListener(self.window, cmd['msg_rel_path'],
+                                         self.command_name,
+                                         cmd['rustc_version'],
+                                         test_json=test_json)
         try:
             p.run(self.window, cmd['command'],
                   self.working_dir, listener,
@@ -215,6 +231,10 @@ class CargoExecThread(rust_thread.RustThread):
             p.wait()
         except rust_proc.ProcessTerminatedError:
             return
+        if listener.test_run:
+            libtest.record_failures(self.window,
+                                    self.working_dir or self.settings_path,
+                                    listener.test_run)
 
 
 # This is used by the test code.  Due to the async nature of the on_load event,
@@ -267,17 +287,50 @@ class RustPrevMessageCommand(NextPrevBase):
 class RustCancelCommand(sublime_plugin.WindowCommand):
 
     def run(self):
-        try:
-            t = rust_thread.THREADS[self.window.id()]
-        except KeyError:
-            pass
-        else:
+        for t in rust_thread.window_threads(self.window):
             t.terminate()
         # Also call Sublime's cancel command, in case the user is using a
         # normal Sublime build.
         self.window.run_command('cancel_build')
 
 
+class RustListJobsCommand(sublime_plugin.WindowCommand):
+
+    """Shows a quick panel with the running and queued Rust jobs, allowing
+    the user to stop one."""
+
+    def run(self):
+        threads = rust_thread.window_threads(self.window)
+        if not threads:
+            sublime.status_message('No Rust jobs running.')
+            return
+        threads.sort(key=lambda t: (not t.running,
+                                    rust_thread.JOB_CLASSES[t.job_class]))
+        items = []
+        for t in threads:
+            items.append([t.describe(),
+                          '%s (%s): %s' % (
+                              'Running' if t.running else 'Queued',
+                              t.job_class,
+                              t.workspace or t.path or '<unknown workspace>')])
+
+        def on_done(idx):
+            if idx == -1:
+                return
+            t = threads[idx]
+            if not t.is_alive():
+                return
+            msg = """
+                Rust Jobs
+
+                Do you want to stop this job?
+                %s""" % (t.describe(),)
+            if sublime.ok_cancel_dialog(util.multiline_fix(msg), 'Stop Job'):
+                t.terminate()
+
+        self.window.show_quick_panel(items, on_done)
+
+
 class RustDismissMessagesCommand(sublime_plugin.WindowCommand):
 
     """Removes all inline messages."""
@@ -294,6 +347,253 @@ class RustListMessagesCommand(sublime_plugin.WindowCommand):
         messages.list_messages(self.window)
 
 
+class RustShowBuildTimingsCommand(sublime_plugin.WindowCommand):
+
+    """Shows how long each crate took to compile in the last build."""
+
+    def run(self):
+        workspaces = util.in_window_folders(self.window,
+                                            build_timing.workspaces())
+        if not workspaces:
+            sublime.message_dialog(util.multiline_fix("""
+                No build timings are available.
+
+                Timings are recorded when building with the "show_errors_inline" setting enabled."""))
+            return
+
+        def show(idx):
+            if idx == -1:
+                return
+            timings = build_timing.last_timings(workspaces[idx])
+            build_timing.show_report(self.window, timings)
+
+        if len(workspaces) == 1:
+            show(0)
+        else:
+            self.window.show_quick_panel(workspaces, show)
+
+
+class RustBuildHistoryCommand(sublime_plugin.WindowCommand):
+
+    """Shows the trend of build times for each command run in the window's
+    folders, flagging builds that were slower than usual."""
+
+    def run(self):
+        entries = build_history.load()
+        workspaces = util.in_window_folders(
+            self.window, set(e['workspace'] for e in entries))
+        entries = [e for e in entries if e['workspace'] in workspaces]
+        if not entries:
+            sublime.message_dialog('No builds have been recorded for this window.')
+            return
+        view = self.window.new_file()
+        view.set_scratch(True)
+        view.set_name('Rust Build History')
+        view.settings().set('word_wrap', False)
+        view.run_command('append', {
+            'characters': build_history.render(build_history.analyze(entries))
+        })
+        view.set_read_only(True)
+
+
+class RustProfileReportCommand(sublime_plugin.WindowCommand):
+
+    """Writes the timings collected with the `rust_profile` setting to the
+    debug log, and opens the log."""
+
+    def run(self, reset=False):
+        if reset:
+            profile.reset()
+            return
+        if not profile.STATS:
+            sublime.message_dialog(util.multiline_fix("""
+                No timings have been collected.
+
+                Set "rust_profile" to true in the Rust Enhanced settings to collect timings."""))
+            return
+        log(self.window, 'Rust Enhanced profile:\n%s', profile.report(),
+            category='profile')
+        self.window.run_command('rust_open_log')
+
+
+class RustSlowestTestsCommand(sublime_plugin.WindowCommand):
+
+    """Shows a quick panel of the slowest tests, and tests that got slower
+    since the previous run (requires the `rust_test_json` setting)."""
+
+    def run(self):
+        workspaces = util.in_window_folders(self.window,
+                                            test_history.workspaces())
+        timings = test_history.timings(workspaces)
+        if not timings:
+            sublime.message_dialog(util.multiline_fix("""
+                No test timings are available.
+
+                Test durations are recorded when running tests with the "rust_test_json" setting enabled (requires a nightly toolchain)."""))
+            return
+        items = []
+        for t in timings:
+            detail = '%.3fs' % (t.latest,)
+            if t.previous is not None:
+                detail += ' (previous %.3fs, %+.0f%%)' % (
+                    t.previous,
+                    (t.latest - t.previous) / t.previous * 100
+                    if t.previous else 0)
+            if t.regressed:
+                detail = 'SLOWER: ' + detail
+            items.append([t.name, '%s  %s' % (detail, t.binary)])
+
+        def on_done(idx):
+            if idx == -1:
+                return
+            timing = timings[idx]
+            working_dir, target = _timing_to_target(self.window, timing)
+            settings = {
+                'working_dir': working_dir,
+                'extra_run_args': '--exact ' + shlex.quote(timing.name),
+            }
+            if target:
+                settings['target'] = ' '.join(target)
+            self.window.run_command('cargo_exec', args={
+                'command': 'test',
+                'settings': settings,
+            })
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class CargoTestFailedCommand(sublime_plugin.WindowCommand):
+
+    """Runs the tests that failed in the last `cargo test` in this window.
+
+    All of the failed tests are run with a single Cargo invocation, limited
+    to the targets that had failures when they can be determined."""
+
+    def run(self):
+        last = libtest.last_failures(self.window)
+        if not last or not last[1]:
+            sublime.message_dialog(util.multiline_fix("""
+                There are no failed tests to run.
+
+                Failures are recorded when running tests with Cargo."""))
+            return
+        working_dir, failures = last
+        names = []
+        for result in failures:
+            if result.name not in names:
+                names.append(result.name)
+        extra_run_args = _exact_test_args(self.window, working_dir, names)
+        if extra_run_args is None:
+            return
+        settings = {
+            'working_dir': working_dir,
+            'extra_run_args': extra_run_args,
+        }
+        targets = _failures_to_targets(self.window, working_dir, failures)
+        if targets:
+            settings['target'] = ' '.join(targets)
+        self.window.run_command('cargo_exec', args={
+            'command': 'test',
+            'settings': settings,
+        })
+
+    def is_enabled(self):
+        last = libtest.last_failures(self.window)
+        return bool(last and last[1])
+
+
+def _failures_to_targets(window, working_dir, failures):
+    """Determine the Cargo target arguments for the given failed tests.
+
+    :returns: List of arguments (such as `['--lib', '--test', 'foo']`), or
+        None if the target of any of the tests is not known (in which case
+        all targets should be run).
+    """
+    if any(not result.doc and not result.source for result in failures):
+        return None
+    metadata = util.get_cargo_metadata(window, working_dir)
+    if not metadata:
+        return None
+    td = target_detect.TargetDetector(window)
+    src_to_args = {}
+    for package in metadata['packages']:
+        package_dir = os.path.dirname(package['manifest_path'])
+        for target in package['targets']:
+            src_path = os.path.join(package_dir, target['src_path'])
+            try:
+                args = td._target_to_args(target)
+            except ValueError:
+                continue
+            if args:
+                src_to_args[os.path.normpath(src_path)] = args[1]
+    # Cargo displays the path relative to either the package or the
+    # workspace.
+    bases = [working_dir, metadata['workspace_root']] + \
+        [os.path.dirname(p['manifest_path']) for p in metadata['packages']]
+    targets = []
+    for result in failures:
+        if result.doc:
+            args = ['--doc']
+        else:
+            for base in bases:
+                path = os.path.normpath(os.path.join(base, result.source))
+                if path in src_to_args:
+                    args = src_to_args[path]
+                    break
+            else:
+                return None
+        if args not in targets:
+            targets.append(args)
+    if ['--doc'] in targets and len(targets) > 1:
+        # Cargo does not allow mixing --doc with other targets.
+        return None
+    return [arg for args in targets for arg in args]
+
+
+def _timing_to_target(window, timing):
+    """Determine where to run a test from the test history.
+
+    The target is found from the source file Cargo displayed when running
+    the test binary, or from the name of the binary for older versions of
+    Cargo.
+
+    :param timing: The `test_history.TestTiming`.
+    :returns: `(working_dir, target_args)`, where `target_args` is None if
+        the target is not known (in which case all targets of the workspace
+        should be run).
+    """
+    if timing.doc:
+        return timing.workspace, ['--doc']
+    metadata = util.get_cargo_metadata(window, timing.workspace)
+    if not metadata:
+        return timing.workspace, None
+    td = target_detect.TargetDetector(window)
+    matches = []
+    for package in metadata['packages']:
+        package_dir = os.path.dirname(package['manifest_path'])
+        for target in package['targets']:
+            if timing.source:
+                src_path = os.path.normpath(
+                    os.path.join(package_dir, target['src_path']))
+                found = any(
+                    os.path.normpath(os.path.join(base, timing.source)) ==
+                    src_path for base in (timing.workspace, package_dir))
+            else:
+                found = timing.binary in (target['name'],
+                                          target['name'].replace('-', '_'))
+            if not found:
+                continue
+            try:
+                args = td._target_to_args(target)
+            except ValueError:
+                continue
+            if args:
+                matches.append((package_dir, args[1]))
+    if len(matches) == 1:
+        return matches[0]
+    return timing.workspace, None
+
+
 # Patterns used to help find test function names.
 # This is far from perfect, but should be good enough.
 SPACE = r'[ \t]'
@@ -333,38 +633,149 @@ def _target_to_test(what, view, on_done):
         view.window().show_quick_panel(display_items, quick_on_done)
 
 
+# Formatted `TEST_PATTERN` for each kind of function.
+TEST_PATTERNS = {what: TEST_PATTERN.format(WHAT=what, SPACE=SPACE,
+                                           OPT_COMMENT=OPT_COMMENT,
+                                           IDENT=IDENT)
+                 for what in ('test', 'bench')}
+
+# Cache of test/bench functions found in each view.
+# Key is `(view_id, what)`, value is `(change_count, starts, names)` where
+# `starts` is a sorted list of the starting points of each function, and
+# `names` is the corresponding list of function names.
+TEST_INDEX = {}
+
+
+def _test_index(what, view):
+    """Returns `(starts, names)` of the test/bench functions in the view,
+    scanning the view only if it has changed since the last call."""
+    key = (view.id(), what)
+    change_count = view.change_count()
+    try:
+        cached = TEST_INDEX[key]
+    except KeyError:
+        pass
+    else:
+        if cached[0] == change_count:
+            return cached[1:]
+    names = []
+    regions = view.find_all(TEST_PATTERNS[what], 0, r'\1', names)
+    # Regions are in ascending order.
+    starts = [r.a for r in regions]
+    TEST_INDEX[key] = (change_count, starts, names)
+    return starts, names
+
+
 def _pt_to_test_name(what, pt, view):
     """Helper used to convert Sublime point to a test/bench function name."""
-    fn_names = []
-    pat = TEST_PATTERN.format(WHAT=what, **globals())
-    regions = view.find_all(pat, 0, r'\1', fn_names)
-    if not regions:
+    starts, names = _test_index(what, view)
+    if not starts:
         sublime.error_message('Could not find a Rust %s function.' % what)
         return None
-    # Assuming regions are in ascending order.
-    indices = [i for (i, r) in enumerate(regions) if r.a <= pt]
-    if not indices:
+    i = bisect.bisect_right(starts, pt)
+    if i == 0:
         sublime.error_message('No %s functions found about the current point.' % what)
         return None
-    return fn_names[indices[-1]]
+    return names[i - 1]
 
 
-def _cargo_test_pt(what, pt, view):
-    """Helper used to run a test for a given point in the given view."""
+class FunctionIndexEventListener(sublime_plugin.EventListener):
+
+    """Removes the test function index for closed views."""
+
+    def on_close(self, view):
+        for what in TEST_PATTERNS:
+            TEST_INDEX.pop((view.id(), what), None)
+
+
+def _region_to_test_names(what, region, view):
+    """Helper used to find the names of all test/bench functions that start
+    within the given region."""
+    starts, names = _test_index(what, view)
+    lo = bisect.bisect_left(starts, region.begin())
+    hi = bisect.bisect_left(starts, region.end())
+    return names[lo:hi]
+
+
+def _exact_test_args(window, cwd, names):
+    """Returns the arguments for the test harness to run exactly the given
+    tests.
+
+    The test harness only accepts more than one filter since Rust 1.52
+    (older versions run only the first), so several tests are refused with
+    an error message on older toolchains.
+
+    :returns: The `extra_run_args` string, or None if the tests cannot be
+        run in one invocation.
+    """
+    if len(names) > 1:
+        version = util.get_rustc_version(window, cwd)
+        if not semver.match(version, '>=1.52.0-beta'):
+            sublime.error_message(util.multiline_fix("""
+                Running several tests at once requires Rust 1.52 or newer (found %s).
+
+                Run the tests one at a time instead.""" % (version,)))
+            return None
+    return ' '.join(['--exact'] + [shlex.quote(name) for name in names])
+
+
+def _cargo_test_names(what, view, get_names):
+    """Helper used to run the given tests with a single cargo invocation.
+
+    :param get_names: Function that returns a list of function names to run.
+        It is called after the target has been determined.
+    """
     def do_test(target):
-        test_fn_name = _pt_to_test_name(what, pt, view)
-        if test_fn_name:
-            view.window().run_command('cargo_exec', args={
-                'command': what,
-                'settings': {
-                    'target': target,
-                    'extra_run_args': '--exact ' + test_fn_name
-                }
-            })
+        names = []
+        for name in get_names():
+            if name not in names:
+                names.append(name)
+        if not names:
+            return
+        extra_run_args = _exact_test_args(
+            view.window(), os.path.dirname(view.file_name()), names)
+        if extra_run_args is None:
+            return
+        view.window().run_command('cargo_exec', args={
+            'command': what,
+            'settings': {
+                'target': target,
+                'extra_run_args': extra_run_args,
+            }
+        })
 
     _target_to_test(what, view, do_test)
 
 
+def _cargo_test_pt(what, pt, view):
+    """Helper used to run a test for a given point in the given view."""
+    _cargo_test_sel(what, [sublime.Region(pt)], view)
+
+
+def _cargo_test_sel(what, regions, view):
+    """Helper used to run the tests at each cursor in the given view.
+
+    Empty regions select the function above the cursor.  Non-empty regions
+    select every function that starts within the region (or the function
+    above the start of the region if there are none).
+    """
+    def get_names():
+        names = []
+        for region in regions:
+            if not region.empty():
+                found = _region_to_test_names(what, region, view)
+                if found:
+                    names.extend(found)
+                    continue
+            name = _pt_to_test_name(what, region.begin(), view)
+            if not name:
+                return []
+            names.append(name)
+        return names
+
+    _cargo_test_names(what, view, get_names)
+
+
 class CargoHere(sublime_plugin.WindowCommand):
 
     """Base class for mouse-here commands.
@@ -403,12 +814,28 @@ class CargoBenchHereCommand(CargoHere):
 
 class CargoTestAtCursorCommand(sublime_plugin.TextCommand):
 
-    """Determines the test name at the current cursor position, and runs just
-    that test."""
+    """Determines the test name at each cursor position, and runs just those
+    tests.  If text is selected, all tests that start in the selection are
+    run."""
 
     def run(self, edit):
-        pt = self.view.sel()[0].begin()
-        _cargo_test_pt('test', pt, self.view)
+        _cargo_test_sel('test', list(self.view.sel()), self.view)
+
+
+class CargoTestInSelectionCommand(sublime_plugin.TextCommand):
+
+    """Runs all tests that start within the selected regions."""
+
+    def run(self, edit):
+        def get_names():
+            names = []
+            for region in self.view.sel():
+                names.extend(_region_to_test_names('test', region, self.view))
+            if not names:
+                sublime.error_message('No test functions found in the selection.')
+            return names
+
+        _cargo_test_names('test', self.view, get_names)
 
 
 class CargoCurrentFile(sublime_plugin.WindowCommand):
@@ -496,6 +923,16 @@ class RustMessagePopupCommand(sublime_plugin.TextCommand):
             messages.message_popup(self.view, r.begin(), sublime.HOVER_TEXT)
 
 
+class RustToggleRenderedCommand(sublime_plugin.TextCommand):
+
+    """Show or hide rustc's rendered form of the message under the cursor,
+    in a Rust file or in the build output panel."""
+
+    def run(self, edit):
+        if not messages.toggle_rendered(self.view, self.view.sel()[0].begin()):
+            sublime.status_message('No compiler message with rendered text here.')
+
+
 class RustMessageStatus(sublime_plugin.ViewEventListener):
 
     """Display message under cursor in status bar."""
@@ -529,6 +966,7 @@ class RustEventListener(sublime_plugin.EventListener):
         # It would be preferable to use ViewEventListener, but it doesn't work
         # on duplicate views created with Goto Anything.
         def activate():
+            profile.update_enabled()
             if not util.active_view_is_rust(view=view):
                 return
             if util.get_setting('rust_message_status_bar', False):
@@ -578,6 +1016,7 @@ class RustScrollToRegion(sublime_plugin.TextCommand):
 
 def plugin_unloaded():
     messages.clear_all_messages()
+    profile.plugin_unloaded()
     try:
         from package_control import events
     except ImportError:
@@ -597,6 +1036,8 @@ def plugin_unloaded():
 
 
 def plugin_loaded():
+    profile.plugin_loaded()
+    toolchains.prefetch(sublime.active_window())
     try:
         from package_control import events
     except ImportError:
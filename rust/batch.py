@@ -9,9 +9,12 @@ class MessageBatch:
 
     :ivar children: List of additional messages, may be empty.
     :ivar hidden: Boolean if this message should be displayed.
+    :ivar partition: Key of the compilation that generated this batch (see
+        `messages.add_rust_messages`).
     """
 
     hidden = False
+    partition = None
 
     def __init__(self):
         self.children = []
@@ -65,9 +68,21 @@ class PrimaryBatch(MessageBatch):
         batch.
     :ivar child_links: List of `(url, text)` tuples for links to child batches
         that are "far away".
+    :ivar rendered: rustc's rendered text of the message until the batch is
+        saved, after which it is moved to the window's spool (see
+        `rendered`).
+    :ivar rendered_key: Key of the rendered text in the window's spool, or
+        None if there is none.
+    :ivar expanded: If True, the phantom shows the rendered text.
+    :ivar panel_expanded: If True, the rendered text is shown in the output
+        panel below the message.
     """
 
     primary_message = None
+    rendered = None
+    rendered_key = None
+    expanded = False
+    panel_expanded = False
 
     def __init__(self, primary_message):
         super(PrimaryBatch, self).__init__()
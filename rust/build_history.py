@@ -0,0 +1,221 @@
+"""History of how long Cargo builds take.
+
+Every Cargo command run from the build system is appended as one JSON line
+to a file in Sublime's cache directory, recording the command, profile,
+features, toolchain, elapsed time, exit code, and number of units rebuilt.
+A build is flagged as a regression when it took more than
+`rust_build_regression_percent` longer than the median of the previous
+builds of the same command in the same workspace.
+"""
+
+import json
+import os
+import threading
+import time
+
+import sublime
+
+from . import util, log
+
+# Number of previous builds used for the rolling median.
+MEDIAN_WINDOW = 10
+# Minimum number of previous builds needed to detect a regression.
+MIN_SAMPLES = 3
+# Maximum number of builds kept in the file.
+MAX_RECORDS = 5000
+# Characters used to draw the trend of build times.
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+_LOCK = threading.Lock()
+
+
+def _history_path():
+    return os.path.join(sublime.cache_path(), 'RustEnhanced',
+                        'build_history.jsonl')
+
+
+def describe_command(cmd):
+    """Extract the details of a Cargo command line.
+
+    :param cmd: The command (list of strings).
+    :returns: Dictionary with `command` (the command without the toolchain
+        and with arguments after `--` removed), `toolchain`, `profile`, and
+        `features`.
+    """
+    toolchain = None
+    profile = 'dev'
+    features = []
+    command = []
+    args = iter(cmd)
+    for arg in args:
+        if arg == '--':
+            break
+        if arg.startswith('+'):
+            toolchain = arg[1:]
+            continue
+        command.append(arg)
+        if arg == '--release':
+            profile = 'release'
+        elif arg.startswith('--profile='):
+            profile = arg[10:]
+        elif arg == '--profile':
+            profile = next(args, profile)
+            command.append(profile)
+        elif arg.startswith('--features='):
+            features.extend(arg[11:].replace(',', ' ').split())
+        elif arg == '--features':
+            value = next(args, '')
+            command.append(value)
+            features.extend(value.replace(',', ' ').split())
+        elif arg == '--all-features':
+            features.append('(all)')
+    return {
+        'command': ' '.join(command),
+        'toolchain': toolchain,
+        'profile': profile,
+        'features': sorted(features),
+    }
+
+
+def record(workspace, cmd, elapsed, rc, rebuilt, now=None):
+    """Append a build to the history.
+
+    :param cmd: The command that was run (list of strings).
+    :param elapsed: Seconds the build took.
+    :param rc: Exit code.
+    :param rebuilt: Number of units rebuilt, or None if not known.
+    """
+    entry = describe_command(cmd)
+    entry.update({
+        'workspace': workspace,
+        'time': time.time() if now is None else now,
+        'elapsed': elapsed,
+        'rc': rc,
+        'rebuilt': rebuilt,
+    })
+    path = _history_path()
+    with _LOCK:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            log.critical(None, 'Rust Enhanced: Failed to save build history: %s',
+                         e)
+
+
+def load():
+    """Returns a list of all recorded builds (dictionaries), oldest first.
+
+    The file is trimmed to `MAX_RECORDS` builds if it has grown beyond that.
+    """
+    path = _history_path()
+    with _LOCK:
+        try:
+            with open(path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return []
+        result = []
+        for line in lines:
+            try:
+                result.append(json.loads(line))
+            except ValueError:
+                # Partially written line.
+                continue
+        if len(lines) > MAX_RECORDS:
+            result = result[-MAX_RECORDS:]
+            util.write_cache_file(
+                path, ''.join(json.dumps(entry) + '\n' for entry in result),
+                'build history')
+        return result
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+def _key(entry):
+    return (entry['workspace'], entry['command'], entry['toolchain'])
+
+
+def analyze(entries, threshold=None):
+    """Compare each successful build to the median of the previous builds of
+    the same command.
+
+    :param threshold: Percent slower than the median to count as a
+        regression.  Defaults to the `rust_build_regression_percent`
+        setting.
+    :returns: List of `(key, builds)` where key is `(workspace, command,
+        toolchain)` and builds is a list of `(entry, median, regressed)`,
+        oldest first.  `median` is None if there were not enough previous
+        builds.  Most recently run commands are first.
+    """
+    if threshold is None:
+        threshold = util.get_setting('rust_build_regression_percent', 25)
+    groups = {}
+    for entry in entries:
+        builds = groups.setdefault(_key(entry), [])
+        if entry['rc']:
+            # Failed builds stop early, so they are not comparable.
+            builds.append((entry, None, False))
+            continue
+        previous = [e['elapsed'] for e, _, _ in builds
+                    if not e['rc']][-MEDIAN_WINDOW:]
+        if len(previous) >= MIN_SAMPLES:
+            med = median(previous)
+            regressed = entry['elapsed'] > med * (1 + threshold / 100)
+        else:
+            med = None
+            regressed = False
+        builds.append((entry, med, regressed))
+    result = list(groups.items())
+    result.sort(key=lambda x: -x[1][-1][0]['time'])
+    return result
+
+
+def sparkline(values):
+    """Returns a string of block characters showing the trend of values."""
+    if not values:
+        return ''
+    low = min(values)
+    high = max(values)
+    span = (high - low) or 1
+    last = len(SPARK_CHARS) - 1
+    return ''.join(SPARK_CHARS[int(round((v - low) / span * last))]
+                   for v in values)
+
+
+def render(analysis, max_builds=30):
+    """Returns the text of a report of the result of `analyze`."""
+    lines = []
+    for (workspace, command, toolchain), builds in analysis:
+        title = command
+        if toolchain:
+            title += ' (+%s)' % (toolchain,)
+        lines.append('%s  in %s' % (title, workspace))
+        builds = builds[-max_builds:]
+        ok = [e['elapsed'] for e, _, _ in builds if not e['rc']]
+        if ok:
+            lines.append('  trend: %s  (min %.1fs, max %.1fs)' % (
+                sparkline(ok), min(ok), max(ok)))
+        for entry, med, regressed in reversed(builds):
+            when = time.strftime('%Y-%m-%d %H:%M',
+                                 time.localtime(entry['time']))
+            line = '  %s  %7.1fs' % (when, entry['elapsed'])
+            if entry['rebuilt'] is not None:
+                line += '  %4i rebuilt' % (entry['rebuilt'],)
+            if entry['rc']:
+                line += '  exit code %i' % (entry['rc'],)
+            elif med is not None:
+                line += '  median %.1fs (%+.0f%%)' % (
+                    med, (entry['elapsed'] - med) / med * 100 if med else 0)
+            if regressed:
+                line += '  SLOWER'
+            lines.append(line)
+        lines.append('')
+    return '\n'.join(lines)
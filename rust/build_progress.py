@@ -0,0 +1,117 @@
+"""Progress of a Cargo build, for display in the status bar.
+
+Cargo emits a `compiler-artifact` message when each unit is finished (or
+found to be up-to-date).  The number of packages finished is compared to the
+number of packages expected in the build, which is taken from the previous
+build of the workspace (see `build_timing`) or, failing that, the number of
+packages in `Cargo.lock`.  The time remaining is estimated from how long each
+of the packages that have not finished took to compile the last time they
+were built, divided by the number of units Cargo compiled in parallel in the
+last build.
+"""
+
+import os
+import re
+import time
+
+from . import build_timing, util
+
+
+def count_lock_packages(workspace):
+    """Returns the number of packages in the workspace's Cargo.lock, or None
+    if it does not exist."""
+    try:
+        with open(os.path.join(workspace, 'Cargo.lock'),
+                  encoding='utf-8') as f:
+            return len(re.findall(r'^\[\[package\]\]', f.read(),
+                                  re.MULTILINE))
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+class BuildProgress:
+
+    """Tracks how many packages of a build are finished.
+
+    :ivar total: Number of packages expected, or None if not known.
+    :ivar done: Set of package IDs that are finished.
+    """
+
+    def __init__(self, total, crate_times, started=None, parallelism=1.0):
+        """
+        :param crate_times: Dictionary of package ID to the number of
+            seconds it took to compile in a previous build.
+        :param parallelism: Average number of units compiling at the same
+            time (see `build_timing.parallelism`).
+        """
+        self.total = total
+        self.crate_times = crate_times
+        self.parallelism = parallelism
+        self.started = time.time() if started is None else started
+        self.done = set()
+        # Time the last package finished.
+        self._last_finished = self.started
+
+    @classmethod
+    def for_workspace(cls, cwd, eta=True):
+        """Create a `BuildProgress` using the history of the workspace
+        containing the given directory.
+
+        :param eta: If False, do not estimate the time remaining.
+        """
+        workspace = util.find_workspace_root(cwd) or cwd
+        total, crate_times = build_timing.history(workspace)
+        if total is None:
+            total = count_lock_packages(workspace)
+        return cls(total, crate_times if eta else {},
+                   parallelism=build_timing.parallelism(workspace))
+
+    def on_json(self, obj, now=None):
+        """Process a JSON message from Cargo.
+
+        :returns: True if the progress changed.
+        """
+        if obj.get('reason') != 'compiler-artifact':
+            return False
+        package_id = obj.get('package_id')
+        if package_id in self.done:
+            return False
+        self.done.add(package_id)
+        self._last_finished = time.time() if now is None else now
+        if self.total is not None and len(self.done) > self.total:
+            # The build has more packages than expected.
+            self.total = len(self.done)
+        return True
+
+    def eta(self, now=None):
+        """Returns the estimated number of seconds remaining, or None if
+        there is no history to base it on."""
+        if not self.crate_times:
+            return None
+        if now is None:
+            now = time.time()
+        remaining = sum(seconds for package_id, seconds
+                        in self.crate_times.items()
+                        if package_id not in self.done) / self.parallelism
+        # The package currently compiling has been going since the last one
+        # finished, roughly.
+        return max(0, remaining - (now - self._last_finished))
+
+    def text(self, now=None):
+        """Returns the text to display in the status bar."""
+        if self.total:
+            text = '%i/%i crates' % (min(len(self.done), self.total),
+                                     self.total)
+        else:
+            text = '%i crates' % (len(self.done),)
+        eta = self.eta(now)
+        if eta is not None:
+            text += ', ETA %s' % (format_seconds(eta),)
+        return text
+
+
+def format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return '%is' % (seconds,)
+    return '%im%02is' % (seconds // 60, seconds % 60)
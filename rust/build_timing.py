@@ -0,0 +1,336 @@
+"""Per-crate compile times collected from Cargo's JSON messages.
+
+When Cargo is run with `--message-format=json` it emits a `compiler-artifact`
+message each time a unit (a target of a package) finishes compiling, and a
+`build-script-executed` message when a build script finishes running.  These
+are timestamped as they arrive to produce a breakdown of where the time of a
+build went.
+
+Cargo does not say when a unit starts compiling, so the duration of a unit
+is estimated as the time since the previous message (or the start of the
+build).  This is exact for serial builds, and an approximation when units are
+built in parallel.  If Cargo emits `timing-info` messages (nightly
+`-Z unstable-options --timings=json`), the exact durations are used instead.
+
+The timings of the most recent build of each workspace are saved in Sublime's
+cache directory, along with the most recent compile time of each crate (used
+to estimate how long a build will take, see `build_progress`).
+"""
+
+import os
+import threading
+import time
+
+import sublime
+
+from . import util
+
+# Version of the on-disk format, bump when it changes.
+TIMINGS_VERSION = 2
+
+_LOCK = threading.Lock()
+# Dictionary loaded from disk, None if not loaded yet.
+_TIMINGS = None
+
+
+def package_name(package_id):
+    """Extract the package name from a Cargo package ID.
+
+    Handles both the old format (`foo 0.1.0 (path+file:///foo)`) and the
+    newer URL format (`path+file:///foo#0.1.0` or
+    `registry+https://...#foo@0.1.0`).
+    """
+    if ' ' in package_id:
+        return package_id.split(' ', 1)[0]
+    url, _, fragment = package_id.rpartition('#')
+    if '@' in fragment:
+        return fragment.split('@', 1)[0]
+    # The name is omitted when it matches the last path component.
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+class UnitTiming:
+
+    """Timing of a single compilation unit.
+
+    :ivar package: Name of the package.
+    :ivar package_id: Cargo's ID of the package.
+    :ivar target: Name of the target.
+    :ivar kind: First kind of the target (such as 'lib' or 'custom-build').
+    :ivar fresh: True if the unit was up-to-date and not rebuilt.
+    :ivar start: Seconds since the start of the build when the unit started
+        (estimated unless `exact` is True).
+    :ivar finish: Seconds since the start of the build when the unit finished.
+    :ivar exact: True if the duration was reported by Cargo.
+    :ivar build_script: True if this is the time to run a build script
+        (rather than compile a target).
+    """
+
+    def __init__(self, package_id, target, kind, fresh, start, finish,
+                 exact=False, build_script=False):
+        self.package = package_name(package_id)
+        self.package_id = package_id
+        self.target = target
+        self.kind = kind
+        self.fresh = fresh
+        self.start = start
+        self.finish = finish
+        self.exact = exact
+        self.build_script = build_script
+
+    @property
+    def duration(self):
+        return self.finish - self.start
+
+    def to_json(self):
+        d = self.__dict__.copy()
+        del d['package']
+        return d
+
+    @classmethod
+    def from_json(cls, d):
+        return cls(**d)
+
+
+class BuildTimings:
+
+    """Collects the timings of the units of a build.
+
+    :ivar started: Value of `time.time()` when the build started.
+    :ivar units: List of `UnitTiming` in the order they finished.
+    :ivar elapsed: Total time of the build in seconds, or None if not
+        finished.
+    """
+
+    def __init__(self, command, started=None):
+        self.command = command
+        self.started = time.time() if started is None else started
+        self.units = []
+        self.elapsed = None
+        # Time of the last message that finished a unit.
+        self._last = 0.0
+        # Dictionary of package_id to the finish time of its build script
+        # compilation.
+        self._build_script_compiled = {}
+
+    def on_json(self, obj, now=None):
+        """Process a JSON message from Cargo.
+
+        :returns: The `UnitTiming` if the message finished a unit, otherwise
+            None.
+        """
+        reason = obj.get('reason')
+        if reason not in ('compiler-artifact', 'build-script-executed',
+                          'timing-info'):
+            return None
+        if now is None:
+            now = time.time()
+        offset = now - self.started
+        package_id = obj.get('package_id', '')
+        if reason == 'timing-info':
+            self._on_timing_info(obj)
+            return None
+        if reason == 'build-script-executed':
+            start = self._build_script_compiled.get(package_id, self._last)
+            unit = UnitTiming(package_id, 'build-script',
+                              'custom-build', False, start, offset,
+                              build_script=True)
+        else:
+            target = obj.get('target', {})
+            kind = (target.get('kind') or ['?'])[0]
+            fresh = obj.get('fresh', False)
+            start = offset if fresh else self._last
+            unit = UnitTiming(package_id, target.get('name'),
+                              kind, fresh, start, offset)
+            if kind == 'custom-build':
+                self._build_script_compiled[package_id] = offset
+        if not unit.fresh:
+            self._last = offset
+        self.units.append(unit)
+        return unit
+
+    def _on_timing_info(self, obj):
+        package_id = obj.get('package_id', '')
+        target = obj.get('target', {}).get('name')
+        for unit in reversed(self.units):
+            if unit.package_id == package_id and unit.target == target and \
+                    not unit.build_script:
+                unit.start = unit.finish - obj.get('duration', 0)
+                unit.exact = True
+                return
+
+    def finish(self, now=None):
+        if now is None:
+            now = time.time()
+        self.elapsed = now - self.started
+
+    def packages(self):
+        """Returns the set of package IDs in the build."""
+        return set(u.package_id for u in self.units)
+
+    def rebuilt(self):
+        """Returns the list of units that were not fresh."""
+        return [u for u in self.units if not u.fresh]
+
+    def by_package(self):
+        """Returns a list of `(package, seconds, units)` for each package,
+        slowest first."""
+        packages = {}
+        for unit in self.units:
+            packages.setdefault(unit.package, []).append(unit)
+        result = [(name, sum(u.duration for u in units), units)
+                  for name, units in packages.items()]
+        result.sort(key=lambda x: (-x[1], x[0]))
+        return result
+
+    def to_json(self):
+        return {
+            'command': self.command,
+            'started': self.started,
+            'elapsed': self.elapsed,
+            'units': [u.to_json() for u in self.units],
+        }
+
+    @classmethod
+    def from_json(cls, d):
+        self = cls(d['command'], d['started'])
+        self.elapsed = d['elapsed']
+        self.units = [UnitTiming.from_json(u) for u in d['units']]
+        return self
+
+
+def _timings_path():
+    return os.path.join(sublime.cache_path(), 'RustEnhanced',
+                        'build_timings.json')
+
+
+def _load():
+    global _TIMINGS
+    if _TIMINGS is not None:
+        return _TIMINGS
+    _TIMINGS = {}
+    data = util.load_json_cache(_timings_path(), TIMINGS_VERSION)
+    if data is not None:
+        _TIMINGS = data['workspaces']
+    return _TIMINGS
+
+
+def _save():
+    data = {'version': TIMINGS_VERSION, 'workspaces': _TIMINGS}
+    util.save_json_cache(_timings_path(), data, 'build timings')
+
+
+def record(workspace, timings):
+    """Save the timings of a build.
+
+    The saved information for each workspace is:
+
+    - `last`: The last build that compiled something.
+    - `packages`: Number of packages in the last build.
+    - `crates`: Dictionary of package ID to the number of seconds it took to
+      compile the last time it was not fresh.  Packages that are no longer
+      part of the build are dropped.
+    - `parallelism`: Sum of the compile times of the units of the last build
+      that compiled something, divided by the time from when the first of
+      them started to when the last finished.
+    """
+    if not timings.units:
+        return
+    with _LOCK:
+        info = _load().setdefault(workspace, {'last': None, 'crates': {}})
+        packages = timings.packages()
+        info['packages'] = len(packages)
+        info['crates'] = {package_id: seconds
+                          for package_id, seconds in info['crates'].items()
+                          if package_id in packages}
+        rebuilt = timings.rebuilt()
+        if rebuilt:
+            info['last'] = timings.to_json()
+            crates = {}
+            for unit in rebuilt:
+                crates[unit.package_id] = \
+                    crates.get(unit.package_id, 0) + unit.duration
+            info['crates'].update(crates)
+            span = max(u.finish for u in rebuilt) - \
+                min(u.start for u in rebuilt)
+            if span > 0:
+                info['parallelism'] = max(1.0, sum(crates.values()) / span)
+        _save()
+
+
+def last_timings(workspace):
+    """Returns the `BuildTimings` of the last build of the workspace that
+    compiled something, or None."""
+    with _LOCK:
+        info = _load().get(workspace)
+    if info is None or info['last'] is None:
+        return None
+    return BuildTimings.from_json(info['last'])
+
+
+def history(workspace):
+    """Returns `(packages, crates)` for the workspace, where `packages` is the
+    number of packages in the last build (or None if unknown), and `crates`
+    is a dictionary of package ID to how long it took to compile the last
+    time it was built."""
+    with _LOCK:
+        info = _load().get(workspace)
+        if info is None:
+            return None, {}
+        return info.get('packages'), dict(info['crates'])
+
+
+def parallelism(workspace):
+    """Returns the average number of units compiling at the same time in the
+    last build of the workspace that compiled something (1.0 if unknown)."""
+    with _LOCK:
+        info = _load().get(workspace)
+        if info is None:
+            return 1.0
+        return info.get('parallelism', 1.0)
+
+
+def render(timings):
+    """Returns the text of a report of the given `BuildTimings`."""
+    lines = ['Build timings: %s' % (timings.command,)]
+    if timings.elapsed is not None:
+        lines.append('Finished in %.1fs' % (timings.elapsed,))
+    rebuilt = timings.rebuilt()
+    lines.append('%i units, %i rebuilt, %i fresh' % (
+        len(timings.units), len(rebuilt), len(timings.units) - len(rebuilt)))
+    if any(not u.exact and not u.fresh for u in timings.units):
+        lines.append('Durations marked with ~ are estimated from the time '
+                     'between Cargo messages.')
+    lines.append('')
+    for name, seconds, units in timings.by_package():
+        if all(u.fresh for u in units):
+            lines.append('%8s  %s' % ('fresh', name))
+            continue
+        lines.append('%7.2fs  %s' % (seconds, name))
+        for unit in units:
+            if unit.fresh:
+                continue
+            if unit.build_script:
+                what = 'build script (run)'
+            else:
+                what = '%s "%s"' % (unit.kind, unit.target)
+            lines.append('%11s%s%.2fs  %s  [%.2fs - %.2fs]' % (
+                '', '' if unit.exact else '~', unit.duration, what,
+                unit.start, unit.finish))
+    return '\n'.join(lines) + '\n'
+
+
+def show_report(window, timings):
+    """Display the report of the given `BuildTimings` in a new view."""
+    view = window.new_file()
+    view.set_scratch(True)
+    view.set_name('Rust Build Timings')
+    view.settings().set('word_wrap', False)
+    view.run_command('append', {'characters': render(timings)})
+    view.set_read_only(True)
+
+
+def workspaces():
+    """Returns the workspaces with saved timings of a build."""
+    with _LOCK:
+        return [ws for ws, info in _load().items() if info['last'] is not None]
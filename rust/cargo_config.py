@@ -4,13 +4,16 @@ See `cargo_settings` for more details on how settings work.
 """
 
 import getpass
+import itertools
 import os
-import re
+import queue
 import sublime
 import sublime_plugin
+import traceback
 from .cargo_settings import CargoSettings, CARGO_COMMANDS
 from .util import index_with, get_cargo_metadata
-from . import rust_proc, util, log
+from . import (rust_proc, rust_thread, util, log, package_index,
+               toolchains)
 
 # Keep track of recent choices to set the default value.
 RECENT_CHOICES = {}
@@ -47,6 +50,14 @@ class CargoConfigBase(sublime_plugin.WindowCommand):
     Callers are allowed to pass in values instead of using the interactive UI.
     This is probably only useful for the test code, but in theory you could
     define key bindings that perform certain actions.
+
+    Questions listed in `background_questions` may need to run Cargo or
+    rustup, so their `items_` method is run on a `ConfigWorker` thread while
+    a "Loading..." placeholder is displayed.  An optional `prefetch_`+name
+    method is called on the worker when the command starts so that the data
+    is (hopefully) ready by the time the question is asked.  When values are
+    passed in to the command, everything runs synchronously so that the
+    settings are updated by the time the command returns.
     """
 
     # CargoSettings object.
@@ -85,7 +96,19 @@ class CargoConfigBase(sublime_plugin.WindowCommand):
     # Name of what is being configured.
     config_name = ""
 
+    # Questions whose `items_` method is slow, and is run on the worker
+    # thread.
+    background_questions = ('package', 'toolchain')
+
+    # `ConfigWorker` used to load choices, None if running synchronously.
+    worker = None
+
+    # Incremented each time the command is started or cancelled.  Used to
+    # ignore results from the worker that are no longer wanted.
+    generation = 0
+
     def run(self, **kwargs):
+        self.cancel()
         self.choices = {}
         self.sequence_index = 0
         # Copy, since WindowCommand reuses objects.
@@ -93,18 +116,41 @@ class CargoConfigBase(sublime_plugin.WindowCommand):
         self.cmd_input = kwargs
         self.settings = CargoSettings(self.window)
         self.settings.load()
+        # Cache of `get_cargo_metadata` results, shared with the worker.
+        self._metadata = {}
+        if not kwargs:
+            self.worker = ConfigWorker(self.window)
+            self.worker.start()
+            self._prefetch(self._sequence)
         self.show_next_question()
 
+    def _prefetch(self, questions):
+        """Start loading the data for the given upcoming questions."""
+        if self.worker:
+            for q in questions:
+                f_prefetch = getattr(self, 'prefetch_' + q, None)
+                if f_prefetch:
+                    self.worker.add(ConfigWorker.PREFETCH, f_prefetch)
+
     def done(self):
         """Called once all questions have been asked.  Subclasses must
         implement this."""
         raise NotImplementedError()
 
+    def cancel(self):
+        """Stop the command, including any work being done in the
+        background."""
+        self.generation += 1
+        if self.worker:
+            self.worker.terminate()
+            self.worker = None
+
     def show_next_question(self):
         if self.sequence_index < len(self._sequence):
             q = self._sequence[self.sequence_index]
             self.sequence_index += 1
         else:
+            self.cancel()
             self.done()
             return
 
@@ -117,103 +163,182 @@ class CargoConfigBase(sublime_plugin.WindowCommand):
                 try:
                     next = f_selected(value)
                 except CancelCommandError:
+                    self.cancel()
                     return
                 if next:
                     i = self.sequence_index
                     self._sequence[i:i] = next
+                    self._prefetch(next)
             self.show_next_question()
 
         if q in self.cmd_input:
             make_choice(self.cmd_input[q])
+        elif self.worker and q in self.background_questions:
+            self._load_in_background(q, make_choice)
         else:
             try:
                 item_info = getattr(self, 'items_' + q)()
             except CancelCommandError:
+                self.cancel()
                 return
-            if not isinstance(item_info, dict):
-                item_info = {'items': item_info}
-
-            if 'items' in item_info:
-                def wrapper(index):
-                    if index != -1:
-                        chosen = item_info['items'][index][1]
-                        RECENT_CHOICES[q] = chosen
-                        make_choice(chosen)
-
-                items = item_info['items']
-                if item_info.get('skip_if_one', False) and len(items) == 1:
-                    wrapper(0)
+            self._show_items(q, item_info, make_choice)
+
+    def _load_in_background(self, q, make_choice):
+        """Run the `items_` method for the question on the worker thread,
+        showing a placeholder until it is done."""
+        generation = self.generation
+        loading = [True]
+
+        def on_placeholder(index):
+            if not loading[0] or generation != self.generation:
+                return
+            if index == -1:
+                # The user dismissed the command.
+                loading[0] = False
+                self.cancel()
+            else:
+                sublime.set_timeout(show_placeholder, 0)
+
+        def show_placeholder():
+            if loading[0] and generation == self.generation:
+                self.window.show_quick_panel(
+                    [['Loading...', 'Rust: %s' % (self.config_name,)]],
+                    on_placeholder)
+
+        def on_loaded(item_info, error):
+            if not loading[0] or generation != self.generation:
+                return
+            loading[0] = False
+            # Close the placeholder.
+            self.window.run_command('hide_overlay')
+            if error is not None:
+                self.cancel()
+                if error is not CancelCommandError:
+                    log.critical(self.window,
+                        'Rust Enhanced Internal Error: %s', error)
+            else:
+                self._show_items(q, item_info, make_choice)
+
+        def load():
+            item_info = error = None
+            try:
+                item_info = getattr(self, 'items_' + q)()
+            except rust_proc.ProcessTerminatedError:
+                raise
+            except CancelCommandError:
+                error = CancelCommandError
+            except Exception:
+                error = traceback.format_exc()
+            sublime.set_timeout(lambda: on_loaded(item_info, error), 0)
+
+        show_placeholder()
+        self.worker.add(ConfigWorker.LOAD, load)
+
+    def _show_items(self, q, item_info, make_choice):
+        """Display the choices for a question."""
+        if not isinstance(item_info, dict):
+            item_info = {'items': item_info}
+
+        if 'items' in item_info:
+            def wrapper(index):
+                if index != -1:
+                    chosen = item_info['items'][index][1]
+                    RECENT_CHOICES[q] = chosen
+                    make_choice(chosen)
                 else:
-                    # If the user manually edits the config and enters custom
-                    # values then it won't show up in the list (because it is
-                    # not an exact match).  Add it so that it is a valid
-                    # choice (assuming the user entered a valid value).
-                    if 'default' in item_info:
-                        default_index = index_with(items,
-                            lambda x: x[1] == item_info['default'])
-                        if default_index == -1:
-                            items.append((item_info['default'],
-                                          item_info['default']))
-                    # Determine the default selection.
-                    # Use the default provided by the items_ method, else
-                    # use the most recently used value.
-                    default = index_with(items,
-                        lambda x: x[1] == item_info.get('default',
-                            RECENT_CHOICES.get(q, '_NO_DEFAULT_SENTINEL_')))
-                    display_items = [x[0] for x in items]
-                    self.window.show_quick_panel(display_items, wrapper, 0,
-                                                 default)
-            elif 'caption' in item_info:
-                self.window.show_input_panel(item_info['caption'],
-                                             item_info.get('default', ''),
-                                             make_choice, None, None)
+                    self.cancel()
+
+            items = item_info['items']
+            if item_info.get('skip_if_one', False) and len(items) == 1:
+                wrapper(0)
             else:
-                raise ValueError(item_info)
+                # If the user manually edits the config and enters custom
+                # values then it won't show up in the list (because it is
+                # not an exact match).  Add it so that it is a valid
+                # choice (assuming the user entered a valid value).
+                if 'default' in item_info:
+                    default_index = index_with(items,
+                        lambda x: x[1] == item_info['default'])
+                    if default_index == -1:
+                        items.append((item_info['default'],
+                                      item_info['default']))
+                # Determine the default selection.
+                # Use the default provided by the items_ method, else
+                # use the most recently used value.
+                default = index_with(items,
+                    lambda x: x[1] == item_info.get('default',
+                        RECENT_CHOICES.get(q, '_NO_DEFAULT_SENTINEL_')))
+                display_items = [x[0] for x in items]
+                self.window.show_quick_panel(display_items, wrapper, 0,
+                                             default)
+        elif 'caption' in item_info:
+            self.window.show_input_panel(item_info['caption'],
+                                         item_info.get('default', ''),
+                                         make_choice, None, self.cancel)
+        else:
+            raise ValueError(item_info)
 
-    def items_package(self):
+    def _get_cargo_metadata(self, manifest_dir):
+        """Cached version of `get_cargo_metadata`."""
+        try:
+            return self._metadata[manifest_dir]
+        except KeyError:
+            metadata = get_cargo_metadata(self.window, manifest_dir)
+            self._metadata[manifest_dir] = metadata
+            return metadata
+
+    def _view_manifest_dir(self):
+        """Returns the manifest directory of the active view if the 'package'
+        question should use it, otherwise None."""
         view = self.window.active_view()
-        if self.package_allows_active_view_shortcut and view.file_name():
-            # If there is a manifest under the current view, use that by
-            # default.
-            manifest_dir = util.find_cargo_manifest(view.file_name())
-            if manifest_dir:
-                if self.package_wants_metadata:
-                    metadata = get_cargo_metadata(self.window, manifest_dir)
-                    if metadata:
-                        for package in metadata['packages']:
-                            package_dir = os.path.dirname(
-                                package['manifest_path'])
-                            if package_dir == manifest_dir:
-                                self.packages = {
-                                    manifest_dir: package
-                                }
-                return {
-                    'items': [(manifest_dir, manifest_dir)],
-                    'skip_if_one': True,
-                }
+        if self.package_allows_active_view_shortcut and view and \
+                view.file_name():
+            return util.find_cargo_manifest(view.file_name())
+        return None
+
+    def prefetch_package(self):
+        manifest_dir = self._view_manifest_dir()
+        if manifest_dir:
+            if self.package_wants_metadata:
+                self._get_cargo_metadata(manifest_dir)
+        else:
+            package_index.get_index().packages(self.window,
+                                               self.window.folders())
 
-        # Otherwise, hunt for all manifest files and show a list.
+    def items_package(self):
+        # If there is a manifest under the current view, use that by
+        # default.
+        manifest_dir = self._view_manifest_dir()
+        if manifest_dir:
+            if self.package_wants_metadata:
+                metadata = self._get_cargo_metadata(manifest_dir)
+                if metadata:
+                    for package in metadata['packages']:
+                        package_dir = os.path.dirname(
+                            package['manifest_path'])
+                        if package_dir == manifest_dir:
+                            self.packages = {
+                                manifest_dir: package
+                            }
+            return {
+                'items': [(manifest_dir, manifest_dir)],
+                'skip_if_one': True,
+            }
+
+        # Otherwise, show a list of all packages in the project.
         folders = self.window.folders()
-        self.packages = {}
-        for folder in folders:
-            folder_parent = os.path.dirname(folder)
-            for dirpath, dirs, files, in os.walk(folder):
-                for exclude in ('.git', '.svn'):
-                    if exclude in dirs:
-                        dirs.remove(exclude)
-                if 'Cargo.toml' in files:
-                    metadata = get_cargo_metadata(self.window, dirpath)
-                    if metadata:
-                        for package in metadata['packages']:
-                            manifest_dir = os.path.dirname(package['manifest_path'])
-                            rel = os.path.relpath(manifest_dir, folder_parent)
-                            package['sublime_relative'] = rel
-                            if manifest_dir not in self.packages:
-                                self.packages[manifest_dir] = package
-                    else:
-                        # Manifest load failure, let it slide.
-                        log.critical(self.window,
-                            'Failed to load Cargo manifest in %r', dirpath)
+        self.packages = package_index.get_index().packages(self.window,
+                                                           folders)
+        for manifest_dir, package in self.packages.items():
+            for folder in folders:
+                if manifest_dir.startswith(os.path.join(folder, '')) or \
+                        manifest_dir == folder:
+                    rel = os.path.relpath(manifest_dir,
+                                          os.path.dirname(folder))
+                    break
+            else:
+                rel = manifest_dir
+            package['sublime_relative'] = rel
 
         if len(self.packages) == 0:
             sublime.error_message(util.multiline_fix("""
@@ -394,39 +519,64 @@ class CargoConfigBase(sublime_plugin.WindowCommand):
             result['default'] = current
         return result
 
+    def prefetch_toolchain(self):
+        self._toolchain_list()
+
     def _toolchain_list(self):
-        output = rust_proc.check_output(self.window,
-                                        'rustup toolchain list'.split(),
-                                        None)
-        output = output.splitlines()
-        system_default = index_with(output, lambda x: x.endswith(' (default)'))
-        if system_default != -1:
-            # Strip the " (default)" text.
-            output[system_default] = output[system_default][:-10]
-        # Rustup supports some shorthand of either `channel` or `channel-date`
-        # without the trailing target info.
-        #
-        # Complete list of available toolchains is available at:
-        # https://static.rust-lang.org/dist/index.html
-        # (See https://github.com/rust-lang-nursery/rustup.rs/issues/215)
-        shorthands = []
-        channels = ['nightly', 'beta', 'stable', '\d\.\d{1,2}\.\d']
-        pattern = '(%s)(?:-(\d{4}-\d{2}-\d{2}))?(?:-(.*))' % '|'.join(channels)
-        for toolchain in output:
-            m = re.match(pattern, toolchain)
-            # Should always match.
-            if m:
-                channel = m.group(1)
-                date = m.group(2)
-                if date:
-                    shorthand = '%s-%s' % (channel, date)
+        return toolchains.toolchain_list(self.window)
+
+
+class ConfigWorker(rust_thread.RustThread):
+
+    """Thread used by `CargoConfigBase` to load choices in the background.
+
+    Work is done in priority order, loading the current question comes
+    before prefetching data for later questions.
+    """
+
+    name = 'Cargo Config'
+    job_class = 'config'
+
+    # Priorities.
+    LOAD = 0
+    PREFETCH = 1
+
+    def __init__(self, window):
+        super(ConfigWorker, self).__init__(window)
+        self.tasks = queue.PriorityQueue()
+        self._sequence = itertools.count()
+
+    def add(self, priority, func):
+        """Queue a function to run on the thread."""
+        self.tasks.put((priority, next(self._sequence), func))
+
+    def run(self):
+        while not self.should_exit:
+            try:
+                priority, _, func = self.tasks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if func is None:
+                break
+            try:
+                func()
+            except rust_proc.ProcessTerminatedError:
+                break
+            except Exception:
+                if priority == self.LOAD:
+                    log.critical(self.window,
+                        'Rust Enhanced Internal Error: %s',
+                        traceback.format_exc())
                 else:
-                    shorthand = channel
-                if shorthand not in shorthands:
-                    shorthands.append(shorthand)
-        result = shorthands + output
-        result.sort()
-        return result
+                    # Prefetch errors are reported when the question is
+                    # asked.
+                    log.log(self.window, 'Cargo config prefetch failed: %s',
+                            traceback.format_exc(), category='config')
+
+    def terminate(self):
+        super(ConfigWorker, self).terminate()
+        # Wake up the thread.
+        self.add(-1, None)
 
 
 class CargoConfigPackage(CargoConfigBase):
@@ -498,29 +648,19 @@ class CargoSetTriple(CargoConfigBase):
 
     config_name = 'Triple'
     sequence = ['which', 'toolchain', 'target_triple']
+    background_questions = CargoConfigBase.background_questions + \
+        ('target_triple',)
     toolchain_allows_default = False
 
     def items_target_triple(self):
-        # Could check if rustup is not installed, to run
-        # "rustc --print target-list", but that does not tell
-        # us which targets are installed.
-
         # The target list depends on the toolchain used.
-        cmd = 'rustup target list --toolchain=%s' % self.choices['toolchain']
-        triples = rust_proc.check_output(self.window, cmd.split(), None)\
-            .splitlines()
+        triples = toolchains.target_triples(self.window,
+                                            self.choices['toolchain'])
         current = self.get_setting('target_triple')
         result = [('Use Default', None)]
-        for triple in triples:
-            if triple.endswith(' (default)'):
-                actual_triple = triple[:-10]
-                result.append((actual_triple, actual_triple))
-            elif triple.endswith(' (installed)'):
-                actual_triple = triple[:-12]
-                result.append((actual_triple, actual_triple))
-            else:
-                actual_triple = None
-            # Don't bother listing uninstalled targets.
+        for triple, is_default in triples:
+            label = triple + ' (default)' if is_default else triple
+            result.append((label, triple))
         return {
             'items': result,
             'default': current
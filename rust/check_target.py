@@ -0,0 +1,218 @@
+"""Target directories used by checks.
+
+Cargo locks the target directory while it runs, and switching between
+`cargo check --profile=test` and a build with different features
+invalidates the fingerprints of the other.  With
+`rust_syntax_checking_target_dir` enabled, on-save checks use a separate,
+persistent `CARGO_TARGET_DIR` per workspace so that they never wait for a
+build and stay incremental.  Checks of unsaved buffers (see `shadow`) always
+use their own directory.
+
+The directories are kept under `rust_check_target_root` (Sublime's cache
+directory by default).  Their sizes are measured in the background after a
+check (at most every `MEASURE_INTERVAL` seconds per directory) and kept in
+an index in the cache directory.  When the total exceeds
+`rust_check_target_max_size`, the least recently used directories are
+removed.  Directories in use by a running check are never removed.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+import sublime
+
+from . import util, log
+
+# Version of the on-disk format, bump when it changes.
+INDEX_VERSION = 1
+# Minimum seconds between measuring the size of a directory.
+MEASURE_INTERVAL = 300
+
+_LOCK = threading.Lock()
+# Dictionary of target directory to `{'workspace', 'last_used', 'size',
+# 'measured'}`, None if not loaded yet.
+_INDEX = None
+# Dictionary of target directory to the number of checks using it.
+_IN_USE = {}
+# True while a background thread is measuring or pruning.
+_BUSY = False
+
+
+def _index_path():
+    return os.path.join(sublime.cache_path(), 'RustEnhanced',
+                        'check_target.json')
+
+
+def _load():
+    global _INDEX
+    if _INDEX is not None:
+        return _INDEX
+    _INDEX = {}
+    data = util.load_json_cache(_index_path(), INDEX_VERSION)
+    if data is not None:
+        _INDEX = data['dirs']
+    return _INDEX
+
+
+def _save():
+    data = {'version': INDEX_VERSION, 'dirs': _INDEX}
+    util.save_json_cache(_index_path(), data, 'check target index')
+
+
+def enabled():
+    """Whether on-save checks use a separate target directory."""
+    return util.get_setting('rust_syntax_checking_target_dir', False)
+
+
+def root():
+    """Directory containing the check target directories."""
+    path = util.get_setting('rust_check_target_root', '')
+    if path:
+        return os.path.expanduser(os.path.expandvars(path))
+    return os.path.join(sublime.cache_path(), 'RustEnhanced', 'target')
+
+
+def target_dir(workspace, kind='check'):
+    """Returns the target directory for checks of a workspace.
+
+    :param kind: 'check' for on-save checks, 'shadow' for checks of unsaved
+        buffers.
+    """
+    digest = hashlib.sha1(workspace.encode('utf-8')).hexdigest()[:16]
+    name = '%s-%s' % (os.path.basename(workspace) or 'root', digest)
+    if kind != 'check':
+        name += '-' + kind
+    return os.path.join(root(), name)
+
+
+def acquire(path, workspace):
+    """Mark a target directory as in use by a check."""
+    with _LOCK:
+        _IN_USE[path] = _IN_USE.get(path, 0) + 1
+        entry = _load().setdefault(path, {'size': None, 'measured': 0})
+        entry['workspace'] = workspace
+        entry['last_used'] = time.time()
+
+
+def release(window, path):
+    """Mark a check using a target directory as finished.
+
+    Measures the directory and prunes old directories on a background
+    thread if it has not been measured recently.
+    """
+    global _BUSY
+    with _LOCK:
+        _IN_USE[path] -= 1
+        if not _IN_USE[path]:
+            del _IN_USE[path]
+        entry = _load().get(path)
+        due = entry is not None and \
+            time.time() - entry['measured'] >= MEASURE_INTERVAL
+        if not due or _BUSY:
+            _save()
+            return
+        _BUSY = True
+
+    def run():
+        global _BUSY
+        try:
+            measure(window, path)
+            prune(window)
+        except Exception as e:
+            log.critical(window, 'Rust Enhanced: Failed to prune %s: %s',
+                         root(), e, category='check')
+        finally:
+            with _LOCK:
+                _BUSY = False
+
+    t = threading.Thread(target=run, name='Rust Check Target Pruning')
+    t.daemon = True
+    t.start()
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def measure(window, path):
+    """Update the size of a target directory in the index.
+
+    :returns: The size in bytes.
+    """
+    size = _dir_size(path)
+    log.log(window, 'Check target %s uses %.1f MiB', path,
+            size / 1024 / 1024, category='check')
+    with _LOCK:
+        entry = _load().get(path)
+        if entry is not None:
+            entry['size'] = size
+            entry['measured'] = time.time()
+            _save()
+    return size
+
+
+def total_size():
+    """Returns the total size in bytes of the target directories, as of
+    when they were last measured."""
+    with _LOCK:
+        return sum(entry['size'] or 0 for entry in _load().values())
+
+
+def prune(window, max_size=None):
+    """Remove the least recently used target directories until the total
+    size is at most `max_size` bytes.
+
+    :param max_size: Defaults to the `rust_check_target_max_size` setting
+        (in MiB).  0 disables pruning.
+    :returns: List of removed directories.
+    """
+    if max_size is None:
+        max_size = util.get_setting('rust_check_target_max_size',
+                                    4096) * 1024 * 1024
+    # Leftovers of a removal that was interrupted would prevent moving a
+    # directory of the same name out of the way.
+    try:
+        names = os.listdir(root())
+    except OSError:
+        names = []
+    for name in names:
+        if name.endswith('.removing'):
+            shutil.rmtree(os.path.join(root(), name), ignore_errors=True)
+    with _LOCK:
+        index = _load()
+        for path in list(index):
+            if not os.path.isdir(path) and path not in _IN_USE:
+                del index[path]
+        total = sum(entry['size'] or 0 for entry in index.values())
+        candidates = sorted((entry['last_used'], path)
+                            for path, entry in index.items()
+                            if path not in _IN_USE)
+        removed = []
+        for _, path in candidates:
+            if not max_size or total <= max_size:
+                break
+            # Moved out of the way while holding the lock, so that a check
+            # starting now does not use a directory being removed.
+            try:
+                os.rename(path, path + '.removing')
+            except OSError as e:
+                log.critical(window, 'Failed to remove check target %s: %s',
+                             path, e, category='check')
+                continue
+            total -= index.pop(path)['size'] or 0
+            removed.append(path)
+        _save()
+    for path in removed:
+        log.log(window, 'Removing check target %s', path, category='check')
+        shutil.rmtree(path + '.removing', ignore_errors=True)
+    return removed
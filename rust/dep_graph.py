@@ -0,0 +1,225 @@
+"""Dependencies between the packages of a Cargo workspace.
+
+`get_cargo_metadata` uses `--no-deps`, which does not say which workspace
+members depend on each other.  This loads the full metadata (which includes
+Cargo's dependency resolution) to build a graph of the dependencies between
+workspace members.  Loading the full metadata can be slow, so the graph is
+cached in memory and in Sublime's cache directory, and is only loaded again
+when `Cargo.lock` or one of the manifests of the workspace changes.
+
+Resolving dependencies may need the network (for example, if `Cargo.lock` is
+missing), so the metadata is loaded with `--offline` (Cargo 1.36 or newer).
+If that fails, there is no graph until the workspace manifest or
+`Cargo.lock` changes.
+
+The on-save checker uses this to also check the packages that depend on the
+package of the saved file (see `rust_syntax_checking_dependents`).
+"""
+
+import os
+import threading
+
+import sublime
+
+from . import util, log, semver
+
+# Version of the on-disk format, bump when it changes.
+GRAPH_VERSION = 1
+
+_LOCK = threading.Lock()
+# Dictionary of workspace root to the JSON of a graph, None if not loaded
+# yet.
+_GRAPHS = None
+# Dictionary of workspace root to the stamp (see `_workspace_stamp`) of a
+# failed attempt to load the graph.
+_FAILED = {}
+
+
+def _graph_path():
+    return os.path.join(sublime.cache_path(), 'RustEnhanced',
+                        'dep_graph.json')
+
+
+def _load():
+    global _GRAPHS
+    if _GRAPHS is not None:
+        return _GRAPHS
+    _GRAPHS = {}
+    data = util.load_json_cache(_graph_path(), GRAPH_VERSION)
+    if data is not None:
+        _GRAPHS = data['workspaces']
+    return _GRAPHS
+
+
+def _save():
+    data = {'version': GRAPH_VERSION, 'workspaces': _GRAPHS}
+    util.save_json_cache(_graph_path(), data, 'dependency graph')
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _workspace_stamp(workspace):
+    return (_mtime(os.path.join(workspace, 'Cargo.toml')),
+            _mtime(os.path.join(workspace, 'Cargo.lock')))
+
+
+class DependencyGraph:
+
+    """Graph of the dependencies between the members of a workspace.
+
+    :ivar packages: Dictionary of package ID to the package directory.
+    :ivar deps: Dictionary of package ID to the set of IDs of the workspace
+        members it depends on (of any kind: normal, dev, or build).
+    :ivar stamp: Dictionary of the path of each file the graph was built from
+        (`Cargo.lock` and the manifests) to its modification time.
+    """
+
+    def __init__(self, packages, deps, stamp=None):
+        self.packages = packages
+        self.deps = deps
+        self.stamp = stamp or {}
+
+    @classmethod
+    def from_metadata(cls, metadata, workspace):
+        """Build the graph from the output of `cargo metadata` (without
+        `--no-deps`)."""
+        members = set(metadata['workspace_members'])
+        packages = {}
+        for package in metadata['packages']:
+            if package['id'] in members:
+                packages[package['id']] = os.path.dirname(
+                    package['manifest_path'])
+        deps = {pid: set() for pid in packages}
+        for node in (metadata.get('resolve') or {}).get('nodes', []):
+            if node['id'] not in members:
+                continue
+            if 'deps' in node:
+                ids = [dep['pkg'] for dep in node['deps']]
+            else:
+                # Cargo before 1.30.
+                ids = node.get('dependencies', [])
+            deps[node['id']] = set(i for i in ids if i in members)
+        paths = [os.path.join(workspace, 'Cargo.toml'),
+                 os.path.join(workspace, 'Cargo.lock')]
+        paths.extend(os.path.join(d, 'Cargo.toml') for d in packages.values())
+        stamp = {path: _mtime(path) for path in paths}
+        return cls(packages, deps, stamp)
+
+    def is_stale(self):
+        """Whether any of the files the graph was built from changed."""
+        return any(_mtime(path) != mtime
+                   for path, mtime in self.stamp.items())
+
+    def package_for_path(self, path):
+        """Returns the ID of the package containing the file, or None."""
+        best = None
+        best_len = -1
+        for pid, directory in self.packages.items():
+            if path.startswith(os.path.join(directory, '')) and \
+                    len(directory) > best_len:
+                best = pid
+                best_len = len(directory)
+        return best
+
+    def reverse_dependents(self, package_id):
+        """Returns the set of IDs of all packages that depend (directly or
+        indirectly) on the given package."""
+        rdeps = {}
+        for pid, deps in self.deps.items():
+            for dep in deps:
+                rdeps.setdefault(dep, set()).add(pid)
+        result = set()
+        todo = [package_id]
+        while todo:
+            for pid in rdeps.get(todo.pop(), ()):
+                if pid not in result and pid != package_id:
+                    result.add(pid)
+                    todo.append(pid)
+        return result
+
+    def to_json(self):
+        return {
+            'packages': self.packages,
+            'deps': {pid: sorted(deps) for pid, deps in self.deps.items()},
+            'stamp': self.stamp,
+        }
+
+    @classmethod
+    def from_json(cls, d):
+        return cls(d['packages'],
+                   {pid: set(deps) for pid, deps in d['deps'].items()},
+                   d['stamp'])
+
+
+def get_graph(window, cwd, toolchain=None, rustc_version=None):
+    """Returns the `DependencyGraph` of the workspace containing `cwd`, or
+    None if it could not be loaded.
+
+    :param rustc_version: Version of the toolchain, the graph is only loaded
+        if it supports `--offline`.
+    :raises ProcessTerminatedError: Process was terminated by another thread.
+    """
+    workspace = util.find_workspace_root(cwd)
+    if workspace is None:
+        return None
+    with _LOCK:
+        d = _load().get(workspace)
+    if d is not None:
+        graph = DependencyGraph.from_json(d)
+        if not graph.is_stale():
+            return graph
+    if rustc_version and not semver.match(rustc_version, '>=1.36.0'):
+        return None
+    stamp = _workspace_stamp(workspace)
+    with _LOCK:
+        if _FAILED.get(workspace) == stamp:
+            return None
+    from . import rust_proc
+    cmd = ['cargo']
+    if toolchain:
+        cmd.append('+' + toolchain)
+    cmd.extend(['metadata', '--format-version', '1', '--offline'])
+    log.log(window, 'Loading dependency graph of %s', workspace,
+            category='check')
+    output = rust_proc.slurp_json(window, cmd, cwd=workspace)
+    if not output:
+        log.log(window, 'Not checking dependents of %s until its manifest or '
+                'Cargo.lock changes', workspace, category='check')
+        with _LOCK:
+            _FAILED[workspace] = stamp
+        return None
+    graph = DependencyGraph.from_metadata(output[0], workspace)
+    with _LOCK:
+        _FAILED.pop(workspace, None)
+        _load()[workspace] = graph.to_json()
+        _save()
+    return graph
+
+
+def open_dependents(window, graph, file_name):
+    """Find the packages depending on the package of a file that have a file
+    open in the window.
+
+    :returns: List of `(package_dir, open_file)` with one open file of each
+        dependent package, sorted by package directory.
+    """
+    package_id = graph.package_for_path(file_name)
+    if package_id is None:
+        return []
+    dependents = graph.reverse_dependents(package_id)
+    if not dependents:
+        return []
+    result = {}
+    for view in window.views():
+        path = view.file_name()
+        if not path or not path.endswith('.rs'):
+            continue
+        pid = graph.package_for_path(path)
+        if pid in dependents and pid not in result:
+            result[pid] = path
+    return sorted((graph.packages[pid], path) for pid, path in result.items())
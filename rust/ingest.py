@@ -0,0 +1,105 @@
+"""Background processing of compiler messages.
+
+Converting the JSON diagnostics from rustc to `Message` objects involves a
+fair amount of filesystem access (resolving paths, checking if files exist,
+etc.).  `MessageIngester` does that work on a dedicated thread so that the
+thread reading the process output is not held up.  The finished batches are
+handed to Sublime's main thread in groups, where they are stored and
+displayed.
+"""
+
+import queue
+import threading
+import traceback
+
+import sublime
+
+from . import messages, log
+
+
+class MessageIngester:
+
+    """Processes JSON messages from rustc on a background thread.
+
+    Typical usage from a `ProcListener`::
+
+        ingester = MessageIngester(window, base_path, target_path)
+        # For each JSON object (from the process reader thread):
+        ingester.add(info)
+        # After the process has finished:
+        ingester.finish()
+
+    `finish` must not be called from Sublime's main thread, since it waits
+    for the main thread to store the messages.
+
+    :ivar count: Number of primary messages that have been ingested.
+    """
+
+    def __init__(self, window, base_path, target_path, partition=None):
+        """
+        See `messages.add_rust_messages` for a description of the
+        parameters.
+        """
+        self.window = window
+        self.base_path = base_path
+        self.target_path = target_path
+        self.partition = partition
+        self.count = 0
+        self._queue = queue.Queue()
+        # List of batch lists waiting to be stored on the main thread.
+        self._ready = []
+        self._ready_lock = threading.Lock()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+            name='%s: Ingest' % (threading.current_thread().name,))
+        self._thread.start()
+
+    def add(self, info):
+        """Queue a JSON message from rustc or cargo for processing."""
+        self._queue.put(info)
+
+    def finish(self):
+        """Wait for all queued messages to be processed and stored."""
+        self._queue.put(None)
+        self._thread.join()
+        self._finished.wait()
+
+    def _run(self):
+        paths = messages.PathResolver(self.window)
+        while True:
+            info = self._queue.get()
+            if info is None:
+                break
+            try:
+                batches = messages.prepare_rust_messages(
+                    self.window, self.base_path, info, self.target_path,
+                    None, paths)
+            except Exception:
+                log.critical(self.window,
+                    'Rust Enhanced Internal Error: %s', traceback.format_exc())
+                continue
+            if not batches:
+                continue
+            self.count += 1
+            with self._ready_lock:
+                self._ready.append(batches)
+                schedule = len(self._ready) == 1
+            if schedule:
+                # Anything that arrives before the main thread gets around to
+                # it will be stored in the same call.
+                sublime.set_timeout(self._store, 0)
+        sublime.set_timeout(self._finish_store, 0)
+
+    def _store(self):
+        with self._ready_lock:
+            ready = self._ready
+            self._ready = []
+        for batches in ready:
+            messages.store_rust_messages(self.window, batches, None,
+                                         self.partition)
+
+    def _finish_store(self):
+        try:
+            self._store()
+        finally:
+            self._finished.set()
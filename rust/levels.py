@@ -2,49 +2,56 @@ import sublime
 from . import log
 
 
-class Level:
+class Level(int):
 
-    def __init__(self, order, name, plural):
-        self.order = order
+    """A message level.
+
+    Levels are ints (the sort order, most severe first) so that comparing,
+    hashing and sorting them is as fast as possible.  There is exactly one
+    instance per level (see `LEVELS`), so they can also be compared by
+    identity.  Use `name` (or `str()`) to get the text of the level.
+    """
+
+    def __new__(cls, order, name, plural):
+        self = super(Level, cls).__new__(cls, order)
         self.name = name
         self.plural = plural
+        return self
 
-    def __hash__(self):
-        return hash(self.name)
+    @property
+    def order(self):
+        return int(self)
 
-    def __eq__(self, other):
-        if isinstance(other, Level):
-            return self.name == other.name
-        elif isinstance(other, str):
-            return self.name == other
-        else:
-            return False
+    def __str__(self):
+        return self.name
 
-    def __lt__(self, other):
-        return self.order < other.order
+    def __format__(self, spec):
+        return format(self.name, spec)
 
-    def __le__(self, other):
-        return self.order <= other.order
+    def __repr__(self):
+        return self.name
 
-    def __gt__(self, other):
-        return self.order > other.order
+    def __reduce__(self):
+        return (level_from_str, (self.name,))
 
-    def __ge__(self, other):
-        return self.order >= other.order
 
-    def __repr__(self):
-        return self.name
+ERROR = Level(0, 'error', 'errors')
+WARNING = Level(1, 'warning', 'warnings')
+NOTE = Level(2, 'note', 'notes')
+HELP = Level(3, 'help', 'help')
 
+# All levels, indexed by their order.
+ALL_LEVELS = (ERROR, WARNING, NOTE, HELP)
 
 LEVELS = {
-    'error': Level(0, 'error', 'errors'),
-    'warning': Level(1, 'warning', 'warnings'),
-    'note': Level(2, 'note', 'notes'),
-    'help': Level(3, 'help', 'help'),
+    'error': ERROR,
+    'warning': WARNING,
+    'note': NOTE,
+    'help': HELP,
     # This is "FailureNote", see https://github.com/rust-lang/rust/issues/60425.
     # Currently we filter all these out ("For more information..."), but
     # handle it just in case new ones are added.
-    '': Level(4, 'note', 'note'),
+    '': NOTE,
 }
 
 
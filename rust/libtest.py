@@ -0,0 +1,179 @@
+"""Support for the output of the Rust test harness (libtest).
+
+When the `rust_test_json` setting is enabled, `cargo test` is run with
+`--format=json` which causes the test harness to emit one JSON event per
+line.  This is an unstable option, so it is only used with a nightly
+compiler.  The events are collected into a `TestRun`.  Without JSON, only
+the names of failed tests are picked out of the text output.
+
+The failures of the most recent test run in each window are remembered so
+that they can be run again.
+"""
+
+import os
+import re
+
+from . import util
+
+# Map Sublime window ID to `(working_dir, [TestResult, ...])` of the failures
+# of the last test run in the window.
+LAST_FAILURES = {}
+
+# Arguments passed to the test harness to enable JSON output.
+JSON_ARGS = ['-Z', 'unstable-options', '--format=json', '--report-time']
+
+# Location of a panic in the captured output of a failed test.  Handles both
+# `panicked at 'msg', src/lib.rs:1:2` and `panicked at src/lib.rs:1:2:`.
+PANIC_LOCATION_RE = re.compile(
+    r"panicked at (?:'.*?', )?([^,<\n]*\.rs):([0-9]+):([0-9]+)", re.S)
+
+# Line printed by Cargo before running a test binary.  Newer versions
+# include the source file of the target.
+RUNNING_RE = re.compile(
+    r'^\s*Running (?:[a-z]+ )?(?:(\S+) \()?(\S+?)\)?$')
+# Line printed by Cargo before running doc tests.
+DOC_TESTS_RE = re.compile(r'^\s*Doc-tests \S+$')
+# Line printed by the test harness (in text mode) for a failed test.
+FAILED_RE = re.compile(r'^test (.+) \.\.\. FAILED$')
+
+
+def json_available(rustc_version):
+    """Returns True if JSON output is enabled and supported by the given
+    rustc version."""
+    if not util.get_setting('rust_test_json', False):
+        return False
+    return 'nightly' in rustc_version or 'dev' in rustc_version
+
+
+def add_json_args(cmd):
+    """Add the arguments to enable JSON output to a `cargo test` command
+    (list of strings), modified in place."""
+    if '--' not in cmd:
+        cmd.append('--')
+    cmd.extend(JSON_ARGS)
+
+
+def panic_location(output):
+    """Find the location of a panic in the output of a failed test.
+
+    :returns: `(path, line, column)` with 1-based line and column as
+        reported by Rust, or None if not found.
+    """
+    m = PANIC_LOCATION_RE.search(output)
+    if m:
+        return m.group(1), int(m.group(2)), int(m.group(3))
+    return None
+
+
+def parse_time(value):
+    """Older versions report times as a string like "0.001s"."""
+    if isinstance(value, str):
+        try:
+            return float(value.rstrip('s'))
+        except ValueError:
+            return None
+    return value
+
+
+class TestResult:
+
+    """The result of a single test.
+
+    :ivar name: The full name of the test (such as `tests::foo`).
+    :ivar binary: File name of the test executable, or None if not known.
+    :ivar source: Path (relative to the package) of the top-level source
+        file of the target, or None if not known.
+    :ivar doc: True if this is a doc test.
+    :ivar outcome: One of 'ok', 'failed', or 'ignored'.
+    :ivar exec_time: Time in seconds the test took to run, or None.
+    :ivar stdout: The captured output of the test (for failures), or None.
+    """
+
+    def __init__(self, name, binary, outcome, exec_time=None, stdout=None,
+                 source=None, doc=False):
+        self.name = name
+        self.binary = binary
+        self.source = source
+        self.doc = doc
+        self.outcome = outcome
+        self.exec_time = exec_time
+        self.stdout = stdout
+
+    def __repr__(self):
+        return '<TestResult %s %s>' % (self.name, self.outcome)
+
+
+class TestRun:
+
+    """Collects the results of the test binaries run by `cargo test`.
+
+    :ivar results: List of `TestResult` in the order they finished.
+    :ivar suites: List of the final `suite` events (one per test binary).
+    :ivar binary: The test binary currently running (from Cargo's "Running"
+        line), or None.
+    :ivar source: The source file of the target currently running, or None.
+    :ivar doc: True if doc tests are running.
+    """
+
+    def __init__(self):
+        self.results = []
+        self.suites = []
+        self.binary = None
+        self.source = None
+        self.doc = False
+
+    def on_output(self, line):
+        """Process a line of non-JSON output."""
+        line = line.rstrip('\n')
+        m = RUNNING_RE.match(line)
+        if m:
+            self.source = m.group(1)
+            self.binary = os.path.basename(m.group(2))
+            self.doc = False
+            return
+        if DOC_TESTS_RE.match(line):
+            self.source = self.binary = None
+            self.doc = True
+            return
+        m = FAILED_RE.match(line)
+        if m:
+            self.results.append(self._result(m.group(1), 'failed'))
+
+    def _result(self, name, outcome, exec_time=None, stdout=None):
+        return TestResult(name, self.binary, outcome, exec_time, stdout,
+                          self.source, self.doc)
+
+    def on_event(self, event):
+        """Process a JSON event from the test harness.
+
+        :returns: The `TestResult` if the event finished a test, otherwise
+            None.
+        """
+        if event.get('type') == 'suite':
+            if event.get('event') in ('ok', 'failed'):
+                self.suites.append(event)
+            return None
+        if event.get('type') != 'test' or \
+                event.get('event') not in ('ok', 'failed', 'ignored'):
+            # 'started' and 'timeout' (test is running for a long time).
+            return None
+        result = self._result(event.get('name'), event.get('event'),
+                              parse_time(event.get('exec_time')),
+                              event.get('stdout'))
+        self.results.append(result)
+        return result
+
+    def failed(self):
+        """Returns a list of the `TestResult` objects that failed."""
+        return [r for r in self.results if r.outcome == 'failed']
+
+
+def record_failures(window, working_dir, test_run):
+    """Remember the failures of a test run in the window."""
+    LAST_FAILURES[window.id()] = (working_dir, test_run.failed())
+
+
+def last_failures(window):
+    """Returns `(working_dir, [TestResult, ...])` of the failures of the last
+    test run in the window, or None if there is no run."""
+    return LAST_FAILURES.get(window.id())
@@ -1,39 +1,94 @@
-"""Debug logging support."""
+"""Debug logging support.
 
-import sublime_plugin
+Each window keeps the most recent log messages in a ring buffer (the size
+is set by `rust_log_max_messages`).  Messages are stored unformatted along
+with their level, category, and time, and are only rendered when shown in
+the log view or exported.  Messages are appended to an open log view in
+batches, so that a noisy build does not run a view command per line.
+"""
+
+import collections
+import os
+import threading
 import time
 
+import sublime
+import sublime_plugin
+
 
 logs = {}
 
+# Delay (ms) before appending pending messages to an open log view.
+FLUSH_DELAY = 100
+DEFAULT_MAX_MESSAGES = 10000
+
+# Levels of log messages.
+DEBUG = 'debug'
+CRITICAL = 'critical'
+
+
+def _max_messages():
+    from . import util
+    return util.get_setting('rust_log_max_messages', DEFAULT_MAX_MESSAGES)
+
 
 class WindowLog:
 
-    """Collection of log messages tied to a window."""
+    """Collection of log messages tied to a window.
+
+    :ivar messages: Deque of `LogMessage`, oldest first.
+    :ivar categories: Set of categories to show in the view, or None for
+        all categories.
+    """
 
     view = None
 
-    def __init__(self):
-        self.messages = []
+    def __init__(self, window_id, maxlen=None):
+        self.window_id = window_id
+        if maxlen is None:
+            maxlen = _max_messages()
+        self.messages = collections.deque(maxlen=maxlen)
+        self.categories = None
+        # Messages not yet appended to the view.
+        self._pending = []
+        self._flush_scheduled = False
+        # Lock for `_pending` and `_flush_scheduled`, messages are added from
+        # any thread.
+        self._lock = threading.Lock()
 
     def clear(self):
         self.messages.clear()
+        with self._lock:
+            self._pending = []
         if self.view:
             self.view.run_command("select_all")
             self.view.run_command("right_delete")
 
-    def add_message(self, msg, args):
+    def add_message(self, msg, args, level=DEBUG, category='general'):
         if self.messages:
             previous_time = self.messages[-1].time
         else:
             previous_time = None
-        lm = LogMessage(msg, args, previous_time)
+        lm = LogMessage(msg, args, previous_time, level, category,
+                        self.window_id)
         self.messages.append(lm)
-        self._display_message(lm)
+        if self.view and self._is_shown(lm):
+            with self._lock:
+                self._pending.append(lm)
+                schedule = not self._flush_scheduled
+                self._flush_scheduled = True
+            if schedule:
+                sublime.set_timeout(self._flush, FLUSH_DELAY)
 
-    def _display_message(self, msg):
-        if self.view:
-            text = msg.render()
+    def _is_shown(self, msg):
+        return self.categories is None or msg.category in self.categories
+
+    def _flush(self):
+        with self._lock:
+            self._flush_scheduled = False
+            pending, self._pending = self._pending, []
+        if self.view and pending:
+            text = ''.join(msg.render() for msg in pending)
             self.view.run_command('append', {'characters': text,
                                              'scroll_to_end': True})
 
@@ -44,43 +99,83 @@ class WindowLog:
         view.settings().set('word_wrap', True)
         view.set_name('Rust Enhanced Debug Log')
         self.view = view
-        for m in self.messages:
-            self._display_message(m)
+        self.redraw()
+
+    def redraw(self):
+        """Replace the contents of the view, such as after changing the
+        filter."""
+        if not self.view:
+            return
+        self.view.run_command("select_all")
+        self.view.run_command("right_delete")
+        # Messages are appended from other threads, iterate over a copy.
+        messages = list(self.messages)
+        with self._lock:
+            self._pending = [m for m in messages if self._is_shown(m)]
+        self._flush()
+
+    def all_categories(self):
+        return sorted(set(m.category for m in list(self.messages)))
+
+    def export(self, path):
+        """Write all messages (ignoring the filter) to a file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for msg in list(self.messages):
+                f.write(msg.render(absolute=True))
 
 
 class LogMessage:
-    def __init__(self, msg, args, previous_time):
+    def __init__(self, msg, args, previous_time, level=DEBUG,
+                 category='general', window_id=None):
         self.msg = msg
         self.args = args
         self.previous_time = previous_time
         self.time = time.time()
+        self.level = level
+        self.category = category
+        self.window_id = window_id
 
-    def render(self):
-        if self.previous_time is None:
-            last_time = '+0.000'
-        else:
-            last_time = '+%.3f' % (self.time - self.previous_time,)
+    def text(self):
         if self.args:
-            rendered = self.msg % self.args
+            return self.msg % self.args
+        else:
+            return self.msg
+
+    def render(self, absolute=False):
+        if absolute:
+            when = time.strftime('%Y-%m-%d %H:%M:%S',
+                                 time.localtime(self.time))
+            when += '.%03d' % (int(self.time * 1000) % 1000,)
+        elif self.previous_time is None:
+            when = '+0.000'
         else:
-            rendered = self.msg
-        return '%s %s\n' % (last_time, rendered.rstrip())
+            when = '+%.3f' % (self.time - self.previous_time,)
+        level = ' %s' % (self.level.upper(),) if self.level != DEBUG else ''
+        return '%s [%s]%s %s\n' % (when, self.category, level,
+                                   self.text().rstrip())
 
 
-def critical(window, msg, *args):
+def _window_log(window):
+    wid = window.id() if window else None
+    try:
+        return logs[wid]
+    except KeyError:
+        wlog = logs[wid] = WindowLog(wid)
+        return wlog
+
+
+def critical(window, msg, *args, category='general'):
     """Add a log message and display it to the console."""
-    log(window, msg, *args)
+    _window_log(window).add_message(msg, args, CRITICAL, category)
     if args:
         print(msg % args)
     else:
         print(msg)
 
 
-def log(window, msg, *args):
+def log(window, msg, *args, category='general'):
     """Add a log message."""
-    global logs
-    wlog = logs.setdefault(window.id(), WindowLog())
-    wlog.add_message(msg, args)
+    _window_log(window).add_message(msg, args, DEBUG, category)
 
 
 def clear_log(window):
@@ -97,13 +192,57 @@ class RustOpenLog(sublime_plugin.WindowCommand):
     plugin."""
 
     def run(self):
-        wlog = logs.setdefault(self.window.id(), WindowLog())
+        wlog = _window_log(self.window)
         if wlog.view:
             self.window.focus_view(wlog.view)
         else:
             wlog.open_view(self.window)
 
 
+class RustFilterLog(sublime_plugin.WindowCommand):
+
+    """Choose which category of log messages to show in the log view."""
+
+    def run(self):
+        wlog = _window_log(self.window)
+        categories = wlog.all_categories()
+        items = ['All categories'] + categories
+
+        def on_done(idx):
+            if idx == -1:
+                return
+            wlog.categories = None if idx == 0 else {categories[idx - 1]}
+            if wlog.view:
+                wlog.redraw()
+                self.window.focus_view(wlog.view)
+            else:
+                wlog.open_view(self.window)
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class RustExportLog(sublime_plugin.WindowCommand):
+
+    """Save all log messages of the window to a file."""
+
+    def run(self):
+        wlog = _window_log(self.window)
+        default = os.path.join(os.path.expanduser('~'),
+                               'rust-enhanced-log.txt')
+
+        def on_done(path):
+            path = os.path.expanduser(path)
+            try:
+                wlog.export(path)
+            except OSError as e:
+                sublime.error_message('Failed to save log: %s' % (e,))
+            else:
+                sublime.status_message('Saved log to %s' % (path,))
+
+        self.window.show_input_panel('Save log to:', default, on_done,
+                                     None, None)
+
+
 class RustLogEvent(sublime_plugin.ViewEventListener):
 
     @classmethod
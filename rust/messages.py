@@ -2,6 +2,7 @@
 
 import sublime
 
+import bisect
 import collections
 import functools
 import html
@@ -9,11 +10,12 @@ import itertools
 import os
 import re
 import textwrap
+import threading
 import urllib.parse
 import uuid
 import webbrowser
 
-from . import util, themes, log
+from . import util, themes, log, profile, rendered
 from .batch import *
 from .levels import *
 
@@ -21,12 +23,27 @@ from .levels import *
 # Value is a dictionary: {
 #     'paths': {path: [MessageBatch, ...]},
 #     'batch_index': (path_idx, message_idx),
-#     'hidden': bool
+#     'hidden': bool,
+#     'next_region_key': int,
+#     'pending': {partition: {...}},
+#     'level_counts': [int, ...],
 # }
 # `paths` is an OrderedDict to handle next/prev message.
 # `path` is the absolute path to the file.
 # `hidden` indicates that all messages have been dismissed.
+# `next_region_key` is a counter used to generate unique region keys.
+# `pending` tracks partitions that are in the process of being replaced (see
+# `begin_partition`).
+# `level_counts` is the number of primary batches at each level, indexed by
+# the level (see `levels.ALL_LEVELS`).
+#
+# Each batch has a `partition` attribute which identifies which compilation
+# produced it (see `add_rust_messages`).  This allows replacing the messages
+# of one target without disturbing the others.
 WINDOW_MESSAGES = {}
+# Builds, on-save checks and the UI thread all add and remove messages, so
+# changes to WINDOW_MESSAGES are made while holding this lock.
+_LOCK = threading.RLock()
 
 
 LINK_PATTERN = r'(https?://[-a-zA-Z0-9@:%._+~#=]{2,256}\.[a-zA-Z]{2,6}\b[-a-zA-Z0-9@:%_+.~#?&/=]*)'
@@ -178,6 +195,13 @@ class Message:
         else:
             return True
 
+    def signature(self):
+        """Returns a hashable value that is equal for similar messages (see
+        `is_similar`).  Used to detect messages that have not changed between
+        builds."""
+        return (self.path, self.span, self.level.name, self.text,
+                self.suggested_replacement)
+
     def sublime_region(self, view):
         """Returns a sublime.Region object for this message."""
         if self.span:
@@ -208,26 +232,159 @@ class Message:
         return ''.join(result)
 
 
-def clear_messages(window, soft=False):
+def clear_messages(window, soft=False, partitions=None, keep_pending=False):
     """Remove all messages for the given window.
 
     :param soft: If True, the messages are kept in memory and can be
         resurrected with various commands (such as list messages, or
         next/prev).
+    :param partitions: If set, only remove messages belonging to the given
+        list of partitions (see `add_rust_messages`).  Messages from other
+        partitions are left intact.  Cannot be combined with `soft`.
+    :param keep_pending: If True, messages of partitions that are currently
+        being replaced (see `begin_partition`) are left intact, so that an
+        on-save check still running can finish.  Cannot be combined with
+        `soft`.
     """
-    if soft:
-        winfo = WINDOW_MESSAGES.get(window.id(), {})
-        winfo['hidden'] = True
-    else:
-        winfo = WINDOW_MESSAGES.pop(window.id(), {})
+    with _LOCK:
+        if partitions is not None:
+            _clear_partitions(window, partitions)
+            return
+        if keep_pending:
+            winfo = WINDOW_MESSAGES.get(window.id())
+            if winfo and winfo.get('pending'):
+                pending = set(winfo['pending'])
+                _remove_batches(window, winfo,
+                                lambda batch: batch.partition not in pending)
+                return
+        if soft:
+            winfo = WINDOW_MESSAGES.get(window.id(), {})
+            winfo['hidden'] = True
+        else:
+            winfo = WINDOW_MESSAGES.pop(window.id(), {})
+            rendered.discard_window(window)
+
+        for path, batches in winfo.get('paths', {}).items():
+            views = util.open_views_for_file(window, path)
+            for view in views:
+                for batch in batches:
+                    for msg in batch:
+                        view.erase_regions(msg.region_key)
+                        view.erase_phantoms(msg.region_key)
+
+
+def _clear_partitions(window, partitions):
+    try:
+        winfo = WINDOW_MESSAGES[window.id()]
+    except KeyError:
+        return
+    _remove_batches(window, winfo,
+        lambda batch: batch.partition in partitions)
+    if winfo['hidden']:
+        # New messages are about to arrive, bring back the ones that were
+        # dismissed from other partitions.
+        redraw_all_open_views(window)
+
 
-    for path, batches in winfo.get('paths', {}).items():
+def _remove_batches(window, winfo, predicate):
+    """Remove all batches for which `predicate(batch)` is True, erasing any
+    regions and phantoms.
+
+    :returns: The number of primary batches removed.
+    """
+    count = 0
+    paths = winfo['paths']
+    for path, batches in list(paths.items()):
+        removed = [batch for batch in batches if predicate(batch)]
+        if not removed:
+            continue
         views = util.open_views_for_file(window, path)
         for view in views:
-            for batch in batches:
+            for batch in removed:
                 for msg in batch:
                     view.erase_regions(msg.region_key)
                     view.erase_phantoms(msg.region_key)
+        for batch in removed:
+            if isinstance(batch, PrimaryBatch):
+                count += 1
+                winfo['level_counts'][batch.first().level] -= 1
+                if batch.rendered_key is not None:
+                    rendered.spool(window).discard(batch.rendered_key)
+        kept = [batch for batch in batches if not predicate(batch)]
+        if kept:
+            paths[path] = kept
+        else:
+            del paths[path]
+    # Indexes are no longer valid.
+    winfo['batch_index'] = (-1, -1)
+    return count
+
+
+def begin_partition(window, partition):
+    """Start replacing the messages of the given partition.
+
+    The existing messages stay on screen while the new ones arrive through
+    `add_rust_messages`.  A new message that is identical to an existing one
+    (see `Message.signature`) retains the existing message without redrawing
+    it.  `end_partition` must be called once all messages have been added to
+    remove the messages that no longer exist.
+    """
+    with _LOCK:
+        winfo = _get_window_info(window)
+        if winfo['hidden']:
+            # All messages were dismissed, the new check should show them
+            # again.
+            redraw_all_open_views(window)
+        signatures = {}
+        stale = set()
+        for batches in winfo['paths'].values():
+            for batch in batches:
+                if batch.partition != partition or \
+                        not isinstance(batch, PrimaryBatch):
+                    continue
+                group = [batch] + batch.child_batches
+                stale.update(group)
+                # Messages that have been dismissed (or had a suggestion
+                # accepted) are always replaced so that they show up again.
+                if not any(b.hidden or any(m.hidden for m in b)
+                           for b in group):
+                    signature = _message_signature(batch.primary_message)
+                    signatures[signature] = batch
+        winfo['pending'][partition] = {
+            'signatures': signatures,
+            'stale': stale,
+            'retained': 0,
+            'added': 0,
+        }
+
+
+def end_partition(window, partition):
+    """Finish replacing the messages of the given partition (see
+    `begin_partition`), removing old messages that were not reported again.
+    """
+    with _LOCK:
+        try:
+            winfo = WINDOW_MESSAGES[window.id()]
+            pending = winfo['pending'].pop(partition)
+        except KeyError:
+            return
+        stale = pending['stale']
+        removed = _remove_batches(window, winfo, lambda batch: batch in stale)
+    log.log(window, 'Messages for %s: %i retained, %i added, %i removed',
+        partition, pending['retained'], pending['added'], removed,
+        category='messages')
+
+
+def _message_signature(primary_message):
+    """Signature of a primary message including all of its children."""
+    return tuple(msg.signature() for msg in primary_message)
+
+
+def _stale_batches(winfo):
+    result = set()
+    for pending in winfo.get('pending', {}).values():
+        result.update(pending['stale'])
+    return result
 
 
 def clear_all_messages():
@@ -246,9 +403,21 @@ def add_message(window, message):
     _save_batches(window, [PrimaryBatch(message)], None)
 
 
-def has_message_for_path(window, path):
-    paths = WINDOW_MESSAGES.get(window.id(), {}).get('paths', {})
-    return path in paths
+def has_message_for_path(window, path, partitions=None):
+    """Returns True if there are any messages for the given path.
+
+    :param partitions: If set, only consider messages from the given list of
+        partitions.  Messages that are about to be replaced (see
+        `begin_partition`) are ignored.
+    """
+    with _LOCK:
+        winfo = WINDOW_MESSAGES.get(window.id(), {})
+        paths = winfo.get('paths', {})
+        if partitions is None:
+            return path in paths
+        stale = _stale_batches(winfo)
+        return any(batch.partition in partitions and batch not in stale
+                   for batch in paths.get(path, []))
 
 
 def messages_finished(window):
@@ -274,13 +443,13 @@ def _draw_region_highlights(view, batch):
         return
 
     # Collect message regions by level.
-    regions = {level: [] for level in LEVELS.values()}
+    regions = [[] for level in ALL_LEVELS]
     for msg in batch:
         region = msg.sublime_region(view)
         regions[msg.level].append((msg.region_key, region))
 
     # Do this in reverse order so that errors show on-top.
-    for level in reversed(sorted(list(LEVELS.values()))):
+    for level in reversed(ALL_LEVELS):
         # Use scope names from color themes to drive the color of the outline.
         # 'invalid' typically is red.  We use 'info' for all other levels, which
         # is usually not defined in any color theme, and will end up showing as
@@ -291,7 +460,7 @@ def _draw_region_highlights(view, batch):
         #     region.redish, region.orangish, region.yellowish,
         #     region.greenish, region.bluish, region.purplish and
         #     region.pinkish
-        if level == 'error':
+        if level == ERROR:
             scope = 'invalid'
         else:
             scope = 'info'
@@ -300,6 +469,7 @@ def _draw_region_highlights(view, batch):
             _sublime_add_regions(view, key, [region], scope, icon, flags)
 
 
+@profile.timed('messages.batches_at_point')
 def batches_at_point(view, point, hover_zone):
     """Return a list of message batches at the given point."""
     try:
@@ -342,7 +512,8 @@ def message_popup(view, point, hover_zone):
     batches = batches_at_point(view, point, hover_zone)
     if batches:
         theme = themes.THEMES[util.get_setting('rust_message_theme')]
-        minihtml = '\n'.join(theme.render(view, batch, for_popup=True) for batch in batches)
+        with profile.timer('Theme.render'):
+            minihtml = '\n'.join(theme.render(view, batch, for_popup=True) for batch in batches)
         if not minihtml:
             return
         on_nav = functools.partial(_click_handler, view, hide_popup=True)
@@ -384,6 +555,10 @@ def _click_handler(view, url, hide_popup=False):
         new_view = view.window().open_file(path, sublime.ENCODED_POSITION)
         if external:
             new_view.set_read_only(True)
+    elif url.startswith('rendered:'):
+        batch = _batch_for_region_key(view, url[9:])
+        if batch:
+            _toggle_phantom_rendered(view, batch, popup=hide_popup)
     elif url.startswith('replace:'):
         info = urllib.parse.parse_qs(url[8:], keep_blank_values=True)
         _accept_replace(view, info['id'][0], info['replacement'][0])
@@ -429,6 +604,88 @@ def _accept_replace(view, mid, replacement):
         batch.primary().dismiss(view.window())
 
 
+def _batch_for_region_key(view, region_key):
+    """Returns the primary batch in the view's file with the given region
+    key, or None."""
+    try:
+        winfo = WINDOW_MESSAGES[view.window().id()]
+    except KeyError:
+        return None
+    for batch in winfo['paths'].get(view.file_name(), []):
+        if batch.first().region_key == region_key:
+            return batch.primary()
+    return None
+
+
+def toggle_rendered(view, point):
+    """Show or hide rustc's rendered text of the message at the given point.
+
+    In the build output panel, the rendered text is shown below the line of
+    the message.  In a source file, the message's phantom (or popup) switches
+    between the regular and rendered form.
+
+    :returns: True if there was a message with rendered text at the point.
+    """
+    window = view.window()
+    if window is None:
+        return False
+    if view.settings().get('rust_output_panel'):
+        return _toggle_panel_rendered(window, view, point)
+    batches = batches_at_point(view, point, sublime.HOVER_TEXT) or []
+    found = False
+    for batch in batches:
+        batch = batch.primary()
+        if batch.rendered_key is None:
+            continue
+        found = True
+        popup = util.get_setting('rust_phantom_style', 'normal') == 'popup'
+        _toggle_phantom_rendered(view, batch, popup=popup, point=point)
+        break
+    return found
+
+
+def _toggle_phantom_rendered(view, batch, popup=False, point=None):
+    batch.expanded = not batch.expanded
+    if popup:
+        if point is None:
+            point = batch.first().sublime_region(view).begin()
+        message_popup(view, point, sublime.HOVER_TEXT)
+        return
+    views = util.open_views_for_file(view.window(), batch.path())
+    if views:
+        views[0].erase_phantoms(batch.first().region_key)
+        _show_phantom(views[0], batch)
+
+
+def _toggle_panel_rendered(window, panel, point):
+    try:
+        winfo = WINDOW_MESSAGES[window.id()]
+    except KeyError:
+        return False
+    line = panel.line(point)
+    for batches in winfo['paths'].values():
+        for batch in batches:
+            if not isinstance(batch, PrimaryBatch):
+                continue
+            region = batch.primary_message.output_panel_region
+            if region is None or not line.contains(region.begin()):
+                continue
+            text = rendered.text_for_batch(window, batch)
+            if text is None:
+                continue
+            key = 'rust-rendered-%s' % (batch.primary_message.region_key,)
+            if batch.panel_expanded:
+                panel.erase_phantoms(key)
+            else:
+                content = '<body id="rust-message"><style>%s</style>%s</body>' % (
+                    rendered.CSS, rendered.to_minihtml(text))
+                panel.add_phantom(key, sublime.Region(line.end()), content,
+                                  sublime.LAYOUT_BLOCK)
+            batch.panel_expanded = not batch.panel_expanded
+            return True
+    return False
+
+
 def _show_phantom(view, batch):
     if util.get_setting('rust_phantom_style') != 'normal':
         return
@@ -450,7 +707,8 @@ def _show_phantom(view, batch):
         )
 
     theme = themes.THEMES[util.get_setting('rust_message_theme')]
-    content = theme.render(view, batch)
+    with profile.timer('Theme.render'):
+        content = theme.render(view, batch)
     if not content:
         return
 
@@ -490,23 +748,24 @@ def _sort_messages(window):
     # problems with it.
     if not util.get_setting('rust_sort_messages', True):
         return
-    wid = window.id()
-    try:
-        window_info = WINDOW_MESSAGES[wid]
-    except KeyError:
-        return
-    batches_by_path = window_info['paths']
-    items = []
-    for path, batches in batches_by_path.items():
-        for batch in batches:
-            first = batch.first()
-            items.append((first.level, path, first.lineno(), batch))
-    items.sort(key=lambda x: x[:3])
-    batches_by_path = collections.OrderedDict()
-    for _, path, _, batch in items:
-        batches = batches_by_path.setdefault(path, [])
-        batches.append(batch)
-    window_info['paths'] = batches_by_path
+    with _LOCK:
+        wid = window.id()
+        try:
+            window_info = WINDOW_MESSAGES[wid]
+        except KeyError:
+            return
+        batches_by_path = window_info['paths']
+        items = []
+        for path, batches in batches_by_path.items():
+            for batch in batches:
+                first = batch.first()
+                items.append((first.level, path, first.lineno(), batch))
+        items.sort(key=lambda x: x[:3])
+        batches_by_path = collections.OrderedDict()
+        for _, path, _, batch in items:
+            batches = batches_by_path.setdefault(path, [])
+            batches.append(batch)
+        window_info['paths'] = batches_by_path
 
 
 def show_next_message(window, levels):
@@ -598,19 +857,20 @@ def _scroll_to_message(view, message, transient):
 
 def redraw_all_open_views(window):
     """Re-display phantoms/regions after being hidden."""
-    try:
-        winfo = WINDOW_MESSAGES[window.id()]
-    except KeyError:
-        return
-    winfo['hidden'] = False
-    for path, batches in winfo['paths'].items():
-        views = util.open_views_for_file(window, path)
-        if views:
-            for batch in batches:
-                # Phantoms seem to be attached to the buffer.
-                _show_phantom(views[0], batch)
-                for view in views:
-                    _draw_region_highlights(view, batch)
+    with _LOCK:
+        try:
+            winfo = WINDOW_MESSAGES[window.id()]
+        except KeyError:
+            return
+        winfo['hidden'] = False
+        for path, batches in winfo['paths'].items():
+            views = util.open_views_for_file(window, path)
+            if views:
+                for batch in batches:
+                    # Phantoms seem to be attached to the buffer.
+                    _show_phantom(views[0], batch)
+                    for view in views:
+                        _draw_region_highlights(view, batch)
 
 
 def show_messages_for_view(view):
@@ -727,9 +987,9 @@ def _is_matching_level(levels, message):
         return False
     if levels == 'all':
         return True
-    elif levels == 'error' and message.level == 'error':
+    elif levels == 'error' and message.level == ERROR:
         return True
-    elif levels == 'warning' and message.level != 'error':
+    elif levels == 'warning' and message.level != ERROR:
         # Warning, Note, Help
         return True
     else:
@@ -782,21 +1042,26 @@ def list_messages(window):
 
 
 def message_counts(window):
+    """Returns a `collections.Counter` of the number of primary messages at
+    each level."""
     result = collections.Counter()
     try:
         win_info = WINDOW_MESSAGES[window.id()]
     except KeyError:
         return result
-    for batches in win_info['paths'].values():
-        for batch in batches:
-            if isinstance(batch, PrimaryBatch):
-                result[batch.first().level] += 1
+    for level, count in zip(ALL_LEVELS, win_info['level_counts']):
+        if count:
+            result[level] = count
     return result
 
 
-def add_rust_messages(window, base_path, info, target_path, msg_cb):
+def add_rust_messages(window, base_path, info, target_path, msg_cb,
+                      partition=None, paths=None):
     """Add messages from Rust JSON to Sublime views.
 
+    This is the combination of `prepare_rust_messages` and
+    `store_rust_messages`.
+
     :param window: Sublime Window object.
     :param base_path: Base path used for resolving relative paths from Rust.
     :param info: Dictionary of messages from rustc or cargo.
@@ -804,6 +1069,34 @@ def add_rust_messages(window, base_path, info, target_path, msg_cb):
       target (lib.rs, main.rs, etc.).  May be None if it is not known.
     :param msg_cb: Callback that will be given the message object (and each
         child separately). May be None.
+    :param partition: A hashable key identifying the compilation that
+        generated the message, such as `(package, target, profile)`.  Used
+        with `clear_messages` to only replace the messages of a specific
+        compilation.  None for messages that are not partitioned.
+    :param paths: The `PathResolver` for the current build.  If None, a new
+        one is used.
+    """
+    batches = prepare_rust_messages(window, base_path, info, target_path,
+                                    msg_cb, paths)
+    if batches:
+        store_rust_messages(window, batches, msg_cb, partition)
+
+
+def prepare_rust_messages(window, base_path, info, target_path, msg_cb,
+                          paths=None):
+    """Convert a message from Rust JSON to a list of `MessageBatch` objects.
+
+    This only reads the settings and the window's folders, and does not
+    modify any views or the stored messages, so it may be called from any
+    thread (see `ingest.MessageIngester`).
+
+    :param paths: The `PathResolver` for the current build.  If None, a new
+        one is used.
+
+    See `add_rust_messages` for a description of the other parameters.
+
+    :returns: A list of batches, the first of which is the `PrimaryBatch`.
+        None if there is nothing to display.
     """
     # cargo check emits in a slightly different format.
     if 'reason' in info:
@@ -812,45 +1105,116 @@ def add_rust_messages(window, base_path, info, target_path, msg_cb):
         else:
             # cargo may emit various other messages, like
             # 'compiler-artifact' or 'build-script-executed'.
-            return
+            return None
 
+    if paths is None:
+        paths = PathResolver(window)
     primary_message = Message()
 
-    _collect_rust_messages(window, base_path, info, target_path, msg_cb, {},
-        primary_message)
+    with profile.timer('messages._collect_rust_messages'):
+        _collect_rust_messages(window, base_path, info, target_path, msg_cb,
+                               {}, primary_message, paths)
     if not primary_message.path:
-        return
-    if _is_duplicate_message(window, primary_message):
-        return
-    batches = _batch_and_cross_link(window, primary_message)
-    _save_batches(window, batches, msg_cb)
+        return None
+    batches = _batch_and_cross_link(window, primary_message, paths)
+    # Moved to the spool when saved, see `_save_batches`.
+    batches[0].rendered = info.get('rendered')
+    return batches
+
+
+def store_rust_messages(window, batches, msg_cb, partition=None):
+    """Save batches created by `prepare_rust_messages` and display them.
+
+    See `add_rust_messages` for a description of the parameters.
+    """
+    with _LOCK:
+        primary_message = batches[0].primary_message
+        pending = WINDOW_MESSAGES.get(window.id(), {})\
+                                 .get('pending', {})\
+                                 .get(partition)
+        if pending:
+            batch = pending['signatures'].pop(
+                _message_signature(primary_message), None)
+            if batch:
+                # Identical to an existing message, keep the old one on screen.
+                pending['stale'].difference_update(
+                    [batch] + batch.child_batches)
+                pending['retained'] += 1
+                return
+        if _is_duplicate_message(window, primary_message):
+            return
+        _save_batches(window, batches, msg_cb, partition)
+        if pending:
+            pending['added'] += 1
+
+
+class PathResolver:
+
+    """Cache of path lookups used while processing messages.
+
+    Diagnostics (particularly from macros) tend to refer to the same files
+    many times.  A new resolver should be created for each build, since the
+    results are never invalidated.
+    """
+
+    def __init__(self, window):
+        self._realpath = {}
+        self._exists = {}
+        self._external = {}
+        # Sorted folder prefixes.  Folders nested inside another folder are
+        # removed so that a path can only match the closest prefix below it.
+        prefixes = sorted(folder + os.sep for folder in window.folders())
+        self._prefixes = []
+        for prefix in prefixes:
+            if not self._prefixes or not prefix.startswith(self._prefixes[-1]):
+                self._prefixes.append(prefix)
+
+    def realpath(self, path):
+        try:
+            return self._realpath[path]
+        except KeyError:
+            result = self._realpath[path] = os.path.realpath(path)
+            return result
+
+    def exists(self, path):
+        try:
+            return self._exists[path]
+        except KeyError:
+            result = self._exists[path] = os.path.exists(path)
+            return result
+
+    def is_external(self, path):
+        """Returns True if the path is outside of the window's folders (or is
+        a macro pseudo-path)."""
+        try:
+            return self._external[path]
+        except KeyError:
+            result = self._external[path] = self._is_external(path)
+            return result
+
+    def _is_external(self, path):
+        if 'macros>' in path:
+            return True
+        if not os.path.isabs(path):
+            return False
+        i = bisect.bisect_right(self._prefixes, path)
+        return not (i and path.startswith(self._prefixes[i - 1]))
 
 
 def _is_duplicate_message(window, primary_message):
-    batches = WINDOW_MESSAGES.get(window.id(), {})\
-                             .get('paths', {})\
-                             .get(primary_message.path, [])
+    winfo = WINDOW_MESSAGES.get(window.id(), {})
+    batches = winfo.get('paths', {}).get(primary_message.path, [])
+    stale = _stale_batches(winfo)
     for batch in batches:
-        if isinstance(batch, PrimaryBatch):
+        if isinstance(batch, PrimaryBatch) and batch not in stale:
             if batch.primary_message.is_similar(primary_message):
                 return True
     return False
 
 
-def _is_external(window, path):
-    if 'macros>' in path:
-        return True
-    if not os.path.isabs(path):
-        return False
-    for folder in window.folders():
-        if path.startswith(folder + os.sep):
-            return False
-    return True
-
-
 def _collect_rust_messages(window, base_path, info, target_path,
                            msg_cb, parent_info,
-                           message):
+                           message, paths):
     """
     - `info`: The dictionary from Rust has the following structure:
 
@@ -915,6 +1279,7 @@ def _collect_rust_messages(window, base_path, info, target_path,
       Currently only has 'span' key, the span of the parent to display the
       message (for children without spans).
     - `message`: `Message` object where we store the message information.
+    - `paths`: `PathResolver` object used for path lookups.
     """
     # Include "notes" tied to errors, even if warnings are disabled.
     if (info['level'] != 'error' and
@@ -924,7 +1289,7 @@ def _collect_rust_messages(window, base_path, info, target_path,
         return
 
     def make_span_path(span):
-        return os.path.realpath(os.path.join(base_path, span['file_name']))
+        return paths.realpath(os.path.join(base_path, span['file_name']))
 
     def make_span_region(span):
         # Sublime text is 0 based whilst the line/column info from
@@ -952,7 +1317,7 @@ def _collect_rust_messages(window, base_path, info, target_path,
         child.level = level_from_str(level)
         child.primary = False
         child.path = make_span_path(span)
-        if not os.path.exists(child.path):
+        if not paths.exists(child.path):
             # Sometimes rust gives messages that link to libstd in the
             # directory where it was built (such as on CI).
             if msg_cb:
@@ -1004,7 +1369,7 @@ def _collect_rust_messages(window, base_path, info, target_path,
             return span, expansion
 
     for span in info['spans']:
-        if _is_external(window, span['file_name']):
+        if paths.is_external(span['file_name']):
             # Rust gives the chain of expansions for the macro, which we don't
             # really care about.  We want to find the site where the macro was
             # invoked.  I'm not entirely confident this is the best way to do
@@ -1019,9 +1384,9 @@ def _collect_rust_messages(window, base_path, info, target_path,
             updated['suggested_replacement'] = span['suggested_replacement']
             span = updated
 
-            if _is_external(window, span['file_name']):
+            if paths.is_external(span['file_name']):
                 macro_name = span['file_name']
-                if not os.path.exists(span['file_name']):
+                if not paths.exists(span['file_name']):
                     # Macros from extern crates do not have 'expansion', and thus
                     # we do not have a location to highlight.  Place the result at
                     # somewhere relevant.
@@ -1058,7 +1423,7 @@ def _collect_rust_messages(window, base_path, info, target_path,
                         info['level'])
             else:
                 if not expansion or not expansion['def_site_span'] \
-                        or _is_external(window, expansion['def_site_span']['file_name']):
+                        or paths.is_external(expansion['def_site_span']['file_name']):
                     add_additional(window, span,
                         'this error originates in a macro outside of the current crate',
                         info['level'])
@@ -1066,7 +1431,7 @@ def _collect_rust_messages(window, base_path, info, target_path,
         # Add a message for macro invocation site if available in the local
         # crate.
         if span['expansion'] and \
-                not _is_external(window, span['file_name']) and \
+                not paths.is_external(span['file_name']) and \
                 not span['expansion']['macro_decl_name'].startswith('#['):
             invoke_span, expansion = find_span_r(span)
             add_additional(window, invoke_span, 'in this macro invocation', 'help')
@@ -1100,13 +1465,13 @@ def _collect_rust_messages(window, base_path, info, target_path,
     for child in info['children']:
         _collect_rust_messages(window, base_path, child, target_path,
                                msg_cb, parent_info.copy(),
-                               message)
+                               message, paths)
 
 
-def _batch_and_cross_link(window, primary_message):
+def _batch_and_cross_link(window, primary_message, paths):
     """Creates a list of MessageBatch objects with appropriate cross links."""
     def make_file_path(msg):
-        if _is_external(window, msg.path):
+        if paths.is_external(msg.path):
             external = ':external'
         else:
             external = ''
@@ -1170,39 +1535,59 @@ def _batch_and_cross_link(window, primary_message):
     return list(path_line_map.values())
 
 
-def _save_batches(window, batches, msg_cb):
+def _get_window_info(window):
+    """Returns the WINDOW_MESSAGES entry for the window, creating it if
+    necessary."""
+    try:
+        return WINDOW_MESSAGES[window.id()]
+    except KeyError:
+        winfo = WINDOW_MESSAGES[window.id()] = {
+            'paths': collections.OrderedDict(),
+            'batch_index': (-1, -1),
+            'hidden': False,
+            'next_region_key': 0,
+            'pending': {},
+            'level_counts': [0] * len(ALL_LEVELS),
+        }
+        return winfo
+
+
+@profile.timed('messages._save_batches')
+def _save_batches(window, batches, msg_cb, partition=None):
     """Save the batches.  This does several things:
 
     - Saves batches to WINDOW_MESSAGES global.
+    - Tags each batch with the given partition.
     - Updates the region_key for each message.
     - Displays phantoms if a view is already open.
     - Calls `msg_cb` for each individual message.
     """
-    wid = window.id()
-    try:
-        path_to_batches = WINDOW_MESSAGES[wid]['paths']
-    except KeyError:
-        path_to_batches = collections.OrderedDict()
-        WINDOW_MESSAGES[wid] = {
-            'paths': path_to_batches,
-            'batch_index': (-1, -1),
-            'hidden': False,
-        }
+    with _LOCK:
+        winfo = _get_window_info(window)
+        path_to_batches = winfo['paths']
 
-    for batch in batches:
-        path_batches = path_to_batches.setdefault(batch.path(), [])
-        # Flatten to a list of messages so each message gets a unique ID.
-        num = len(list(itertools.chain.from_iterable(path_batches)))
-        path_batches.append(batch)
-        for i, msg in enumerate(batch):
-            msg.region_key = 'rust-%i' % (num + i,)
-        if not WINDOW_MESSAGES[wid]['hidden']:
-            views = util.open_views_for_file(window, batch.path())
-            if views:
-                # Phantoms seem to be attached to the buffer.
-                _show_phantom(views[0], batch)
-                for view in views:
-                    _draw_region_highlights(view, batch)
-            if msg_cb:
-                for msg in batch:
-                    msg_cb(msg)
+        for batch in batches:
+            batch.partition = partition
+            path_batches = path_to_batches.setdefault(batch.path(), [])
+            path_batches.append(batch)
+            if isinstance(batch, PrimaryBatch):
+                winfo['level_counts'][batch.first().level] += 1
+                if batch.rendered:
+                    batch.rendered_key = rendered.spool(window).add(
+                        batch.rendered)
+                    batch.rendered = None
+            # Use a counter so that each message gets a unique ID, even after
+            # some partitions have been removed.
+            for msg in batch:
+                msg.region_key = 'rust-%i' % (winfo['next_region_key'],)
+                winfo['next_region_key'] += 1
+            if not winfo['hidden']:
+                views = util.open_views_for_file(window, batch.path())
+                if views:
+                    # Phantoms seem to be attached to the buffer.
+                    _show_phantom(views[0], batch)
+                    for view in views:
+                        _draw_region_highlights(view, batch)
+                if msg_cb:
+                    for msg in batch:
+                        msg_cb(msg)
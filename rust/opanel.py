@@ -4,7 +4,8 @@ import sublime
 
 import os
 import re
-from . import rust_proc, messages, util, semver, levels, log
+from . import (rust_proc, messages, util, semver, levels, log, libtest,
+               test_history, build_timing, build_progress, build_history)
 
 # Use the same panel name that Sublime's build system uses so that "Show Build
 # Results" will open the same panel.  I don't see any particular reason why
@@ -26,6 +27,8 @@ def create_output_panel(window, base_dir):
         s.set('result_file_regex', pattern)
     # Used for resolving relative paths.
     s.set('result_base_dir', base_dir)
+    # Used by `messages.toggle_rendered`.
+    s.set('rust_output_panel', True)
     s.set('word_wrap', True)  # XXX Or False?
     s.set('line_numbers', False)
     s.set('gutter', False)
@@ -57,22 +60,49 @@ class OutputListener(rust_proc.ProcListener):
 
     # Sublime view used for output.
     output_view = None
+    # `messages.PathResolver` used for the duration of the build.
+    paths = None
+    # `libtest.TestRun` with the results of the tests for test commands,
+    # otherwise None.
+    test_run = None
+    # `build_timing.BuildTimings` of the units compiled by Cargo, or None if
+    # Cargo is not emitting JSON.
+    timings = None
+    # `build_progress.BuildProgress` shown in the status bar, or None.
+    progress = None
 
-    def __init__(self, window, base_path, command_name, rustc_version):
+    def __init__(self, window, base_path, command_name, rustc_version,
+                 test_json=False):
+        """
+        :param test_json: If True, the test harness has been asked to emit
+            JSON events (see `libtest`).
+        """
         self.window = window
         self.base_path = base_path
         self.command_name = command_name
         self.rustc_version = rustc_version
+        self.test_json = test_json
 
     def on_begin(self, proc):
+        self.paths = messages.PathResolver(self.window)
+        if self.command_name == 'test' or self.test_json:
+            self.test_run = libtest.TestRun()
+        if proc.decode_json:
+            self.timings = build_timing.BuildTimings(' '.join(proc.cmd),
+                                                     proc.start_time)
+            if util.get_setting('rust_build_progress', True):
+                self.progress = build_progress.BuildProgress.for_workspace(
+                    proc.cwd)
         self.output_view = create_output_panel(self.window, self.base_path)
         self._append('[Running: %s]' % (' '.join(proc.cmd),))
 
     def on_data(self, proc, data):
         region_start = self.output_view.size()
         self._append(data, nl=False)
+        if self.test_run:
+            self.test_run.on_output(data)
         # Check for test errors.
-        if self.command_name == 'test':
+        if self.command_name == 'test' and not self.test_json:
             # Re-fetch the data to handle things like \t expansion.
             appended = self.output_view.substr(
                 sublime.Region(region_start, self.output_view.size()))
@@ -80,34 +110,80 @@ class OutputListener(rust_proc.ProcListener):
                 appended)
             if m:
                 path = os.path.join(self.base_path, m.group(1))
-                if not os.path.exists(path):
-                    # Panics outside of the crate display a path to that
-                    # crate's source file (such as libcore), which is probably
-                    # not available.
-                    return
-                message = messages.Message()
-                lineno = int(m.group(2)) - 1
-                # Region columns appear to the left, so this is +1.
-                col = int(m.group(3))
-                # Rust 1.24 changed column numbering to be 1-based.
-                if semver.match(self.rustc_version, '>=1.24.0-beta'):
-                    col -= 1
-                message.span = ((lineno, col), (lineno, col))
                 # +2 to skip ", "
                 build_region = sublime.Region(region_start + m.start() + 2,
                                               region_start + m.end())
-                message.output_panel_region = build_region
-                message.path = path
-                message.level = levels.level_from_str('error')
-                messages.add_message(self.window, message)
+                self._add_panic_message(path, int(m.group(2)),
+                                        int(m.group(3)), build_region)
+
+    def _add_panic_message(self, path, lineno, col, build_region):
+        """Add a message for the location of a test failure.
+
+        :param lineno: 1-based line number.
+        :param col: Column as reported by Rust.
+        :param build_region: Region in the output panel to highlight.
+        """
+        if not os.path.exists(path):
+            # Panics outside of the crate display a path to that crate's
+            # source file (such as libcore), which is probably not available.
+            return
+        message = messages.Message()
+        lineno -= 1
+        # Region columns appear to the left, so this is +1.
+        # Rust 1.24 changed column numbering to be 1-based.
+        if semver.match(self.rustc_version, '>=1.24.0-beta'):
+            col -= 1
+        message.span = ((lineno, col), (lineno, col))
+        message.output_panel_region = build_region
+        message.path = path
+        message.level = levels.ERROR
+        messages.add_message(self.window, message)
+
+    def _on_test_event(self, event):
+        """Display a JSON event from the test harness."""
+        if event['type'] == 'suite':
+            if event['event'] == 'started':
+                self._append('\nrunning %i tests' % (event['test_count'],))
+            elif event['event'] in ('ok', 'failed'):
+                summary = 'test result: %s. %i passed; %i failed; %i ignored' % (
+                    event['event'], event.get('passed', 0),
+                    event.get('failed', 0), event.get('ignored', 0))
+                if event.get('exec_time') is not None:
+                    summary += '; finished in %.2fs' % (
+                        libtest.parse_time(event['exec_time']),)
+                self._append(summary + '\n')
+            return
+        result = self.test_run.on_event(event)
+        if result is None:
+            return
+        line = 'test %s ... %s' % (result.name, result.outcome)
+        if result.exec_time is not None:
+            line += ' <%.3fs>' % (result.exec_time,)
+        region_start = self.output_view.size()
+        self._append(line)
+        if result.outcome == 'failed' and result.stdout:
+            self._append(result.stdout, nl=not result.stdout.endswith('\n'))
+            location = libtest.panic_location(result.stdout)
+            if location:
+                path = os.path.join(self.base_path, location[0])
+                build_region = sublime.Region(region_start,
+                                              region_start + len(line))
+                self._add_panic_message(path, location[1], location[2],
+                                        build_region)
 
     def on_error(self, proc, message):
         self._append(message)
 
     def on_json(self, proc, obj):
-        if 'message' in obj:
+        if self.progress and self.progress.on_json(obj):
+            self.window.status_message('Cargo: %s' % (self.progress.text(),))
+        if self.timings and self.timings.on_json(obj):
+            return
+        if self.test_json and obj.get('type') in ('suite', 'test'):
+            self._on_test_event(obj)
+        elif 'message' in obj:
             messages.add_rust_messages(self.window, self.base_path, obj['message'],
-                                       None, self.msg_cb)
+                                       None, self.msg_cb, paths=self.paths)
 
     def msg_cb(self, message):
         """Display the message in the output panel.  Also marks the message
@@ -142,11 +218,29 @@ class OutputListener(rust_proc.ProcListener):
             self._display_debug(proc)
         else:
             self._append('[Finished in %.1fs]' % proc.elapsed)
+        workspace = util.find_workspace_root(proc.cwd) or proc.cwd
+        if self.test_json:
+            test_history.record(workspace, self.test_run)
+        self._record_timings(proc, workspace, rc)
         messages.messages_finished(self.window)
         # Tell Sublime to find all of the lines with pattern from
         # result_file_regex.
         self.output_view.find_all_results()
 
+    def _record_timings(self, proc, workspace, rc):
+        if not self.timings:
+            build_history.record(workspace, proc.cmd, proc.elapsed, rc, None)
+            return
+        self.timings.finish()
+        build_timing.record(workspace, self.timings)
+        build_history.record(workspace, proc.cmd, proc.elapsed, rc,
+                             len(self.timings.rebuilt()))
+        if self.timings.rebuilt() and \
+                util.get_setting('rust_show_build_timings', False):
+            timings = self.timings
+            sublime.set_timeout(
+                lambda: build_timing.show_report(self.window, timings))
+
     def on_terminated(self, proc):
         self._append('[Build interrupted]')
 
@@ -157,6 +251,7 @@ class OutputListener(rust_proc.ProcListener):
 
     def _display_debug(self, proc):
         # Display some information to help the user debug any build problems.
-        log.log(self.window, 'cwd: %s', proc.cwd)
+        log.log(self.window, 'cwd: %s', proc.cwd, category='build')
         # TODO: Fix this when adding PATH/env support.
-        log.log(self.window, 'path: %s', proc.env.get('PATH'))
+        log.log(self.window, 'path: %s', proc.env.get('PATH'),
+                category='build')
@@ -0,0 +1,294 @@
+"""Index of the Cargo packages found in the project folders.
+
+Finding every package in a large project is slow: it requires walking the
+folders looking for Cargo.toml files, and running `cargo metadata` to learn
+about each one.  `PackageIndex` keeps the results, keyed by workspace, and
+only runs Cargo again for workspaces whose manifests have changed (or new
+manifests that it has not seen before).  Manifests that Cargo failed to load
+are remembered too, and only tried again once they change.  The directories
+of each folder are also kept, so that only directories that changed since
+the last search are listed again.  The index is saved in Sublime's cache
+directory so that it survives restarts.
+"""
+
+import concurrent.futures
+import fnmatch
+import os
+import threading
+
+import sublime
+
+from . import util, log, rust_proc, rust_thread
+
+# Directories that are never searched for manifests.
+DEFAULT_EXCLUDES = ('.git', '.hg', '.svn', 'target', 'node_modules')
+# Version of the on-disk format, bump when it changes.
+INDEX_VERSION = 2
+# Maximum number of `cargo metadata` processes to run at the same time.
+MAX_PROBES = 4
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class PackageIndex:
+
+    """Cache of Cargo metadata for all workspaces under the project folders.
+
+    The index maps a workspace root to:
+
+    - `stamps`: Dictionary of manifest path to modification time for every
+      manifest in the workspace.  If any of these change, the workspace is
+      loaded again.
+    - `packages`: List of package dictionaries from `cargo metadata`.
+
+    :ivar failures: Dictionary of the path of a manifest that Cargo failed to
+        load to the `stamps` (as above) of the manifest and the root of the
+        workspace it appears to belong to.
+    :ivar folders: Dictionary of folder path to the directories found under
+        it (see `find_manifests`).
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: Where the index is saved.  None to disable saving.
+        """
+        self.path = path
+        self.workspaces = None
+        self.failures = None
+        self.folders = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self.workspaces = {}
+        self.failures = {}
+        self.folders = {}
+        if not self.path:
+            return
+        data = util.load_json_cache(self.path, INDEX_VERSION)
+        if data is not None:
+            self.workspaces = data['workspaces']
+            self.failures = data['failures']
+            self.folders = data['folders']
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'workspaces': self.workspaces,
+            'failures': self.failures,
+            'folders': self.folders,
+        }
+        util.save_json_cache(self.path, data, 'package index')
+
+    def packages(self, window, folders):
+        """Find all packages under the given folders.
+
+        :returns: Dictionary of package directory to the package dictionary
+            from `cargo metadata`.
+        """
+        with self._lock:
+            if self.workspaces is None:
+                self._load()
+            previous = [self.folders.get(folder) for folder in folders]
+            manifests = find_manifests(window, folders, self.folders)
+            changed = self._update(window, manifests)
+            if changed or \
+                    previous != [self.folders[folder] for folder in folders]:
+                self._save()
+            result = {}
+            for info in self.workspaces.values():
+                if not manifests.intersection(info['stamps']):
+                    # Not part of these folders.
+                    continue
+                for package in info['packages']:
+                    package_dir = os.path.dirname(package['manifest_path'])
+                    if package_dir not in result:
+                        result[package_dir] = dict(package)
+            return result
+
+    def _update(self, window, manifests):
+        """Run Cargo for any manifest that is not up-to-date.
+
+        :returns: True if the index changed.
+        """
+        changed = False
+        known = set()
+        for root, info in list(self.workspaces.items()):
+            if all(_mtime(path) == stamp
+                   for path, stamp in info['stamps'].items()):
+                known.update(info['stamps'])
+            else:
+                del self.workspaces[root]
+                changed = True
+        for manifest, stamps in list(self.failures.items()):
+            if all(_mtime(path) == stamp for path, stamp in stamps.items()):
+                known.add(manifest)
+            else:
+                del self.failures[manifest]
+                changed = True
+
+        pending = [m for m in manifests if m not in known]
+        while pending:
+            # Guess which manifests belong to the same workspace so that
+            # Cargo only needs to be run once per workspace.
+            groups = {}
+            for manifest in pending:
+                root = util.find_workspace_root(os.path.dirname(manifest))
+                groups.setdefault(root, manifest)
+            probes = list(groups.values())
+            results = self._probe(window, probes)
+            for (root, manifest), metadata in zip(groups.items(), results):
+                if metadata is None:
+                    paths = [manifest]
+                    if root:
+                        paths.append(os.path.join(root, 'Cargo.toml'))
+                    self.failures[manifest] = {path: _mtime(path)
+                                               for path in paths}
+                    changed = True
+                    continue
+                stamps = {}
+                root_manifest = os.path.join(metadata['workspace_root'],
+                                             'Cargo.toml')
+                for path in [root_manifest] + \
+                        [p['manifest_path'] for p in metadata['packages']]:
+                    path = os.path.normpath(path)
+                    stamps[path] = _mtime(path)
+                self.workspaces[metadata['workspace_root']] = {
+                    'stamps': stamps,
+                    'packages': metadata['packages'],
+                }
+                known.update(stamps)
+                changed = True
+            # Anything the guess got wrong (such as a member outside of the
+            # workspace directory) is probed again.  Failures are not.
+            pending = [m for m in pending
+                       if m not in known and m not in probes]
+        return changed
+
+    def _probe(self, window, manifests):
+        """Run `cargo metadata` for each manifest in parallel.
+
+        :returns: List of metadata dictionaries, None for failures.
+        :raises ProcessTerminatedError: The calling `RustThread` was asked to
+            exit.
+        """
+        owner = rust_thread.current_thread()
+
+        def probe(manifest):
+            if owner and owner.should_exit:
+                return None
+            cwd = os.path.dirname(manifest)
+            metadata = util.get_cargo_metadata(window, cwd)
+            if not metadata:
+                # Manifest load failure, let it slide.
+                log.critical(window,
+                    'Failed to load Cargo manifest in %r', cwd)
+            return metadata
+
+        if len(manifests) == 1:
+            result = [probe(manifests[0])]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(MAX_PROBES) as ex:
+                result = list(ex.map(probe, manifests))
+        if owner and owner.should_exit:
+            raise rust_proc.ProcessTerminatedError()
+        return result
+
+
+def _exclude_patterns(window):
+    """Returns a dictionary of folder path to a list of glob patterns of
+    directories to skip."""
+    patterns = list(DEFAULT_EXCLUDES)
+    view = window.active_view()
+    if view:
+        patterns.extend(view.settings().get('folder_exclude_patterns', []))
+    result = {}
+    project_folders = (window.project_data() or {}).get('folders', [])
+    project_file = window.project_file_name()
+    for folder in window.folders():
+        result[folder] = patterns[:]
+        for pf in project_folders:
+            path = pf.get('path', '')
+            if project_file and not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(project_file), path)
+            if os.path.normpath(path) == os.path.normpath(folder):
+                result[folder].extend(pf.get('folder_exclude_patterns', []))
+    return result
+
+
+def find_manifests(window, folders, cache=None):
+    """Find all Cargo.toml files under the given folders.
+
+    Skips `target` directories, version-control directories, and anything
+    matching the Sublime `folder_exclude_patterns` setting.
+
+    :param cache: Dictionary of folder path to the directories found the
+        last time, updated by this function.  Only directories whose
+        modification time changed since then are listed again.  None to
+        list every directory.
+    :returns: Set of absolute paths to Cargo.toml files.
+    """
+    if cache is None:
+        cache = {}
+    excludes = _exclude_patterns(window)
+    result = set()
+    for folder in folders:
+        patterns = list(excludes.get(folder, DEFAULT_EXCLUDES))
+        previous = cache.get(folder)
+        if previous is None or previous['excludes'] != patterns:
+            previous = {'dirs': {}}
+        dirs = _scan_folder(folder, patterns, previous['dirs'])
+        cache[folder] = {'excludes': patterns, 'dirs': dirs}
+        result.update(os.path.join(path, 'Cargo.toml')
+                      for path, (_, _, has_manifest) in dirs.items()
+                      if has_manifest)
+    return result
+
+
+def _scan_folder(folder, patterns, previous):
+    """Returns a dictionary of every directory under the folder (that is not
+    excluded) to `[mtime, subdirs, has_manifest]`.
+
+    :param previous: The result of the last scan.  Directories that have the
+        same modification time are not listed again.
+    """
+    result = {}
+    todo = [folder]
+    while todo:
+        path = todo.pop()
+        mtime = _mtime(path)
+        if mtime is None:
+            continue
+        info = previous.get(path)
+        if info is None or info[0] != mtime:
+            try:
+                names = os.listdir(path)
+            except OSError:
+                continue
+            subdirs = [name for name in names
+                       if not any(fnmatch.fnmatch(name, p) for p in patterns)
+                       and os.path.isdir(os.path.join(path, name))
+                       and not os.path.islink(os.path.join(path, name))]
+            info = [mtime, subdirs, 'Cargo.toml' in names]
+        result[path] = info
+        todo.extend(os.path.join(path, name) for name in info[1])
+    return result
+
+
+_INDEX = None
+
+
+def get_index():
+    """Returns the global `PackageIndex`."""
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = PackageIndex(os.path.join(sublime.cache_path(),
+                                           'RustEnhanced',
+                                           'package_index.json'))
+    return _INDEX
@@ -0,0 +1,158 @@
+"""Lightweight timers for finding where the plugin spends its time.
+
+Enable with the `rust_profile` setting.  Operations are timed with the
+`timed` decorator or the `timer` context manager, and the results are
+aggregated per operation name (count, total, maximum, and a histogram of
+durations).  "Rust: Show Profile Report" writes a report to the debug log.
+
+When disabled, the overhead is a check of a global flag.
+"""
+
+import functools
+import threading
+import time
+
+import sublime
+
+# Whether timing is enabled, updated when the settings change or another
+# view is activated (see `update_enabled`).
+ENABLED = False
+# Upper bounds (in milliseconds) of the histogram buckets.  The last bucket
+# holds everything slower.
+BUCKETS = (0.1, 1, 10, 100, 1000, 10000)
+
+_LOCK = threading.Lock()
+# Dictionary of operation name to `Stat`.
+STATS = {}
+
+
+class Stat:
+
+    """Aggregated timings of an operation.
+
+    :ivar count: Number of times the operation ran.
+    :ivar total: Total seconds.
+    :ivar max: Slowest time in seconds.
+    :ivar histogram: List of counts for each bucket in `BUCKETS` (plus one
+        for slower times).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        ms = seconds * 1000
+        for i, bound in enumerate(BUCKETS):
+            if ms < bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.histogram[i] += 1
+
+
+def update_enabled():
+    """Read the `rust_profile` setting.
+
+    Changes to the project settings are not reported by `add_on_change`, so
+    this is also called whenever a view is activated.
+    """
+    global ENABLED
+    from . import util
+    ENABLED = bool(util.get_setting('rust_profile', False))
+
+
+def record(name, seconds):
+    """Add a time for the given operation (only when enabled)."""
+    if not ENABLED:
+        return
+    with _LOCK:
+        try:
+            stat = STATS[name]
+        except KeyError:
+            stat = STATS[name] = Stat()
+        stat.add(seconds)
+
+
+def timed(name):
+    """Decorator to time every call of a function under the given name."""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _Timer:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        record(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """Context manager to time a block of code under the given name."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def reset():
+    with _LOCK:
+        STATS.clear()
+
+
+def report():
+    """Returns the text of a report of all operations, by total time."""
+    with _LOCK:
+        stats = sorted(STATS.items(), key=lambda x: -x[1].total)
+        lines = ['%-32s %7s %10s %9s %9s  %s' % (
+            'Operation', 'Count', 'Total ms', 'Mean ms', 'Max ms',
+            'Histogram (<%s ms, slower)' % (
+                ', <'.join('%g' % b for b in BUCKETS),))]
+        for name, stat in stats:
+            lines.append('%-32s %7i %10.1f %9.3f %9.1f  %s' % (
+                name, stat.count, stat.total * 1000,
+                stat.total * 1000 / stat.count, stat.max * 1000,
+                ' '.join(str(n) for n in stat.histogram)))
+    return '\n'.join(lines)
+
+
+def plugin_loaded():
+    update_enabled()
+    settings = sublime.load_settings('RustEnhanced.sublime-settings')
+    settings.add_on_change('rust_profile', update_enabled)
+
+
+def plugin_unloaded():
+    settings = sublime.load_settings('RustEnhanced.sublime-settings')
+    settings.clear_on_change('rust_profile')
@@ -0,0 +1,94 @@
+"""Storage of rustc's rendered diagnostics.
+
+Each diagnostic in the JSON output includes a `rendered` field with the text
+rustc would have printed on the console (with the source snippet and
+ASCII-art underlines).  This text is only needed when the user asks for it,
+so it is not kept in `Message` objects.  Instead, it is compressed and kept
+in a per-window spool, and the batch of the message only holds its key.
+Entries are discarded when their messages are removed.
+"""
+
+import html
+import threading
+import zlib
+
+CSS = """
+    .rust-rendered {
+        font-family: var(--font-mono);
+        margin: 0.4rem 0rem;
+    }
+"""
+
+_LOCK = threading.Lock()
+# Dictionary of window ID to `Spool`.
+SPOOLS = {}
+
+
+class Spool:
+
+    """Compressed rendered text of the messages of a window."""
+
+    def __init__(self):
+        self._entries = {}
+        self._next_key = 0
+
+    def add(self, text):
+        """Store the text, returning the key to get it back."""
+        data = zlib.compress(text.encode('utf-8'))
+        with _LOCK:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = data
+        return key
+
+    def get(self, key):
+        """Returns the text for the key, or None if it has been discarded."""
+        with _LOCK:
+            data = self._entries.get(key)
+        if data is None:
+            return None
+        return zlib.decompress(data).decode('utf-8')
+
+    def discard(self, key):
+        with _LOCK:
+            self._entries.pop(key, None)
+
+    def size(self):
+        """Returns the number of bytes used by the compressed text."""
+        with _LOCK:
+            return sum(len(data) for data in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def spool(window):
+    """Returns the `Spool` of the window."""
+    with _LOCK:
+        try:
+            return SPOOLS[window.id()]
+        except KeyError:
+            result = SPOOLS[window.id()] = Spool()
+            return result
+
+
+def discard_window(window):
+    """Discard all rendered text of the window."""
+    with _LOCK:
+        SPOOLS.pop(window.id(), None)
+
+
+def text_for_batch(window, batch):
+    """Returns the rendered text of the primary message of a batch, or None
+    if there is none."""
+    key = batch.primary().rendered_key
+    if key is None or window is None:
+        return None
+    return spool(window).get(key)
+
+
+def to_minihtml(text):
+    """Convert rendered text to minihtml, preserving its layout."""
+    escaped = html.escape(text.rstrip(), quote=False)
+    escaped = escaped.replace(' ', '&nbsp;').replace('\n', '<br>')
+    return '<div class="rust-rendered">%s</div>' % (escaped,)
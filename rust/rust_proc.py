@@ -15,9 +15,9 @@ import shellenv
 import sublime
 import traceback
 
-from . import util, log
+from . import util, log, profile
 
-# Map Sublime window ID to RustProc.
+# Map threading.Thread that launched the process to RustProc.
 PROCS = {}
 PROCS_LOCK = threading.Lock()
 
@@ -145,7 +145,10 @@ class RustProc(object):
     elapsed = None
     # The thread used for reading output.
     _stdout_thread = None
+    # The thread that called `run`.
+    _owner = None
 
+    @profile.timed('rust_proc.run')
     def run(self, window, cmd, cwd, listener, env=None,
             decode_json=True, json_stop_pattern=None):
         """Run the process.
@@ -177,16 +180,13 @@ class RustProc(object):
         self.json_stop_pattern = json_stop_pattern
 
         from . import rust_thread
-        try:
-            t = rust_thread.THREADS[window.id()]
-        except KeyError:
-            pass
-        else:
-            if t.should_exit:
-                raise ProcessTerminatedError()
+        t = rust_thread.current_thread()
+        if t and t.should_exit:
+            raise ProcessTerminatedError()
 
+        self._owner = threading.current_thread()
         with PROCS_LOCK:
-            PROCS[window.id()] = self
+            PROCS[self._owner] = self
         listener.on_begin(self)
 
         # Configure the environment.
@@ -206,7 +206,7 @@ class RustProc(object):
         if env:
             self.env.update(env)
 
-        log.log(window, 'Running: %s', ' '.join(self.cmd))
+        log.log(window, 'Running: %s', ' '.join(self.cmd), category='process')
 
         if sys.platform == 'win32':
             # Prevent a console window from popping up.
@@ -326,12 +326,17 @@ class RustProc(object):
 
     def _cleanup(self):
         self.elapsed = time.time() - self.start_time
+        # Time the process ran, such as "process cargo build".
+        profile.record('process ' + ' '.join(
+            [os.path.basename(self.cmd[0])] +
+            [arg for arg in self.cmd[1:] if not arg.startswith('+')][:1]),
+            self.elapsed)
         self.finished = True
         self._stdout_thread = None
         self.proc.stdout.close()
         rc = self.proc.wait()
         with PROCS_LOCK:
-            p = PROCS.get(self.window.id())
+            p = PROCS.get(self._owner)
             if p is self:
-                del PROCS[self.window.id()]
+                del PROCS[self._owner]
         return rc
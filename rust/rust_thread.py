@@ -1,13 +1,64 @@
-"""Manage threads used for running Rust processes."""
+"""Manage threads used for running Rust processes.
+
+Each thread occupies a "slot" identified by `(window_id, workspace_root,
+job_class)` (the workspace is None for classes that are not
+`per_workspace`).  Only one thread may run in a slot at a time (a new thread
+interrupts the old one, or asks the user).  Threads in different slots (for
+example, a build in one workspace and an on-save check in another) run
+concurrently, up to the `rust_max_concurrent_jobs` setting.  Threads beyond
+that limit wait in a queue ordered by the priority of their job class.
+"""
 
 from . import util, rust_proc
 
 import sublime
+import itertools
 import threading
 
-# Map Sublime window ID to RustThread.
+# Job classes, mapped to their priority (lower runs first).
+JOB_CLASSES = {
+    # Loading choices for the configuration commands.
+    'config': 0,
+    # Interactive on-save checks.
+    'check': 1,
+    # Builds started by the user.
+    'build': 2,
+    # Anything the user is not waiting on.
+    'background': 3,
+}
+# Job classes that never wait in the queue, and do not count towards
+# `rust_max_concurrent_jobs`.  These are short jobs that block the UI.
+UNQUEUED_JOB_CLASSES = ('config',)
+
+# Map slot key `(window_id, workspace_root, job_class)` to RustThread.
 THREADS = {}
-THREADS_LOCK = threading.Lock()
+# Lock for THREADS and WAITING.  Notified whenever a job finishes.
+THREADS_LOCK = threading.Condition()
+# List of RustThreads waiting for a free job.
+WAITING = []
+# Used to keep the waiting queue first-in-first-out within a priority.
+_SEQUENCE = itertools.count()
+
+
+def window_threads(window):
+    """Returns a list of all `RustThread` objects for the given window, both
+    running and queued."""
+    with THREADS_LOCK:
+        return [t for key, t in THREADS.items() if key[0] == window.id()]
+
+
+def current_thread():
+    """Returns the `RustThread` for the calling thread, or None."""
+    current = threading.current_thread()
+    with THREADS_LOCK:
+        for t in THREADS.values():
+            if t.thread is current:
+                return t
+    return None
+
+
+def _max_jobs():
+    return max(1, util.get_setting('rust_max_concurrent_jobs', 2))
 
 
 class RustThread(object):
@@ -29,9 +80,29 @@ class RustThread(object):
     window = None
     # Name of the thread.
     name = None
-
-    def __init__(self, window):
+    # Key of `JOB_CLASSES`.
+    job_class = 'background'
+    # Root of the Cargo workspace this thread operates on (None if not
+    # known).  Determined when the thread starts running.
+    workspace = None
+    # Path inside the workspace given to the constructor.
+    path = None
+    # If False, only one thread of this class runs in a window regardless of
+    # the workspace (used by jobs that share a window-wide resource, such
+    # as the build output panel).
+    per_workspace = True
+    # True once the thread has been given a job and is running.
+    running = False
+
+    def __init__(self, window, path=None):
+        """
+        :param window: The Sublime window.
+        :param path: A path inside the Cargo workspace the thread will work
+            on.  Used to allow threads in different workspaces to run at the
+            same time.
+        """
         self.window = window
+        self.path = path
 
     def start(self):
         """Start the thread."""
@@ -39,10 +110,15 @@ class RustThread(object):
             target=self._thread_run)
         self.thread.start()
 
+    @property
+    def key(self):
+        """The slot key for this thread."""
+        return (self.window.id(), self.workspace, self.job_class)
+
     @property
     def current_proc(self):
         """The current `RustProc` being executed by this thread, or None."""
-        return rust_proc.PROCS.get(self.window.id(), None)
+        return rust_proc.PROCS.get(self.thread, None)
 
     def describe(self):
         """Returns a string with the name of the thread."""
@@ -53,15 +129,19 @@ class RustThread(object):
             return self.name
 
     def _thread_run(self):
+        # Searching for the workspace reads the file system, so it is not
+        # done on the UI thread in the constructor.
+        if self.path and self.per_workspace:
+            self.workspace = util.find_workspace_root(self.path) or self.path
         # Determine if this thread is allowed to run.
         while True:
             with THREADS_LOCK:
-                t = THREADS.get(self.window.id(), None)
+                t = THREADS.get(self.key, None)
                 if not t or not t.is_alive():
-                    THREADS[self.window.id()] = self
+                    THREADS[self.key] = self
                     break
 
-            # Another thread is already running for this window.
+            # Another thread is already running in this slot.
             if t.should_exit:
                 t.join()
             elif t.silently_interruptible:
@@ -88,12 +168,44 @@ class RustThread(object):
             # Try again.
 
         try:
-            self.run()
+            if self._wait_for_job():
+                self.run()
         finally:
             with THREADS_LOCK:
-                t = THREADS.get(self.window.id(), None)
+                self.running = False
+                t = THREADS.get(self.key, None)
                 if t is self:
-                    del THREADS[self.window.id()]
+                    del THREADS[self.key]
+                THREADS_LOCK.notify_all()
+
+    def _wait_for_job(self):
+        """Block until this thread is allowed to run.
+
+        :returns: False if the thread was terminated while waiting.
+        """
+        if self.job_class in UNQUEUED_JOB_CLASSES:
+            with THREADS_LOCK:
+                self.running = not self.should_exit
+                return self.running
+        entry = (JOB_CLASSES[self.job_class], next(_SEQUENCE), self)
+        max_jobs = _max_jobs()
+        with THREADS_LOCK:
+            WAITING.append(entry)
+            WAITING.sort(key=lambda x: x[:2])
+            try:
+                while True:
+                    if self.should_exit:
+                        return False
+                    running = sum(t.running for t in THREADS.values()
+                                  if t.job_class not in UNQUEUED_JOB_CLASSES)
+                    if running < max_jobs and WAITING[0] is entry:
+                        self.running = True
+                        return True
+                    # Wake up periodically to check `should_exit`.
+                    THREADS_LOCK.wait(0.5)
+            finally:
+                WAITING.remove(entry)
+                THREADS_LOCK.notify_all()
 
     def run(self):
         raise NotImplementedError()
@@ -107,6 +219,9 @@ class RustThread(object):
         p = self.current_proc
         if p and not p.finished:
             p.terminate()
+        with THREADS_LOCK:
+            # In case it is waiting for a job.
+            THREADS_LOCK.notify_all()
 
     def is_alive(self):
         return self.thread.is_alive()
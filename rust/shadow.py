@@ -0,0 +1,289 @@
+"""Shadow copies of Cargo workspaces for checking unsaved buffers.
+
+The on-save checker compiles what is on disk.  To check as you type, the
+workspace is mirrored into a directory in Sublime's cache directory, with
+the contents of modified (unsaved) buffers written in place of their files.
+Cargo is then run in the mirror.
+
+Unchanged files are hard links to the originals (falling back to copies if
+the cache directory is on a different file system), so updating the mirror
+is cheap.  A file written in place is visible through its link, and saving
+a file by replacing it changes the modification time of its directory, so
+only directories that changed since the last update are listed again (and
+only copied files are compared each time).  Files written from buffers are
+always separate files, so the originals are never modified.  The mirror has
+its own `CARGO_TARGET_DIR` (see `check_target`) which keeps its incremental
+compilation caches warm without disturbing the workspace's own target
+directory.
+
+Paths in Cargo's messages are relative to the workspace root, so they
+resolve to the real files when the real workspace root is used as the base
+path.  Absolute paths into the mirror are mapped back with `unshadow`.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+
+import sublime
+
+from . import check_target, log
+
+# Directories that are never mirrored.
+SKIP_DIRS = ('target', '.git', '.hg', '.svn')
+# Files that are always copied instead of linked, because Cargo may write to
+# them (which would modify the original through a hard link).
+COPY_FILES = ('Cargo.lock',)
+
+_LOCK = threading.Lock()
+# Dictionary of `(window_id, workspace)` to `ShadowTree`.  Each window has
+# its own mirror, since the windows have different modified buffers.
+TREES = {}
+
+
+def _shadow_root():
+    return os.path.join(sublime.cache_path(), 'RustEnhanced', 'shadow')
+
+
+def tree_for_workspace(window, workspace):
+    """Returns the `ShadowTree` of a window for a workspace root."""
+    key = (window.id(), workspace)
+    with _LOCK:
+        try:
+            return TREES[key]
+        except KeyError:
+            tree = TREES[key] = ShadowTree(workspace, window.id())
+            return tree
+
+
+class ShadowTree:
+
+    """The mirror of a workspace.
+
+    :ivar workspace: Root of the real workspace.
+    :ivar window_id: ID of the window whose buffers are mirrored, or None.
+    :ivar root: Directory containing the mirror of the workspace.
+    :ivar target_dir: `CARGO_TARGET_DIR` used for checks in the mirror (see
+        `check_target`).
+    :ivar overlays: Dictionary of relative path to the text of each file
+        written from a buffer.
+    """
+
+    def __init__(self, workspace, window_id=None):
+        self.workspace = workspace
+        self.window_id = window_id
+        name = hashlib.sha1(workspace.encode('utf-8')).hexdigest()[:16]
+        if window_id is not None:
+            name += '-%i' % (window_id,)
+        self.root = os.path.join(_shadow_root(), name)
+        self.target_dir = check_target.target_dir(workspace, 'shadow')
+        self.overlays = {}
+        # Dictionary of the relative path of each directory in the workspace
+        # to `(mtime, dirnames, filenames)` as of the last sync.
+        self._dirs = {}
+        # Set of relative paths of files that were copied instead of linked.
+        self._copies = set()
+
+    def shadow_path(self, path):
+        """Convert a path in the workspace to the path in the mirror."""
+        rel = os.path.relpath(path, self.workspace)
+        if rel == os.curdir:
+            return self.root
+        return os.path.join(self.root, rel)
+
+    def real_path(self, path):
+        """Convert a path in the mirror to the path in the workspace (other
+        paths are returned unchanged)."""
+        if path == self.root:
+            return self.workspace
+        prefix = os.path.join(self.root, '')
+        if path.startswith(prefix):
+            return os.path.join(self.workspace, path[len(prefix):])
+        return path
+
+    def sync(self, buffers):
+        """Update the mirror to match the workspace, with the contents of the
+        given buffers in place of their files.
+
+        :param buffers: Dictionary of absolute path to the text of a
+            modified buffer.  Paths outside of the workspace are ignored.
+        :returns: Number of files linked, copied, or written.
+        """
+        overlays = {}
+        for path, text in buffers.items():
+            rel = os.path.relpath(path, self.workspace)
+            if not rel.startswith(os.pardir):
+                overlays[rel] = text
+        if not os.path.isdir(self.root):
+            self._dirs = {}
+        updated = 0
+        for rel_dir, dirnames, filenames, changed in self._scan():
+            if changed:
+                self._sync_dir(rel_dir, dirnames, filenames, overlays)
+            for filename in filenames:
+                rel = os.path.normpath(os.path.join(rel_dir, filename))
+                if rel in overlays:
+                    continue
+                if changed or rel in self.overlays or rel in self._copies \
+                        or filename in COPY_FILES:
+                    if self._sync_file(rel):
+                        updated += 1
+        for rel, text in overlays.items():
+            # Rewriting the same text would change the modification time,
+            # causing Cargo to compile it again.
+            if self.overlays.get(rel) != text or \
+                    not os.path.exists(os.path.join(self.root, rel)):
+                self._write(rel, text)
+                updated += 1
+        self.overlays = overlays
+        return updated
+
+    def _scan(self):
+        """Returns a list of `(rel_dir, dirnames, filenames, changed)` for
+        each directory of the workspace, where `changed` is True if it was
+        listed again."""
+        result = []
+        dirs = {}
+        todo = [os.curdir]
+        while todo:
+            rel_dir = todo.pop()
+            path = os.path.join(self.workspace, rel_dir)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            cached = self._dirs.get(rel_dir)
+            if cached is not None and cached[0] == mtime:
+                dirnames, filenames = cached[1], cached[2]
+                changed = False
+            else:
+                dirnames = []
+                filenames = []
+                try:
+                    names = os.listdir(path)
+                except OSError:
+                    continue
+                for name in names:
+                    if os.path.isdir(os.path.join(path, name)):
+                        if name not in SKIP_DIRS:
+                            dirnames.append(name)
+                    else:
+                        filenames.append(name)
+                changed = True
+            dirs[rel_dir] = (mtime, dirnames, filenames)
+            result.append((rel_dir, dirnames, filenames, changed))
+            todo.extend(os.path.normpath(os.path.join(rel_dir, d))
+                        for d in dirnames)
+        self._dirs = dirs
+        return result
+
+    def _sync_dir(self, rel_dir, dirnames, filenames, overlays):
+        """Create a directory of the mirror, removing entries that no longer
+        exist in the workspace."""
+        shadow_dir = os.path.normpath(os.path.join(self.root, rel_dir))
+        os.makedirs(shadow_dir, exist_ok=True)
+        for name in os.listdir(shadow_dir):
+            path = os.path.join(shadow_dir, name)
+            rel = os.path.normpath(os.path.join(rel_dir, name))
+            if os.path.isdir(path) and not os.path.islink(path):
+                if name not in dirnames:
+                    shutil.rmtree(path)
+            elif name not in filenames and rel not in overlays and \
+                    name not in COPY_FILES:
+                os.unlink(path)
+                self._copies.discard(rel)
+
+    def _sync_file(self, rel):
+        src = os.path.join(self.workspace, rel)
+        dst = os.path.join(self.root, rel)
+        try:
+            src_stat = os.stat(src)
+        except OSError:
+            return False
+        try:
+            dst_stat = os.stat(dst)
+        except OSError:
+            dst_stat = None
+        if dst_stat is not None and rel not in self.overlays:
+            if (src_stat.st_ino, src_stat.st_dev) == \
+                    (dst_stat.st_ino, dst_stat.st_dev):
+                return False
+            if (src_stat.st_size, src_stat.st_mtime) == \
+                    (dst_stat.st_size, dst_stat.st_mtime):
+                return False
+        if dst_stat is not None:
+            os.unlink(dst)
+        if os.path.basename(rel) not in COPY_FILES:
+            try:
+                os.link(src, dst)
+                self._copies.discard(rel)
+                return True
+            except OSError:
+                pass
+        shutil.copy2(src, dst)
+        self._copies.add(rel)
+        return True
+
+    def _write(self, rel, text):
+        dst = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        # Never write through a hard link to the original file.
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        with open(dst, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+
+    def unshadow(self, obj):
+        """Replace paths in the mirror with the real paths in a JSON message
+        from Cargo (modified in place)."""
+        prefix = os.path.join(self.root, '')
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if isinstance(value, str):
+                    if value.startswith(prefix) or value == self.root:
+                        obj[key] = self.real_path(value)
+                elif isinstance(value, (dict, list)):
+                    self.unshadow(value)
+        elif isinstance(obj, list):
+            for i, value in enumerate(obj):
+                if isinstance(value, str):
+                    if value.startswith(prefix):
+                        obj[i] = self.real_path(value)
+                elif isinstance(value, (dict, list)):
+                    self.unshadow(value)
+        return obj
+
+
+def modified_buffers(window):
+    """Returns a dictionary of path to text of all modified Rust buffers in
+    the window."""
+    result = {}
+    for view in window.views():
+        path = view.file_name()
+        if path and path.endswith('.rs') and view.is_dirty() and \
+                path not in result:
+            result[path] = view.substr(sublime.Region(0, view.size()))
+    return result
+
+
+def sync_for_check(window, cwd):
+    """Mirror the workspace containing `cwd` with the modified buffers of the
+    window.
+
+    :returns: The `ShadowTree`, or None if it failed.
+    """
+    from . import util
+    workspace = util.find_workspace_root(cwd) or cwd
+    tree = tree_for_workspace(window, workspace)
+    try:
+        updated = tree.sync(modified_buffers(window))
+    except OSError as e:
+        log.critical(window, 'Rust Enhanced: Failed to mirror %s: %s',
+                     workspace, e, category='check')
+        return None
+    log.log(window, 'Mirrored %s (%i files updated)', workspace, updated,
+            category='check')
+    return tree
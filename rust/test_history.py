@@ -0,0 +1,146 @@
+"""History of how long each test takes to run.
+
+Test durations are collected from the JSON output of the test harness (see
+`libtest`) and saved in Sublime's cache directory so they can be compared
+across runs.  History is kept per Cargo workspace, keyed by the test binary
+(without Cargo's hash suffix) and the test name.  Tests that have not run in
+the last `MAX_RUNS` recorded runs of a workspace (such as deleted or renamed
+tests) are dropped.
+"""
+
+import os
+import re
+import threading
+
+import sublime
+
+from . import util
+
+# Number of durations kept for each test.
+MAX_SAMPLES = 10
+# Tests are dropped if they have not run in this many runs.
+MAX_RUNS = 20
+# A test has regressed if it is this much slower than the previous run...
+REGRESSION_RATIO = 1.5
+# ...and at least this many seconds slower (to ignore noise in fast tests).
+REGRESSION_MIN_DELTA = 0.05
+# Version of the on-disk format, bump when it changes.
+HISTORY_VERSION = 2
+
+_LOCK = threading.Lock()
+# Dictionary of workspace root to `{'runs': count, 'tests': {key: entry}}`,
+# None if not loaded yet.
+_HISTORY = None
+
+
+def _history_path():
+    return os.path.join(sublime.cache_path(), 'RustEnhanced',
+                        'test_history.json')
+
+
+def _load():
+    global _HISTORY
+    if _HISTORY is not None:
+        return _HISTORY
+    _HISTORY = {}
+    data = util.load_json_cache(_history_path(), HISTORY_VERSION)
+    if data is not None:
+        _HISTORY = data['workspaces']
+    return _HISTORY
+
+
+def _save():
+    data = {'version': HISTORY_VERSION, 'workspaces': _HISTORY}
+    util.save_json_cache(_history_path(), data, 'test history')
+
+
+def binary_stem(binary):
+    """Remove the hash Cargo adds to test executable names
+    (`foo-0123456789abcdef` becomes `foo`)."""
+    if binary is None:
+        return ''
+    binary = re.sub(r'\.exe$', '', binary)
+    return re.sub(r'-[0-9a-f]{16}$', '', binary)
+
+
+def record(workspace, test_run):
+    """Add the durations from a `libtest.TestRun` to the history."""
+    results = [r for r in test_run.results if r.exec_time is not None]
+    if not results:
+        return
+    with _LOCK:
+        history = _load().setdefault(workspace, {'runs': 0, 'tests': {}})
+        history['runs'] += 1
+        tests = history['tests']
+        for result in results:
+            key = '%s %s' % (binary_stem(result.binary), result.name)
+            entry = tests.setdefault(key, {
+                'binary': binary_stem(result.binary),
+                'name': result.name,
+                'times': [],
+            })
+            entry['times'] = (entry['times'] + [result.exec_time])[-MAX_SAMPLES:]
+            entry['outcome'] = result.outcome
+            entry['source'] = result.source
+            entry['doc'] = result.doc
+            entry['run'] = history['runs']
+        for key, entry in list(tests.items()):
+            if entry['run'] <= history['runs'] - MAX_RUNS:
+                del tests[key]
+        _save()
+
+
+class TestTiming:
+
+    """Summary of the timing history of a test.
+
+    :ivar workspace: Root of the workspace the test ran in.
+    :ivar binary: Name of the test executable (without the hash).
+    :ivar source: Source file of the test target as displayed by Cargo, or
+        None if not known.
+    :ivar doc: True for doc tests.
+    :ivar name: Name of the test.
+    :ivar latest: Duration of the most recent run in seconds.
+    :ivar previous: Duration of the run before that, or None.
+    :ivar outcome: Outcome of the most recent run.
+    """
+
+    def __init__(self, workspace, entry):
+        self.workspace = workspace
+        self.binary = entry['binary']
+        self.source = entry.get('source')
+        self.doc = entry.get('doc', False)
+        self.name = entry['name']
+        self.latest = entry['times'][-1]
+        self.previous = entry['times'][-2] if len(entry['times']) > 1 else None
+        self.outcome = entry.get('outcome')
+
+    @property
+    def regressed(self):
+        """True if the most recent run was significantly slower than the
+        previous one."""
+        if self.previous is None:
+            return False
+        return self.latest >= self.previous * REGRESSION_RATIO and \
+            self.latest - self.previous >= REGRESSION_MIN_DELTA
+
+
+def timings(workspaces):
+    """Returns a list of `TestTiming` for the tests of the given workspaces,
+    with regressions first, then slowest first."""
+    with _LOCK:
+        history = _load()
+        result = []
+        for workspace in workspaces:
+            info = history.get(workspace, {'tests': {}})
+            for entry in info['tests'].values():
+                if entry['times']:
+                    result.append(TestTiming(workspace, entry))
+    result.sort(key=lambda t: (not t.regressed, -t.latest))
+    return result
+
+
+def workspaces():
+    """Returns the workspaces in the history."""
+    with _LOCK:
+        return list(_load())
@@ -1,6 +1,6 @@
 """Themes for different message styles."""
 
-from . import util
+from . import util, rendered
 from .batch import *
 
 
@@ -15,6 +15,22 @@ def _help_link(code):
         return ''
 
 
+def _rendered(view, batch):
+    """Returns `(link, content, css)` for rustc's rendered text of the
+    batch.  All are empty strings if there is no rendered text."""
+    if not isinstance(batch, PrimaryBatch) or batch.rendered_key is None:
+        return '', '', ''
+    text = rendered.text_for_batch(view.window(), batch)
+    if text is None:
+        return '', '', ''
+    link = '&nbsp;<a class="rust-rendered-link" href="rendered:%s">%s</a>' % (
+        batch.primary_message.region_key,
+        'less' if batch.expanded else 'more')
+    if batch.expanded:
+        return link, rendered.to_minihtml(text), rendered.CSS
+    return link, '', ''
+
+
 class Theme:
 
     """Base class for themes."""
@@ -75,7 +91,7 @@ class ClearTheme(Theme):
 
     MSG_TMPL = util.multiline_fix("""
         <div class="rust-{level}">
-            {level_text}{text}{help_link}{close_link}
+            {level_text}{text}{help_link}{rendered_link}{close_link}
         </div>
     """)
 
@@ -90,6 +106,8 @@ class ClearTheme(Theme):
             extra_css = POPUP_CSS
         else:
             extra_css = ''
+        rendered_link, rendered_content, rendered_css = _rendered(view, batch)
+        extra_css += rendered_css
 
         # Collect all the messages for this batch.
         msgs = []
@@ -111,15 +129,20 @@ class ClearTheme(Theme):
             if i == 0:
                 # Only show close link on first message of a batch.
                 close_link = '&nbsp;<a class="rust-close-link" href="hide">\xD7</a>'
+                link = rendered_link
             else:
                 close_link = ''
+                link = ''
             msgs.append(self.MSG_TMPL.format(
                 level=msg.level,
                 level_text=level_text,
                 text=text,
                 help_link=_help_link(msg.code),
+                rendered_link=link,
                 close_link=close_link,
             ))
+        if rendered_content:
+            msgs.append(rendered_content)
 
         # Add cross-links.
         if isinstance(batch, PrimaryBatch):
@@ -212,8 +235,9 @@ class SolidTheme(Theme):
 
     PRIMARY_MSG_TMPL = util.multiline_fix("""
         <div class="rust-block rust-{level}">
-            {icon}&nbsp;{text}{help_link}&nbsp;<a class="rust-close-link" href="hide">\xD7</a>
+            {icon}&nbsp;{text}{help_link}{rendered_link}&nbsp;<a class="rust-close-link" href="hide">\xD7</a>
             {children}
+            {rendered}
             {links}
         </div>
     """)
@@ -250,6 +274,8 @@ class SolidTheme(Theme):
             extra_css = POPUP_CSS
         else:
             extra_css = ''
+        rendered_link, rendered_content, rendered_css = _rendered(view, batch)
+        extra_css += rendered_css
 
         # Collect all the child messages together.
         children = []
@@ -283,7 +309,9 @@ class SolidTheme(Theme):
                 icon=icon(batch.primary_message.level),
                 text=text,
                 help_link=_help_link(batch.primary_message.code),
+                rendered_link=rendered_link,
                 children=''.join(children),
+                rendered=rendered_content,
                 links=''.join(links))
         else:
             if batch.back_link:
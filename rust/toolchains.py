@@ -0,0 +1,161 @@
+"""Cached inventory of the installed rustup toolchains and targets.
+
+Asking rustup for the list of toolchains (or the targets of a toolchain)
+takes a noticeable amount of time.  The results are cached here and reused
+until the contents of the rustup toolchains directory change (which happens
+when a toolchain or target is installed or removed).  The cache is filled on
+a background thread when the plugin loads.
+"""
+
+import glob
+import os
+import re
+import threading
+
+from . import rust_proc, util, log
+
+# Lock for the cache variables.
+_LOCK = threading.Lock()
+# Cached result of `toolchain_list`, as `(stamp, toolchains, installed)`
+# where `installed` excludes the shorthand names.
+_TOOLCHAINS = None
+# Dictionary of toolchain name to `(stamp, triples)`.
+_TRIPLES = {}
+
+
+def _rustup_home():
+    home = os.environ.get('RUSTUP_HOME')
+    if home:
+        return home
+    return os.path.join(os.path.expanduser('~'), '.rustup')
+
+
+def _stamp():
+    """Returns a value that changes whenever a toolchain or target is added
+    or removed, or the default toolchain is changed."""
+    home = _rustup_home()
+    paths = [os.path.join(home, 'toolchains'),
+             os.path.join(home, 'settings.toml')]
+    paths.extend(glob.glob(os.path.join(home, 'toolchains', '*',
+                                        'lib', 'rustlib')))
+    result = []
+    for path in paths:
+        try:
+            result.append((path, os.stat(path).st_mtime))
+        except OSError:
+            result.append((path, None))
+    return tuple(result)
+
+
+def toolchain_list(window):
+    """Returns a sorted list of installed toolchains, including shorthand
+    names like `nightly` or `stable-2018-01-01`.
+
+    :raises CalledProcessError: rustup failed.
+    """
+    return _toolchains(window)[1][:]
+
+
+def installed_toolchains(window):
+    """Returns a sorted list of the full names of the installed toolchains
+    (without shorthand names).
+
+    :raises CalledProcessError: rustup failed.
+    """
+    return _toolchains(window)[2][:]
+
+
+def _toolchains(window):
+    global _TOOLCHAINS
+    stamp = _stamp()
+    with _LOCK:
+        if _TOOLCHAINS is None or _TOOLCHAINS[0] != stamp:
+            _TOOLCHAINS = (stamp,) + _load_toolchain_list(window)
+        return _TOOLCHAINS
+
+
+def _load_toolchain_list(window):
+    output = rust_proc.check_output(window,
+                                    'rustup toolchain list'.split(),
+                                    None)
+    output = output.splitlines()
+    system_default = util.index_with(output,
+                                     lambda x: x.endswith(' (default)'))
+    if system_default != -1:
+        # Strip the " (default)" text.
+        output[system_default] = output[system_default][:-10]
+    # Rustup supports some shorthand of either `channel` or `channel-date`
+    # without the trailing target info.
+    #
+    # Complete list of available toolchains is available at:
+    # https://static.rust-lang.org/dist/index.html
+    # (See https://github.com/rust-lang-nursery/rustup.rs/issues/215)
+    shorthands = []
+    channels = ['nightly', 'beta', 'stable', '\d\.\d{1,2}\.\d']
+    pattern = '(%s)(?:-(\d{4}-\d{2}-\d{2}))?(?:-(.*))' % '|'.join(channels)
+    for toolchain in output:
+        m = re.match(pattern, toolchain)
+        # Should always match.
+        if m:
+            channel = m.group(1)
+            date = m.group(2)
+            if date:
+                shorthand = '%s-%s' % (channel, date)
+            else:
+                shorthand = channel
+            if shorthand not in shorthands:
+                shorthands.append(shorthand)
+    result = shorthands + output
+    result.sort()
+    return result, sorted(output)
+
+
+def target_triples(window, toolchain):
+    """Returns a list of `(triple, is_default)` tuples of the targets
+    installed for the given toolchain.
+
+    :raises CalledProcessError: rustup failed.
+    """
+    stamp = _stamp()
+    with _LOCK:
+        cached = _TRIPLES.get(toolchain)
+        if cached is not None and cached[0] == stamp:
+            return cached[1][:]
+        result = _load_target_triples(window, toolchain)
+        _TRIPLES[toolchain] = (stamp, result)
+        return result[:]
+
+
+def _load_target_triples(window, toolchain):
+    # Could check if rustup is not installed, to run
+    # "rustc --print target-list", but that does not tell
+    # us which targets are installed.
+    cmd = 'rustup target list --toolchain=%s' % toolchain
+    triples = rust_proc.check_output(window, cmd.split(), None).splitlines()
+    result = []
+    for triple in triples:
+        if triple.endswith(' (default)'):
+            result.append((triple[:-10], True))
+        elif triple.endswith(' (installed)'):
+            result.append((triple[:-12], False))
+        # Don't bother listing uninstalled targets.
+    return result
+
+
+def prefetch(window):
+    """Fill the cache on a background thread."""
+    def run():
+        try:
+            # Shorthand names are the same toolchains, loading them would
+            # run rustup again for each.
+            for toolchain in installed_toolchains(window):
+                target_triples(window, toolchain)
+        except Exception as e:
+            # rustup may not be installed, the error will be shown if the
+            # user tries to use a command that needs it.
+            log.log(window, 'Failed to load rustup toolchains: %s', e,
+                    category='config')
+
+    t = threading.Thread(target=run, name='Rust Toolchain Prefetch')
+    t.daemon = True
+    t.start()
@@ -2,8 +2,11 @@
 
 import sublime
 import textwrap
+import json
 import os
+import re
 
+from . import profile
 
 PACKAGE_NAME = __package__.split('.')[0]
 
@@ -27,6 +30,60 @@ def multiline_fix(s):
     return textwrap.dedent(s).lstrip()
 
 
+def load_json_cache(path, version):
+    """Load a JSON cache file written by `save_json_cache`.
+
+    :returns: The saved dictionary, or None if the file does not exist, is
+        corrupt, or has a different `version` key.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != version:
+        return None
+    return data
+
+
+def write_cache_file(path, text, description, window=None):
+    """Replace the contents of a cache file.
+
+    The text is written to a temporary file first, so that readers never
+    see a partially written file.  Failures are logged.
+
+    :param description: What the file contains, for the error message.
+    :returns: True if the file was written.
+    """
+    tmp = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        from . import log
+        log.critical(window, 'Rust Enhanced: Failed to save %s: %s',
+                     description, e)
+        return False
+    return True
+
+
+def save_json_cache(path, data, description, window=None):
+    """Save a dictionary (including a `version` key) to a JSON cache file
+    (see `write_cache_file`)."""
+    return write_cache_file(path, json.dumps(data), description, window)
+
+
+def in_window_folders(window, paths):
+    """Returns the paths (such as workspace roots) that are inside one of the
+    window's folders."""
+    folders = [os.path.join(folder, '') for folder in window.folders()]
+    return [path for path in paths
+            if any(os.path.join(path, '').startswith(folder)
+                   for folder in folders)]
+
+
 def get_setting(name, default=None):
     """Retrieve a setting from Sublime settings."""
     pdata = sublime.active_window().project_data()
@@ -43,6 +100,7 @@ def get_setting(name, default=None):
     return settings.get(name, default)
 
 
+@profile.timed('util.get_rustc_version')
 def get_rustc_version(window, cwd, toolchain=None):
     """Returns the rust version for the given directory.
 
@@ -79,6 +137,34 @@ def find_cargo_manifest(path):
         path = parent
 
 
+def find_workspace_root(path):
+    """Find the root of the Cargo workspace containing the given path.
+
+    This is a quick approximation that does not run Cargo.  It looks for the
+    closest Cargo.toml (starting at the package manifest) with a
+    `[workspace]` section.
+
+    :Returns: The workspace root path, or the package path if it is not part
+        of a workspace, or None if no manifest is found.
+    """
+    package = find_cargo_manifest(path)
+    if package is None:
+        return None
+    path = package
+    while True:
+        manifest = os.path.join(path, 'Cargo.toml')
+        try:
+            with open(manifest, encoding='utf-8') as f:
+                if re.search(r'^\s*\[workspace\]', f.read(), re.MULTILINE):
+                    return path
+        except (OSError, UnicodeDecodeError):
+            pass
+        parent = os.path.dirname(path)
+        if parent == path:
+            return package
+        path = parent
+
+
 def active_view_is_rust(window=None, view=None):
     """Determine if the current view is a Rust source file.
 
@@ -105,6 +191,7 @@ def is_rust_view(settings):
     return (s == 'Packages/%s/RustEnhanced.sublime-syntax' % (PACKAGE_NAME,))
 
 
+@profile.timed('util.get_cargo_metadata')
 def get_cargo_metadata(window, cwd, toolchain=None):
     """Load Cargo metadata.
 
@@ -0,0 +1,3 @@
+# The tests in this directory run inside Sublime with UnitTesting; only the
+# tests in `headless` run with pytest.
+collect_ignore_glob = ['test_*.py']
@@ -0,0 +1,52 @@
+"""Run a `RustProc` on recorded output instead of a real process.
+
+The output is fed through `RustProc`'s stdout reader to a listener exactly
+as it is during a build, so the JSON decoding and listener callbacks are the
+same.
+"""
+
+import io
+import threading
+import time
+
+from rust import rust_proc
+
+
+class ReplayPopen:
+
+    """Stands in for the `subprocess.Popen` object of a `RustProc`, with
+    the recorded output as stdout."""
+
+    pid = 0
+
+    def __init__(self, lines, returncode=0):
+        self.stdout = io.BytesIO(
+            ''.join(line + '\n' for line in lines).encode('utf-8'))
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+
+def replay(window, cwd, lines, listener, cmd=None, returncode=0,
+           decode_json=True):
+    """Feed lines of output to a listener.
+
+    :param lines: List of lines (without newlines) printed by the process.
+    :param listener: The `ProcListener`, such as `opanel.OutputListener`.
+    :returns: The `RustProc`.
+    """
+    p = rust_proc.RustProc()
+    p.cmd = cmd or ['cargo', 'check', '--message-format=json']
+    p.cwd = cwd
+    p.env = {}
+    p.window = window
+    p.listener = listener
+    p.decode_json = decode_json
+    p.json_stop_pattern = None
+    p.start_time = time.time()
+    p._owner = threading.current_thread()
+    p.proc = ReplayPopen(lines, returncode)
+    listener.on_begin(p)
+    p._read_stdout()
+    return p
@@ -0,0 +1,53 @@
+"""Fixtures for running the plugin with the stand-in `sublime` module."""
+
+import os
+import shutil
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path[0:0] = [HERE, ROOT]
+
+import pytest  # noqa: E402
+import sublime  # noqa: E402
+from rust import log, messages  # noqa: E402
+
+TESTS_DIR = os.path.join(ROOT, 'tests')
+
+# Marks tests that run Cargo.
+needs_cargo = pytest.mark.skipif(shutil.which('cargo') is None,
+                                 reason='cargo not installed')
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    sublime.reset()
+    messages.clear_all_messages()
+    log.logs.clear()
+    yield
+    messages.clear_all_messages()
+    sublime.reset()
+
+
+@pytest.fixture
+def settings():
+    """The plugin's settings (changes are discarded after the test)."""
+    return sublime.load_settings('RustEnhanced.sublime-settings')
+
+
+@pytest.fixture
+def window():
+    """A window with the package root as its folder."""
+    return sublime.new_window([ROOT])
+
+
+def fixture_path(*parts):
+    """Path to a file in one of the test fixtures in `tests/`."""
+    return os.path.join(TESTS_DIR, *parts)
+
+
+def write_file(path, text):
+    """Write a file, creating its directory."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
@@ -0,0 +1,46 @@
+"""Helpers to build the JSON messages emitted by `cargo --message-format=json`."""
+
+
+def span(file_name, line, col_start, col_end, label=None, primary=True,
+         text='', replacement=None):
+    """A span covering part of a single line (1-based line and columns)."""
+    return {
+        'file_name': file_name,
+        'byte_start': 0,
+        'byte_end': 0,
+        'line_start': line,
+        'line_end': line,
+        'column_start': col_start,
+        'column_end': col_end,
+        'is_primary': primary,
+        'text': [{'text': text, 'highlight_start': col_start,
+                  'highlight_end': col_end}],
+        'label': label,
+        'suggested_replacement': replacement,
+        'suggestion_applicability': None if replacement is None
+        else 'MachineApplicable',
+        'expansion': None,
+    }
+
+
+def diagnostic(message, spans, level='error', code=None, children=()):
+    return {
+        'message': message,
+        'code': {'code': code, 'explanation': None} if code else None,
+        'level': level,
+        'spans': spans,
+        'children': list(children),
+        'rendered': '%s: %s\n' % (level, message),
+    }
+
+
+def compiler_message(diag, package_id='foo 0.1.0 (path+file:///foo)',
+                     src_path='/foo/src/main.rs'):
+    """Wrap a diagnostic as Cargo does."""
+    return {
+        'reason': 'compiler-message',
+        'package_id': package_id,
+        'target': {'kind': ['bin'], 'crate_types': ['bin'], 'name': 'foo',
+                   'src_path': src_path},
+        'message': diag,
+    }
@@ -0,0 +1,9 @@
+"""A stand-in for the `shellenv` dependency that Package Control installs
+(see `sublime.py` in this directory).  Uses the current environment instead
+of the login shell's."""
+
+import os
+
+
+def get_env(for_subprocess=False):
+    return (os.environ.get('SHELL', '/bin/sh'), dict(os.environ))
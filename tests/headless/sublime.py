@@ -0,0 +1,626 @@
+"""A stand-in for Sublime's `sublime` module, for running the plugin core
+outside of the editor.
+
+Only the parts of the API used by the plugin are implemented.  Views hold
+the text of a file (loaded from disk when opened) and record the regions,
+phantoms, and status they are given so that they can be inspected.
+Callbacks passed to `set_timeout` are queued, and run with
+`run_timeouts()`.
+
+Put the directory containing this file on `sys.path` before importing the
+plugin.
+"""
+
+import bisect
+import json
+import os
+import re
+import tempfile
+
+# Flags used by the plugin.  The values match Sublime's.
+HOVER_TEXT = 1
+HOVER_GUTTER = 2
+HOVER_MARGIN = 3
+ENCODED_POSITION = 1
+TRANSIENT = 4
+FORCE_GROUP = 8
+DRAW_EMPTY = 1
+HIDE_ON_MINIMAP = 2
+DRAW_EMPTY_AS_OVERWRITE = 4
+DRAW_NO_FILL = 32
+DRAW_NO_OUTLINE = 256
+DRAW_SOLID_UNDERLINE = 512
+DRAW_STIPPLED_UNDERLINE = 1024
+DRAW_SQUIGGLY_UNDERLINE = 2048
+PERSISTENT = 16
+HIDDEN = 128
+LAYOUT_INLINE = 0
+LAYOUT_BELOW = 1
+LAYOUT_BLOCK = 2
+COOPERATE_WITH_AUTO_COMPLETE = 2
+HIDE_ON_MOUSE_MOVE = 4
+HIDE_ON_MOUSE_MOVE_AWAY = 8
+OP_EQUAL = 0
+OP_NOT_EQUAL = 1
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+_CACHE_DIR = None
+# Queue of callbacks from `set_timeout`.
+_TIMEOUTS = []
+# Messages shown with `error_message`, `message_dialog`, and
+# `status_message`.
+DIALOGS = []
+
+
+def version():
+    return '4000'
+
+
+def platform():
+    return 'linux'
+
+
+def arch():
+    return 'x64'
+
+
+def cache_path():
+    global _CACHE_DIR
+    if _CACHE_DIR is None:
+        _CACHE_DIR = tempfile.mkdtemp(prefix='sublime-cache-')
+    return _CACHE_DIR
+
+
+def packages_path():
+    return os.path.dirname(PACKAGE_ROOT)
+
+
+def set_timeout(callback, delay=0):
+    _TIMEOUTS.append(callback)
+
+
+set_timeout_async = set_timeout
+
+
+def run_timeouts():
+    """Run the queued `set_timeout` callbacks (including any queued while
+    running them)."""
+    while _TIMEOUTS:
+        callback = _TIMEOUTS.pop(0)
+        callback()
+
+
+def error_message(msg):
+    DIALOGS.append(('error', msg))
+
+
+def message_dialog(msg):
+    DIALOGS.append(('message', msg))
+
+
+def ok_cancel_dialog(msg, ok_title=''):
+    DIALOGS.append(('ok_cancel', msg))
+    return True
+
+
+def status_message(msg):
+    DIALOGS.append(('status', msg))
+
+
+def _strip_json_comments(text):
+    # Remove // comments that are not inside strings.
+    result = []
+    for line in text.splitlines():
+        in_string = False
+        escaped = False
+        for i, c in enumerate(line):
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = not in_string
+            elif not in_string and line.startswith('//', i):
+                line = line[:i]
+                break
+        result.append(line)
+    text = '\n'.join(result)
+    # Trailing commas.
+    return re.sub(r',(\s*[}\]])', r'\1', text)
+
+
+def decode_value(data):
+    return json.loads(_strip_json_comments(data))
+
+
+def encode_value(value, pretty=False):
+    return json.dumps(value, indent=4 if pretty else None)
+
+
+def load_resource(name):
+    """Load a resource such as `Packages/Rust Enhanced/file.json` from the
+    package directory."""
+    parts = name.split('/')
+    if parts[0] != 'Packages' or len(parts) < 3:
+        raise IOError('resource not found: %s' % (name,))
+    with open(os.path.join(PACKAGE_ROOT, *parts[2:]), encoding='utf-8') as f:
+        return f.read()
+
+
+def expand_variables(value, variables):
+    def replace(m):
+        name = m.group(1) or m.group(2)
+        return variables.get(name, '')
+    if isinstance(value, str):
+        return re.sub(r'\$(?:\{(\w+)\}|(\w+))', replace, value)
+    if isinstance(value, list):
+        return [expand_variables(v, variables) for v in value]
+    if isinstance(value, dict):
+        return {k: expand_variables(v, variables) for k, v in value.items()}
+    return value
+
+
+class Region:
+
+    def __init__(self, a, b=None, xpos=-1):
+        if b is None:
+            b = a
+        self.a = a
+        self.b = b
+        self.xpos = xpos
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+    def empty(self):
+        return self.a == self.b
+
+    def contains(self, x):
+        if isinstance(x, Region):
+            return self.begin() <= x.begin() and x.end() <= self.end()
+        return self.begin() <= x <= self.end()
+
+    def intersects(self, other):
+        return (self.begin() < other.end() and other.begin() < self.end()) \
+            or self == other
+
+    def __eq__(self, other):
+        return isinstance(other, Region) and \
+            (self.a, self.b) == (other.a, other.b)
+
+    def __hash__(self):
+        return hash((self.a, self.b))
+
+    def __len__(self):
+        return self.size()
+
+    def __repr__(self):
+        return '(%i, %i)' % (self.a, self.b)
+
+
+class Settings:
+
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+        self._on_change = {}
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def set(self, name, value):
+        self._values[name] = value
+        for callback in list(self._on_change.values()):
+            callback()
+
+    def erase(self, name):
+        self._values.pop(name, None)
+
+    def has(self, name):
+        return name in self._values
+
+    def add_on_change(self, key, callback):
+        self._on_change[key] = callback
+
+    def clear_on_change(self, key):
+        self._on_change.pop(key, None)
+
+
+_SETTINGS = {}
+
+
+def load_settings(name):
+    """Returns the settings, using the package's default settings file (if
+    there is one with the same name)."""
+    try:
+        return _SETTINGS[name]
+    except KeyError:
+        pass
+    values = {}
+    path = os.path.join(PACKAGE_ROOT, name)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            values = decode_value(f.read())
+    settings = _SETTINGS[name] = Settings(values)
+    return settings
+
+
+def save_settings(name):
+    pass
+
+
+class Selection(list):
+
+    def add(self, region):
+        self.append(region)
+
+    def clear(self):
+        del self[:]
+
+
+_NEXT_ID = [1]
+
+
+def _next_id():
+    result = _NEXT_ID[0]
+    _NEXT_ID[0] += 1
+    return result
+
+
+class View:
+
+    """A view of a file (or scratch buffer).
+
+    :ivar regions: Dictionary of key to `(regions, scope, icon, flags)` from
+        `add_regions`.
+    :ivar phantoms: Dictionary of key to a list of `(region, content)` from
+        `add_phantom`.
+    :ivar status: Dictionary of key to status bar text.
+    """
+
+    def __init__(self, window, file_name=None, text=''):
+        self._id = _next_id()
+        self._buffer_id = self._id
+        self._window = window
+        self._file_name = file_name
+        self._name = ''
+        self._text = ''
+        self._line_starts = [0]
+        self._settings = Settings({'word_wrap': True})
+        self._scratch = False
+        self._read_only = False
+        self._change_count = 0
+        self._dirty = False
+        self._sel = Selection([Region(0)])
+        self.regions = {}
+        self.phantoms = {}
+        self.status = {}
+        self.syntax = None
+        self._set_text(text)
+
+    def _set_text(self, text):
+        self._text = text
+        self._line_starts = [0] + [m.end() for m in re.finditer('\n', text)]
+        self._change_count += 1
+
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._buffer_id
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._file_name
+
+    def name(self):
+        return self._name
+
+    def set_name(self, name):
+        self._name = name
+
+    def set_scratch(self, scratch):
+        self._scratch = scratch
+
+    def set_read_only(self, read_only):
+        self._read_only = read_only
+
+    def is_loading(self):
+        return False
+
+    def is_valid(self):
+        return self._window is not None
+
+    def change_count(self):
+        return self._change_count
+
+    def settings(self):
+        return self._settings
+
+    def size(self):
+        return len(self._text)
+
+    def substr(self, x):
+        if isinstance(x, Region):
+            return self._text[x.begin():x.end()]
+        return self._text[x:x + 1]
+
+    def rowcol(self, point):
+        point = max(0, min(point, len(self._text)))
+        row = bisect.bisect_right(self._line_starts, point) - 1
+        return (row, point - self._line_starts[row])
+
+    def text_point(self, row, col):
+        if row >= len(self._line_starts):
+            return len(self._text)
+        return min(self._line_starts[row] + col, len(self._text))
+
+    def line(self, x):
+        point = x.begin() if isinstance(x, Region) else x
+        row = self.rowcol(point)[0]
+        start = self._line_starts[row]
+        end = self._text.find('\n', start)
+        return Region(start, len(self._text) if end == -1 else end)
+
+    def find_all(self, pattern, flags=0, fmt=None, extractions=None):
+        result = []
+        for m in re.finditer(pattern, self._text, re.MULTILINE):
+            result.append(Region(m.start(), m.end()))
+            if extractions is not None and fmt is not None:
+                extractions.append(m.expand(fmt.replace('$', '\\')))
+        return result
+
+    def sel(self):
+        return self._sel
+
+    def scope_name(self, point):
+        if self._file_name and self._file_name.endswith('.rs'):
+            return 'source.rust '
+        return 'text.plain '
+
+    def match_selector(self, point, selector):
+        return selector.split('.')[0] in self.scope_name(point)
+
+    def em_width(self):
+        return 8.0
+
+    def viewport_extent(self):
+        return (800.0, 600.0)
+
+    def show(self, x, show_surrounds=True):
+        pass
+
+    def show_at_center(self, x):
+        pass
+
+    def assign_syntax(self, syntax):
+        self.syntax = syntax
+
+    def set_syntax_file(self, syntax):
+        self.syntax = syntax
+
+    def add_regions(self, key, regions, scope='', icon='', flags=0):
+        self.regions[key] = (list(regions), scope, icon, flags)
+
+    def get_regions(self, key):
+        try:
+            return list(self.regions[key][0])
+        except KeyError:
+            return []
+
+    def erase_regions(self, key):
+        self.regions.pop(key, None)
+
+    def add_phantom(self, key, region, content, layout, on_navigate=None):
+        self.phantoms.setdefault(key, []).append((region, content))
+        return _next_id()
+
+    def erase_phantoms(self, key):
+        self.phantoms.pop(key, None)
+
+    def set_status(self, key, value):
+        self.status[key] = value
+
+    def get_status(self, key):
+        return self.status.get(key, '')
+
+    def erase_status(self, key):
+        self.status.pop(key, None)
+
+    def show_popup(self, content, flags=0, location=-1, max_width=320,
+                   max_height=240, on_navigate=None, on_hide=None):
+        self.popup = content
+
+    def hide_popup(self):
+        self.popup = None
+
+    def is_dirty(self):
+        return self._dirty
+
+    def is_popup_visible(self):
+        return getattr(self, 'popup', None) is not None
+
+    def find_all_results(self):
+        return []
+
+    def run_command(self, cmd, args=None):
+        args = args or {}
+        if cmd == 'append':
+            self._set_text(self._text + args['characters'])
+            self._dirty = self._file_name is not None
+        elif cmd == 'select_all':
+            self._sel = Selection([Region(0, len(self._text))])
+        elif cmd in ('right_delete', 'left_delete'):
+            for region in reversed(self._sel):
+                self._set_text(self._text[:region.begin()] +
+                               self._text[region.end():])
+            self._sel = Selection([Region(0)])
+            self._dirty = self._file_name is not None
+        elif cmd == 'save':
+            with open(self._file_name, 'w', encoding='utf-8') as f:
+                f.write(self._text)
+            self._dirty = False
+
+    def close(self):
+        if self._window:
+            self._window._close_view(self)
+        return True
+
+
+class Window:
+
+    def __init__(self, folders=()):
+        self._id = _next_id()
+        self._folders = list(folders)
+        self._views = []
+        self._panels = {}
+        self._active_view = None
+        self._project_data = None
+        self.commands = []
+        self.quick_panels = []
+
+    def id(self):
+        return self._id
+
+    def is_valid(self):
+        return self in _WINDOWS
+
+    def folders(self):
+        return list(self._folders)
+
+    def project_file_name(self):
+        return None
+
+    def project_data(self):
+        if self._project_data is None and self._folders:
+            return {'folders': [{'path': f} for f in self._folders]}
+        return self._project_data
+
+    def set_project_data(self, data):
+        self._project_data = data
+
+    def extract_variables(self):
+        variables = {'platform': 'Linux', 'packages': packages_path()}
+        if self._folders:
+            variables['folder'] = self._folders[0]
+        view = self.active_view()
+        if view and view.file_name():
+            path = view.file_name()
+            variables.update({
+                'file': path,
+                'file_path': os.path.dirname(path),
+                'file_name': os.path.basename(path),
+                'file_base_name': os.path.splitext(os.path.basename(path))[0],
+                'file_extension': os.path.splitext(path)[1][1:],
+            })
+        return variables
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._active_view
+
+    def focus_view(self, view):
+        self._active_view = view
+
+    def find_open_file(self, file_name):
+        for view in self._views:
+            if view.file_name() == file_name:
+                return view
+        return None
+
+    def open_file(self, file_name, flags=0, group=-1):
+        if flags & ENCODED_POSITION:
+            file_name = re.sub(r'(:\d+){1,2}$', '', file_name)
+        view = self.find_open_file(file_name)
+        if view is None:
+            try:
+                with open(file_name, encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                text = ''
+            view = View(self, file_name, text)
+            self._views.append(view)
+        self._active_view = view
+        return view
+
+    def new_file(self):
+        view = View(self)
+        self._views.append(view)
+        self._active_view = view
+        return view
+
+    def _close_view(self, view):
+        if view in self._views:
+            self._views.remove(view)
+        if self._active_view is view:
+            self._active_view = self._views[-1] if self._views else None
+
+    def create_output_panel(self, name, unlisted=False):
+        view = self._panels[name] = View(self)
+        return view
+
+    def find_output_panel(self, name):
+        return self._panels.get(name)
+
+    def destroy_output_panel(self, name):
+        self._panels.pop(name, None)
+
+    def run_command(self, cmd, args=None):
+        self.commands.append((cmd, args))
+
+    def status_message(self, msg):
+        DIALOGS.append(('status', msg))
+
+    def show_quick_panel(self, items, on_select, flags=0, selected_index=-1,
+                         on_highlight=None):
+        self.quick_panels.append((items, on_select))
+
+    def show_input_panel(self, caption, initial_text, on_done, on_change,
+                         on_cancel):
+        return View(self)
+
+
+_WINDOWS = []
+
+
+def windows():
+    return list(_WINDOWS)
+
+
+def active_window():
+    if not _WINDOWS:
+        _WINDOWS.append(Window())
+    return _WINDOWS[-1]
+
+
+def new_window(folders=()):
+    """Not part of Sublime's API: create a window and make it active."""
+    window = Window(folders)
+    _WINDOWS.append(window)
+    return window
+
+
+def close_window(window):
+    """Not part of Sublime's API: forget about a window."""
+    if window in _WINDOWS:
+        _WINDOWS.remove(window)
+
+
+def reset():
+    """Not part of Sublime's API: forget all windows, settings changes,
+    queued callbacks, and dialogs."""
+    del _WINDOWS[:]
+    del _TIMEOUTS[:]
+    del DIALOGS[:]
+    _SETTINGS.clear()
@@ -0,0 +1,48 @@
+"""A stand-in for Sublime's `sublime_plugin` module (see `sublime.py` in
+this directory)."""
+
+
+class EventListener:
+    pass
+
+
+class ViewEventListener:
+
+    def __init__(self, view):
+        self.view = view
+
+    @classmethod
+    def is_applicable(cls, settings):
+        return True
+
+    @classmethod
+    def applies_to_primary_view_only(cls):
+        return True
+
+
+class Command:
+
+    def is_enabled(self, *args, **kwargs):
+        return True
+
+    def is_visible(self, *args, **kwargs):
+        return True
+
+    def description(self, *args, **kwargs):
+        return None
+
+
+class ApplicationCommand(Command):
+    pass
+
+
+class WindowCommand(Command):
+
+    def __init__(self, window):
+        self.window = window
+
+
+class TextCommand(Command):
+
+    def __init__(self, view):
+        self.view = view
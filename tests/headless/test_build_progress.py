@@ -0,0 +1,54 @@
+"""Tests for the time remaining estimate of builds."""
+
+import pytest
+from rust import build_progress, build_timing
+
+
+@pytest.fixture(autouse=True)
+def _timings(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_timing, '_TIMINGS', None)
+    path = str(tmp_path / 'build_timings.json')
+    monkeypatch.setattr(build_timing, '_timings_path', lambda: path)
+
+
+def _artifact(name, fresh=False):
+    return {'reason': 'compiler-artifact',
+            'package_id': '%s 0.1.0 (x)' % (name,),
+            'target': {'name': name, 'kind': ['lib']}, 'fresh': fresh}
+
+
+def _timing_info(name, duration):
+    return {'reason': 'timing-info', 'package_id': '%s 0.1.0 (x)' % (name,),
+            'target': {'name': name}, 'duration': duration}
+
+
+def _build(units, started=0.0):
+    """Record a build of `(name, finish, duration)` units, or
+    `(name, None, None)` for fresh units."""
+    t = build_timing.BuildTimings('cargo build', started=started)
+    for name, finish, duration in units:
+        if finish is None:
+            t.on_json(_artifact(name, fresh=True), started)
+            continue
+        t.on_json(_artifact(name), started + finish)
+        t.on_json(_timing_info(name, duration))
+    t.finish(started + max(u[1] or 0 for u in units))
+    build_timing.record('/ws', t)
+
+
+def test_parallel_eta():
+    # Four packages of 10s each, compiled two at a time.
+    _build([('a', 10, 10), ('b', 10, 10), ('c', 20, 10), ('d', 20, 10)])
+    assert build_timing.parallelism('/ws') == 2.0
+    p = build_progress.BuildProgress.for_workspace('/ws')
+    p.started = p._last_finished = 0.0
+    assert p.eta(now=0.0) == 20.0
+    p.on_json(_artifact('a'), now=10.0)
+    p.on_json(_artifact('b'), now=10.0)
+    assert p.eta(now=10.0) == 10.0
+
+
+def test_removed_packages_dropped():
+    _build([('a', 1, 1), ('b', 2, 1)])
+    _build([('a', None, None)], started=10.0)
+    assert build_timing.history('/ws') == (1, {'a 0.1.0 (x)': 1})
@@ -0,0 +1,73 @@
+"""Tests for resolving Cargo build settings."""
+
+import os
+
+from rust import cargo_settings
+
+from conftest import TESTS_DIR
+
+
+def test_settings(window, settings):
+    cmd_info = cargo_settings.CARGO_COMMANDS['build']
+    manifest_dir = os.path.join(TESTS_DIR, 'multi-targets')
+    cs = cargo_settings.CargoSettings(window)
+    cs.load()
+
+    def check_cmd(expected_cmd):
+        cmd = cs.get_command('build', cmd_info, manifest_dir,
+                             manifest_dir)['command']
+        assert cmd == expected_cmd.split()
+
+    cmd = 'cargo build --message-format=json'
+    check_cmd(cmd)
+
+    cb = {'defaults': {'extra_cargo_args': 'global_args'}}
+    settings.set('cargo_build', cb)
+    check_cmd(cmd + ' global_args')
+
+    cs.set_project_default('extra_cargo_args', 'project_defaults')
+    check_cmd(cmd + ' project_defaults')
+
+    cb['variants'] = {'build': {'extra_cargo_args': 'global_var_args'}}
+    settings.set('cargo_build', cb)
+    check_cmd(cmd + ' global_var_args')
+
+    cs.set_project_variant('build', 'extra_cargo_args', 'project_var_args')
+    check_cmd(cmd + ' project_var_args')
+
+    cs.set_project_package_default(manifest_dir, 'extra_cargo_args',
+                                   'proj_pack_def_arg')
+    check_cmd(cmd + ' proj_pack_def_arg')
+
+    cs.set_project_package_variant(manifest_dir, 'build', 'extra_cargo_args',
+                                   'proj_pack_var_arg')
+    check_cmd(cmd + ' proj_pack_var_arg')
+
+    cs.set_project_package_target(manifest_dir, '--example ex1',
+                                  'extra_cargo_args', 'proj_pack_target_args')
+    # Does not change.
+    check_cmd(cmd + ' proj_pack_var_arg')
+
+    # Change the default target.
+    cs.set_project_package_variant(manifest_dir, 'build', 'target',
+                                   '--example ex1')
+    check_cmd('cargo build --example ex1 --message-format=json '
+              'proj_pack_target_args')
+
+    # Changes are saved in the project.
+    data = window.project_data()['settings']['cargo_build']
+    assert data['defaults'] == {'extra_cargo_args': 'project_defaults'}
+
+
+def test_toolchain_and_env(window):
+    cmd_info = cargo_settings.CARGO_COMMANDS['check']
+    manifest_dir = os.path.join(TESTS_DIR, 'multi-targets')
+    cs = cargo_settings.CargoSettings(window)
+    cs.load()
+    cs.set_project_package_variant(manifest_dir, 'check', 'toolchain',
+                                   'nightly')
+    cs.set_project_package_default(manifest_dir, 'env',
+                                   {'RUST_LOG': 'debug'})
+    result = cs.get_command('check', cmd_info, manifest_dir, manifest_dir)
+    assert result['command'][:3] == ['cargo', '+nightly', 'check']
+    assert result['env'] == {'RUST_LOG': 'debug'}
@@ -0,0 +1,109 @@
+"""Tests for the separate target directories of checks."""
+
+import os
+
+import pytest
+from rust import check_target
+
+
+@pytest.fixture(autouse=True)
+def _index(tmp_path, monkeypatch, settings):
+    monkeypatch.setattr(check_target, '_INDEX', None)
+    monkeypatch.setattr(check_target, '_IN_USE', {})
+    path = str(tmp_path / 'check_target.json')
+    monkeypatch.setattr(check_target, '_index_path', lambda: path)
+    settings.set('rust_check_target_root', str(tmp_path / 'targets'))
+
+
+def _fill(path, size):
+    os.makedirs(os.path.join(path, 'debug'), exist_ok=True)
+    with open(os.path.join(path, 'debug', 'data'), 'wb') as f:
+        f.write(b'x' * size)
+
+
+def _use(window, workspace, size, when):
+    path = check_target.target_dir(workspace)
+    check_target.acquire(path, workspace)
+    _fill(path, size)
+    check_target.measure(window, path)
+    check_target._load()[path]['last_used'] = when
+    check_target._IN_USE.clear()
+    return path
+
+
+def test_target_dir(tmp_path):
+    root = str(tmp_path / 'targets')
+    path = check_target.target_dir('/src/ws')
+    assert os.path.dirname(path) == root
+    assert os.path.basename(path).startswith('ws-')
+    assert check_target.target_dir('/src/ws') == path
+    assert check_target.target_dir('/other/ws') != path
+    assert check_target.target_dir('/src/ws', 'shadow') == path + '-shadow'
+
+
+def test_prune(window, monkeypatch):
+    a = _use(window, '/ws/a', 300, when=1)
+    b = _use(window, '/ws/b', 200, when=3)
+    c = _use(window, '/ws/c', 100, when=2)
+    assert check_target.total_size() == 600
+    assert check_target.prune(window, max_size=0) == []
+    assert check_target.prune(window, max_size=600) == []
+
+    # The least recently used go first, unless in use.
+    check_target.acquire(a, '/ws/a')
+    assert check_target.prune(window, max_size=350) == [c, b]
+    assert os.path.isdir(a)
+    assert not os.path.exists(b) and not os.path.exists(c)
+    assert check_target.total_size() == 300
+
+    # Persisted, and directories removed by other means are forgotten.
+    check_target._IN_USE.clear()
+    monkeypatch.setattr(check_target, '_INDEX', None)
+    assert check_target.total_size() == 300
+    _fill(b, 10)
+    check_target.prune(window, max_size=1000)
+    assert list(check_target._load()) == [a]
+
+
+def test_prune_rename_failure(window, monkeypatch):
+    a = _use(window, '/ws/a', 300, when=1)
+    b = _use(window, '/ws/b', 200, when=2)
+    # Left over from an interrupted removal.
+    _fill(a + '.removing', 10)
+    assert check_target.prune(window, max_size=250) == [a]
+    assert not os.path.exists(a) and not os.path.exists(a + '.removing')
+
+    # A directory that cannot be moved stays in the index.
+    def rename(src, dst):
+        raise OSError('busy')
+
+    monkeypatch.setattr(check_target.os, 'rename', rename)
+    assert check_target.prune(window, max_size=100) == []
+    assert os.path.isdir(b)
+    assert check_target.total_size() == 200
+
+
+def test_release_measures(window, monkeypatch, settings):
+    settings.set('rust_check_target_max_size', 0)
+    path = check_target.target_dir('/ws/a')
+    started = []
+
+    class Thread:
+        def __init__(self, target, name):
+            self.target = target
+
+        def start(self):
+            started.append(self.target)
+
+    monkeypatch.setattr(check_target.threading, 'Thread', Thread)
+    check_target.acquire(path, '/ws/a')
+    _fill(path, 50)
+    check_target.release(window, path)
+    assert not check_target._IN_USE
+    started.pop()()
+    assert check_target.total_size() == 50
+    assert not check_target._BUSY
+    # Not measured again right away.
+    check_target.acquire(path, '/ws/a')
+    check_target.release(window, path)
+    assert not started
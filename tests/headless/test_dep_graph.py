@@ -0,0 +1,126 @@
+"""Tests for the dependency graph of workspace packages."""
+
+import os
+
+import pytest
+from rust import dep_graph, rust_proc
+
+from conftest import needs_cargo, write_file
+
+# name -> (dependencies, dev-dependencies)
+PACKAGES = {
+    'a': ([], []),
+    'b': (['a'], []),
+    'c': ([], ['b']),
+    'd': ([], []),
+}
+
+
+@pytest.fixture(autouse=True)
+def _graph_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(dep_graph, '_GRAPHS', None)
+    monkeypatch.setattr(dep_graph, '_FAILED', {})
+    path = str(tmp_path / 'dep_graph.json')
+    monkeypatch.setattr(dep_graph, '_graph_path', lambda: path)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = str(tmp_path / 'ws')
+    write_file(os.path.join(root, 'Cargo.toml'),
+           '[workspace]\nmembers = [%s]\n' % (
+               ', '.join('"%s"' % (name,) for name in sorted(PACKAGES)),))
+    for name, (deps, dev_deps) in PACKAGES.items():
+        manifest = '[package]\nname = "%s"\nversion = "0.1.0"\n' % (name,)
+        manifest += '[dependencies]\n'
+        manifest += ''.join('%s = { path = "../%s" }\n' % (d, d)
+                            for d in deps)
+        manifest += '[dev-dependencies]\n'
+        manifest += ''.join('%s = { path = "../%s" }\n' % (d, d)
+                            for d in dev_deps)
+        write_file(os.path.join(root, name, 'Cargo.toml'), manifest)
+        write_file(os.path.join(root, name, 'src', 'lib.rs'), '')
+    return root
+
+
+def _ids(graph, *names):
+    by_name = {os.path.basename(d): pid for pid, d in graph.packages.items()}
+    return {by_name[name] for name in names}
+
+
+def test_reverse_dependents():
+    graph = dep_graph.DependencyGraph(
+        {'a': '/ws/a', 'b': '/ws/b', 'c': '/ws/c', 'top': '/ws'},
+        {'a': set(), 'b': {'a'}, 'c': {'b'}, 'top': {'a'}})
+    assert graph.reverse_dependents('a') == {'b', 'c', 'top'}
+    assert graph.reverse_dependents('b') == {'c'}
+    assert graph.reverse_dependents('c') == set()
+    # Nested packages use the closest directory.
+    assert graph.package_for_path('/ws/b/src/lib.rs') == 'b'
+    assert graph.package_for_path('/ws/src/main.rs') == 'top'
+    assert graph.package_for_path('/ws/bb/src/lib.rs') == 'top'
+    assert graph.package_for_path('/elsewhere.rs') is None
+
+
+@needs_cargo
+def test_graph_cache(window, workspace, monkeypatch):
+    graph = dep_graph.get_graph(window, os.path.join(workspace, 'a'))
+    assert set(graph.packages.values()) == {
+        os.path.join(workspace, name) for name in PACKAGES}
+    a, = _ids(graph, 'a')
+    assert graph.reverse_dependents(a) == _ids(graph, 'b', 'c')
+
+    # Loaded from the cache without running Cargo (also after a restart).
+    def fail(*args, **kwargs):
+        raise AssertionError('cargo should not run')
+    monkeypatch.setattr(rust_proc, 'slurp_json', fail)
+    monkeypatch.setattr(dep_graph, '_GRAPHS', None)
+    cached = dep_graph.get_graph(window, os.path.join(workspace, 'c'))
+    assert cached.deps == graph.deps
+    monkeypatch.undo()
+
+    # Changing a manifest reloads the graph.
+    manifest = os.path.join(workspace, 'd', 'Cargo.toml')
+    with open(manifest, 'a') as f:
+        f.write('b = { path = "../b" }\n')
+    st = os.stat(manifest)
+    os.utime(manifest, (st.st_atime, st.st_mtime + 10))
+    graph = dep_graph.get_graph(window, workspace)
+    a, = _ids(graph, 'a')
+    assert graph.reverse_dependents(a) == _ids(graph, 'b', 'c', 'd')
+
+
+@needs_cargo
+def test_open_dependents(window, workspace):
+    graph = dep_graph.get_graph(window, workspace)
+    saved = os.path.join(workspace, 'a', 'src', 'lib.rs')
+    window.open_file(saved)
+    assert dep_graph.open_dependents(window, graph, saved) == []
+    for name in ('c', 'd'):
+        window.open_file(os.path.join(workspace, name, 'src', 'lib.rs'))
+    assert dep_graph.open_dependents(window, graph, saved) == [
+        (os.path.join(workspace, 'c'),
+         os.path.join(workspace, 'c', 'src', 'lib.rs'))]
+
+
+def test_offline_failure(window, workspace, monkeypatch):
+    calls = []
+
+    def slurp_json(window, cmd, cwd):
+        calls.append(cmd)
+        return []
+
+    monkeypatch.setattr(rust_proc, 'slurp_json', slurp_json)
+    assert dep_graph.get_graph(window, workspace) is None
+    assert calls == [['cargo', 'metadata', '--format-version', '1',
+                      '--offline']]
+    # Not tried again until the workspace changes.
+    assert dep_graph.get_graph(window, workspace) is None
+    assert len(calls) == 1
+    write_file(os.path.join(workspace, 'Cargo.lock'), '')
+    assert dep_graph.get_graph(window, workspace) is None
+    assert len(calls) == 2
+    # Cargo without --offline.
+    assert dep_graph.get_graph(window, workspace,
+                               rustc_version='1.35.0') is None
+    assert len(calls) == 2
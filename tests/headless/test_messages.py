@@ -0,0 +1,188 @@
+"""Tests for storing and displaying messages with the headless API."""
+
+import os
+import threading
+
+import sublime
+from rust import messages, levels, rendered
+
+from rustc_json import diagnostic, span
+
+SOURCE = '''\
+fn main() {
+    let x: u32 = 1i64;
+    let unused = 1;
+}
+'''
+
+
+def _write_source(tmp_path):
+    path = os.path.join(str(tmp_path), 'main.rs')
+    with open(path, 'w') as f:
+        f.write(SOURCE)
+    return path
+
+
+def _add(window, tmp_path, diag):
+    messages.add_rust_messages(window, str(tmp_path), diag, None, None)
+
+
+def _mismatch():
+    return diagnostic('mismatched types', [
+        span('main.rs', 2, 18, 22, 'expected `u32`, found `i64`'),
+        span('main.rs', 2, 12, 15, 'expected due to this', primary=False),
+    ], code='E0308')
+
+
+def _unused():
+    return diagnostic('unused variable: `unused`',
+                      [span('main.rs', 3, 9, 15)], level='warning')
+
+
+def test_regions_and_phantoms(window, tmp_path):
+    path = _write_source(tmp_path)
+    _add(window, tmp_path, _mismatch())
+    messages.messages_finished(window)
+    view = window.open_file(path)
+    messages.show_messages_for_view(view)
+
+    regions = {}
+    for key, (rs, scope, icon, flags) in view.regions.items():
+        for r in rs:
+            regions[view.substr(r)] = scope
+    # Labels of secondary spans have the level of the message.
+    assert regions == {'1i64': 'invalid', 'u32': 'invalid'}
+
+    (phantom_region, content), = [p for ps in view.phantoms.values()
+                                  for p in ps]
+    assert view.rowcol(phantom_region.begin()) == (1, 17)
+    assert 'mismatched types' in content
+    assert 'expected `u32`, found `i64`' in content
+
+
+def test_phantom_style_none(window, tmp_path, settings):
+    settings.set('rust_phantom_style', 'none')
+    path = _write_source(tmp_path)
+    _add(window, tmp_path, _mismatch())
+    view = window.open_file(path)
+    messages.show_messages_for_view(view)
+    assert view.phantoms == {}
+    assert view.regions
+
+
+def test_popup(window, tmp_path):
+    path = _write_source(tmp_path)
+    _add(window, tmp_path, _mismatch())
+    view = window.open_file(path)
+    point = view.text_point(1, 19)
+    messages.message_popup(view, point, sublime.HOVER_TEXT)
+    assert 'mismatched types' in view.popup
+
+    view.hide_popup()
+    messages.message_popup(view, view.text_point(0, 0), sublime.HOVER_TEXT)
+    assert not view.is_popup_visible()
+
+    # The gutter shows everything on the line.
+    messages.message_popup(view, view.text_point(1, 0), sublime.HOVER_GUTTER)
+    assert 'mismatched types' in view.popup
+
+
+def test_sort_errors_first(window, tmp_path):
+    path = _write_source(tmp_path)
+    _add(window, tmp_path, _unused())
+    _add(window, tmp_path, _mismatch())
+    messages.messages_finished(window)
+    batches = messages.WINDOW_MESSAGES[window.id()]['paths'][path]
+    assert [b.first().level for b in batches] == [levels.ERROR,
+                                                  levels.WARNING]
+    assert messages.message_counts(window) == {levels.ERROR: 1,
+                                               levels.WARNING: 1}
+
+
+def test_clear_messages(window, tmp_path):
+    path = _write_source(tmp_path)
+    view = window.open_file(path)
+    _add(window, tmp_path, _mismatch())
+    messages.show_messages_for_view(view)
+    assert view.regions
+    messages.clear_messages(window)
+    assert view.regions == {}
+    assert view.phantoms == {}
+    assert not messages.has_message_for_path(window, path)
+
+
+def test_clear_messages_keep_pending(window, tmp_path):
+    path = _write_source(tmp_path)
+    partition = (str(tmp_path), '--lib', 'test')
+    messages.add_rust_messages(window, str(tmp_path), _mismatch(), None,
+                               None, partition)
+    _add(window, tmp_path, _unused())
+    # A build starts while the check of the partition is still running.
+    messages.begin_partition(window, partition)
+    messages.clear_messages(window, keep_pending=True)
+    assert messages.message_counts(window) == {levels.ERROR: 1}
+    # The check reports nothing, so its old message goes away.
+    messages.end_partition(window, partition)
+    assert not messages.has_message_for_path(window, path)
+
+
+def test_concurrent_store(window, tmp_path):
+    _write_source(tmp_path)
+
+    def add(n):
+        for i in range(50):
+            _add(window, tmp_path, diagnostic(
+                'warning %i-%i' % (n, i), [span('main.rs', 3, 9, 15)],
+                level='warning'))
+
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batches = [batch for batches
+               in messages.WINDOW_MESSAGES[window.id()]['paths'].values()
+               for batch in batches]
+    keys = set(msg.region_key for batch in batches for msg in batch)
+    assert len(keys) == len(batches) == 200
+    assert messages.message_counts(window) == {levels.WARNING: 200}
+
+
+def test_rendered_spool(window, tmp_path):
+    path = _write_source(tmp_path)
+    diag = _mismatch()
+    diag['rendered'] = ('error[E0308]: mismatched types\n'
+                        ' --> main.rs:2:18\n'
+                        '  |\n'
+                        '2 |     let x: u32 = 1i64;\n')
+    _add(window, tmp_path, diag)
+    batch = messages.WINDOW_MESSAGES[window.id()]['paths'][path][0]
+    # The text is only kept in the spool.
+    assert batch.rendered is None
+    assert rendered.text_for_batch(window, batch) == diag['rendered']
+    assert len(rendered.spool(window)) == 1
+
+    view = window.open_file(path)
+    messages.show_messages_for_view(view)
+
+    def phantom():
+        return view.phantoms[batch.first().region_key][0][1]
+
+    assert 'href="rendered:%s">more<' % (batch.first().region_key,) in \
+        phantom()
+    assert ' --&gt;&nbsp;main.rs' not in phantom()
+
+    assert messages.toggle_rendered(view, view.text_point(1, 19))
+    assert batch.expanded
+    assert '&nbsp;--&gt;&nbsp;main.rs:2:18' in phantom()
+    assert '>less<' in phantom()
+
+    # The link in the phantom switches back.
+    messages._click_handler(view, 'rendered:' + batch.first().region_key)
+    assert not batch.expanded
+    assert 'main.rs:2:18' not in phantom()
+
+    assert not messages.toggle_rendered(view, view.text_point(0, 0))
+
+    messages.clear_messages(window, partitions=[None])
+    assert len(rendered.spool(window)) == 0
@@ -0,0 +1,107 @@
+"""Tests for the build output panel, driven by recorded Cargo output."""
+
+import json
+import os
+
+import sublime
+from rust import messages, opanel, levels, rendered
+
+import cargo_replay
+from rustc_json import compiler_message, diagnostic, span
+
+SOURCE = 'fn main() {\n    let x: u32 = 1i64;\n}\n'
+
+
+def _crate(tmp_path):
+    root = str(tmp_path)
+    os.mkdir(os.path.join(root, 'src'))
+    with open(os.path.join(root, 'src', 'main.rs'), 'w') as f:
+        f.write(SOURCE)
+    return root
+
+
+def _run(window, root, lines, command='check', **kwargs):
+    listener = opanel.OutputListener(window, root, command, '1.90.0')
+    cargo_replay.replay(window, root, lines, listener, **kwargs)
+    return listener
+
+
+def test_build_messages(window, tmp_path):
+    root = _crate(tmp_path)
+    main = os.path.join(root, 'src', 'main.rs')
+    diag = diagnostic('mismatched types',
+                      [span('src/main.rs', 2, 18, 22, 'expected `u32`')])
+    lines = [
+        json.dumps({'reason': 'compiler-artifact', 'package_id': 'dep 0.1.0',
+                    'target': {'kind': ['lib'], 'name': 'dep'},
+                    'fresh': True}),
+        json.dumps(compiler_message(diag, src_path=main)),
+        json.dumps({'reason': 'build-finished', 'success': False}),
+    ]
+    listener = _run(window, root, lines, returncode=101)
+
+    panel = window.find_output_panel(opanel.PANEL_NAME)
+    text = panel.substr(sublime.Region(0, panel.size()))
+    assert text.startswith('[Running: cargo check --message-format=json]\n')
+    assert 'error: src/main.rs:2: mismatched types\n' in text
+    assert 'with exit code 101]' in text
+    assert 'Internal Error' not in text
+    assert ('show_panel', {'panel': 'output.exec'}) in window.commands
+
+    # The panel region is recorded for Next/Prev message.
+    batch, = messages.WINDOW_MESSAGES[window.id()]['paths'][main]
+    region = batch.first().output_panel_region
+    assert panel.substr(region) == 'src/main.rs:2'
+    assert listener.timings.packages() == {'dep 0.1.0'}
+
+
+def test_text_output(window, tmp_path):
+    root = _crate(tmp_path)
+    lines = ['   Compiling foo v0.1.0', 'warning: something']
+    _run(window, root, lines, decode_json=False, cmd=['cargo', 'build'])
+    panel = window.find_output_panel(opanel.PANEL_NAME)
+    text = panel.substr(sublime.Region(0, panel.size()))
+    assert '   Compiling foo v0.1.0\nwarning: something\n' in text
+    assert text.endswith('s]\n')
+
+
+def test_panic_location(window, tmp_path):
+    root = _crate(tmp_path)
+    main = os.path.join(root, 'src', 'main.rs')
+    lines = [
+        'running 1 test',
+        'test tests::it_works ... FAILED',
+        "thread 'tests::it_works' panicked at 'boom', src/main.rs:2:5",
+        'test result: FAILED. 0 passed; 1 failed',
+    ]
+    listener = _run(window, root, lines, command='test', decode_json=False,
+                    cmd=['cargo', 'test'], returncode=101)
+    batch, = messages.WINDOW_MESSAGES[window.id()]['paths'][main]
+    msg = batch.first()
+    assert msg.level == levels.ERROR
+    assert msg.span == ((1, 4), (1, 4))
+    assert [(r.name, r.outcome) for r in listener.test_run.results] == \
+        [('tests::it_works', 'failed')]
+
+
+def test_panel_rendered(window, tmp_path):
+    root = _crate(tmp_path)
+    main = os.path.join(root, 'src', 'main.rs')
+    diag = diagnostic('mismatched types',
+                      [span('src/main.rs', 2, 18, 22, 'expected `u32`')])
+    diag['rendered'] = 'error[E0308]: mismatched types\n --> src/main.rs:2:18\n'
+    _run(window, root, [json.dumps(compiler_message(diag, src_path=main))])
+    panel = window.find_output_panel(opanel.PANEL_NAME)
+    line = panel.find_all('^error: src/main.rs:2')[0]
+
+    assert not messages.toggle_rendered(panel, 0)
+    assert messages.toggle_rendered(panel, line.begin())
+    (region, content), = [p for ps in panel.phantoms.values() for p in ps]
+    assert region == sublime.Region(panel.line(line).end())
+    assert '&nbsp;--&gt;&nbsp;src/main.rs:2:18' in content
+    assert messages.toggle_rendered(panel, line.begin())
+    assert panel.phantoms == {}
+
+    # Starting a new build discards the rendered text.
+    messages.clear_messages(window)
+    assert rendered.SPOOLS.get(window.id()) is None
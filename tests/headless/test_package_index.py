@@ -0,0 +1,77 @@
+"""Tests for the index of workspace packages."""
+
+import os
+
+import pytest
+from rust import package_index, util
+
+from conftest import write_file
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = str(tmp_path / 'project')
+    write_file(os.path.join(root, 'good', 'Cargo.toml'),
+               '[package]\nname = "good"\n')
+    write_file(os.path.join(root, 'broken', 'Cargo.toml'), '[package\n')
+    write_file(os.path.join(root, 'good', 'target', 'Cargo.toml'), '')
+    return root
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Records the directories `cargo metadata` is run in."""
+    calls = []
+
+    def get_cargo_metadata(window, cwd):
+        calls.append(os.path.basename(cwd))
+        if os.path.basename(cwd) == 'broken':
+            return None
+        manifest = os.path.join(cwd, 'Cargo.toml')
+        return {'workspace_root': cwd,
+                'packages': [{'name': os.path.basename(cwd),
+                              'manifest_path': manifest}]}
+
+    monkeypatch.setattr(util, 'get_cargo_metadata', get_cargo_metadata)
+    return calls
+
+
+def test_failures_cached(window, folder, probes, tmp_path):
+    path = str(tmp_path / 'index.json')
+    index = package_index.PackageIndex(path)
+    packages = index.packages(window, [folder])
+    assert sorted(packages) == [os.path.join(folder, 'good')]
+    assert sorted(probes) == ['broken', 'good']
+    index.packages(window, [folder])
+    assert len(probes) == 2
+
+    # Loaded from disk.
+    index = package_index.PackageIndex(path)
+    assert index.packages(window, [folder]) == packages
+    assert len(probes) == 2
+
+    # Changing the manifest tries again.
+    manifest = os.path.join(folder, 'broken', 'Cargo.toml')
+    st = os.stat(manifest)
+    os.utime(manifest, (st.st_atime, st.st_mtime + 10))
+    index.packages(window, [folder])
+    assert probes[2:] == ['broken']
+
+
+def test_unchanged_dirs_not_listed(window, folder, monkeypatch):
+    cache = {}
+    manifests = package_index.find_manifests(window, [folder], cache)
+    assert manifests == {os.path.join(folder, 'good', 'Cargo.toml'),
+                         os.path.join(folder, 'broken', 'Cargo.toml')}
+    listed = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir',
+                        lambda path: listed.append(path) or listdir(path))
+    assert package_index.find_manifests(window, [folder], cache) == manifests
+    assert listed == []
+
+    new = os.path.join(folder, 'new', 'Cargo.toml')
+    write_file(new, '')
+    assert package_index.find_manifests(window, [folder], cache) == \
+        manifests | {new}
+    assert sorted(listed) == [folder, os.path.dirname(new)]
@@ -0,0 +1,175 @@
+"""Tests for the mirror used to check unsaved buffers."""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+import sublime
+from rust import shadow
+
+from conftest import needs_cargo, write_file
+
+LIB = 'pub fn f() -> u32 {\n    1\n}\n'
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def crate(tmp_path):
+    root = str(tmp_path / 'crate')
+    write_file(os.path.join(root, 'Cargo.toml'),
+           '[package]\nname = "crate"\nversion = "0.1.0"\n')
+    write_file(os.path.join(root, 'Cargo.lock'), '# lock\n')
+    write_file(os.path.join(root, 'src', 'lib.rs'), LIB)
+    write_file(os.path.join(root, 'src', 'util', 'mod.rs'), '')
+    write_file(os.path.join(root, 'target', 'debug', 'junk'), '')
+    return root
+
+
+@pytest.fixture
+def tree(crate):
+    tree = shadow.ShadowTree(crate)
+    yield tree
+    shutil.rmtree(tree.root, ignore_errors=True)
+    shutil.rmtree(tree.target_dir, ignore_errors=True)
+
+
+def test_paths(tree, crate):
+    lib = os.path.join(crate, 'src', 'lib.rs')
+    assert tree.shadow_path(crate) == tree.root
+    assert tree.shadow_path(lib) == os.path.join(tree.root, 'src', 'lib.rs')
+    assert tree.real_path(tree.shadow_path(lib)) == lib
+    assert tree.real_path(tree.root) == crate
+    assert tree.real_path('/elsewhere/lib.rs') == '/elsewhere/lib.rs'
+    assert not tree.target_dir.startswith(os.path.join(tree.root, ''))
+
+
+def test_sync(tree, crate):
+    lib = os.path.join(crate, 'src', 'lib.rs')
+    shadow_lib = tree.shadow_path(lib)
+    assert tree.sync({}) == 4
+    assert os.path.samefile(lib, shadow_lib)
+    assert os.path.exists(tree.shadow_path(
+        os.path.join(crate, 'src', 'util', 'mod.rs')))
+    assert not os.path.exists(os.path.join(tree.root, 'target'))
+    # Cargo may write to the lock file, so it is never linked.
+    lock = os.path.join(crate, 'Cargo.lock')
+    assert _read(tree.shadow_path(lock)) == '# lock\n'
+    assert not os.path.samefile(lock, tree.shadow_path(lock))
+    # Nothing to do when nothing changed.
+    assert tree.sync({}) == 0
+
+    # A modified buffer replaces its file without touching the original.
+    assert tree.sync({lib: 'pub fn f() {}\n'}) == 1
+    assert _read(shadow_lib) == 'pub fn f() {}\n'
+    assert _read(lib) == LIB
+    # The same text is not written again.
+    assert tree.sync({lib: 'pub fn f() {}\n'}) == 0
+    # Once saved, the file is linked again.
+    write_file(lib, 'pub fn g() {}\n')
+    assert tree.sync({}) == 1
+    assert os.path.samefile(lib, shadow_lib)
+
+    # Buffers outside of the workspace are ignored.
+    assert tree.sync({os.path.join(os.path.dirname(crate), 'x.rs'): ''}) == 0
+
+    # Deleted files and directories are removed.
+    shutil.rmtree(os.path.join(crate, 'src', 'util'))
+    tree.sync({})
+    assert not os.path.exists(os.path.join(tree.root, 'src', 'util'))
+
+
+def test_sync_unchanged_dirs(tree, crate, monkeypatch):
+    tree.sync({})
+    listed = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir',
+                        lambda path: listed.append(path) or listdir(path))
+    assert tree.sync({}) == 0
+    assert listed == []
+    # Files saved in place are seen through their links.
+    lib = os.path.join(crate, 'src', 'lib.rs')
+    write_file(lib, 'pub fn g() {}\n')
+    assert tree.sync({}) == 0
+    assert _read(tree.shadow_path(lib)) == 'pub fn g() {}\n'
+    # Files saved by replacing them change their directory.
+    write_file(lib + '.tmp', 'pub fn h() {}\n')
+    os.replace(lib + '.tmp', lib)
+    assert tree.sync({}) == 1
+    assert os.path.samefile(lib, tree.shadow_path(lib))
+    assert os.path.join(crate, 'src') in listed
+
+
+def test_modified_buffers(window, crate):
+    lib = os.path.join(crate, 'src', 'lib.rs')
+    view = window.open_file(lib)
+    window.open_file(os.path.join(crate, 'Cargo.toml')).run_command(
+        'append', {'characters': '\n'})
+    assert shadow.modified_buffers(window) == {}
+    view.run_command('append', {'characters': '// x\n'})
+    assert shadow.modified_buffers(window) == {lib: LIB + '// x\n'}
+    view.run_command('save')
+    assert shadow.modified_buffers(window) == {}
+
+
+def test_tree_per_window(window, crate, monkeypatch):
+    monkeypatch.setattr(shadow, 'TREES', {})
+    other = sublime.new_window([crate])
+    tree = shadow.tree_for_workspace(window, crate)
+    assert shadow.tree_for_workspace(window, crate) is tree
+    other_tree = shadow.tree_for_workspace(other, crate)
+    assert other_tree is not tree
+    assert other_tree.root != tree.root
+    # Each window writes its own buffers.
+    lib = os.path.join(crate, 'src', 'lib.rs')
+    try:
+        tree.sync({lib: 'pub fn f() {}\n'})
+        other_tree.sync({})
+        assert _read(tree.shadow_path(lib)) == 'pub fn f() {}\n'
+        assert _read(other_tree.shadow_path(lib)) == LIB
+    finally:
+        shutil.rmtree(tree.root, ignore_errors=True)
+        shutil.rmtree(other_tree.root, ignore_errors=True)
+
+
+def test_unshadow(tree, crate):
+    src = os.path.join(tree.root, 'src', 'lib.rs')
+    obj = {
+        'manifest_path': os.path.join(tree.root, 'Cargo.toml'),
+        'target': {'src_path': src, 'kind': ['lib']},
+        'filenames': [os.path.join(tree.target_dir, 'debug', 'libcrate.rlib')],
+        'message': {'spans': [{'file_name': 'src/lib.rs'}]},
+    }
+    tree.unshadow(obj)
+    assert obj['manifest_path'] == os.path.join(crate, 'Cargo.toml')
+    assert obj['target']['src_path'] == os.path.join(crate, 'src', 'lib.rs')
+    assert obj['filenames'] == [
+        os.path.join(tree.target_dir, 'debug', 'libcrate.rlib')]
+    assert obj['message']['spans'][0]['file_name'] == 'src/lib.rs'
+
+
+@needs_cargo
+def test_check_unsaved(window, tree, crate):
+    os.unlink(os.path.join(crate, 'Cargo.lock'))
+    lib = os.path.join(crate, 'src', 'lib.rs')
+    tree.sync({lib: 'pub fn f() -> u32 {\n    "one"\n}\n'})
+    env = dict(os.environ, CARGO_TARGET_DIR=tree.target_dir)
+    output = subprocess.run(
+        ['cargo', 'check', '--message-format=json'], cwd=tree.root,
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    spans = []
+    for line in output.decode('utf-8').splitlines():
+        obj = tree.unshadow(json.loads(line))
+        if obj['reason'] == 'compiler-message':
+            assert obj['target']['src_path'] == lib
+            spans.extend(span['file_name']
+                         for span in obj['message']['spans'])
+    assert spans == ['src/lib.rs', 'src/lib.rs']
+    assert _read(lib) == LIB
+    assert not os.path.exists(os.path.join(crate, 'target', 'debug',
+                                           '.fingerprint'))
@@ -0,0 +1,44 @@
+"""Tests for automatic target detection (needs Cargo)."""
+
+import os
+
+import pytest
+from rust import target_detect
+
+from conftest import TESTS_DIR, needs_cargo
+
+pytestmark = needs_cargo
+
+ROOT = os.path.join(TESTS_DIR, 'multi-targets')
+
+EXPECTED_TARGETS = [
+    # Exact target name matches.
+    ('src/lib.rs', [('src/lib.rs', '--lib')]),
+    ('src/main.rs', [('src/main.rs', '--bin multi-targets')]),
+    ('src/bin/bin1.rs', [('src/bin/bin1.rs', '--bin bin1')]),
+    ('src/altmain.rs', [('src/altmain.rs', '--bin otherbin')]),
+    ('examples/ex1.rs', [('examples/ex1.rs', '--example ex1')]),
+    ('examples/exlib.rs', [('examples/exlib.rs', '--example exlib')]),
+    ('tests/test1.rs', [('tests/test1.rs', '--test test1')]),
+    ('benches/bench1.rs', [('benches/bench1.rs', '--bench bench1')]),
+    # Random module in src/, defaults to --lib.
+    ('src/lmod1.rs', [('src/lib.rs', '--lib')]),
+    ('mystery.rs', []),
+    ('build.rs', []),
+    # Shared module in test.
+    ('tests/common/helpers.rs', [('tests/test1.rs', '--test test1'),
+                                 ('tests/test2.rs', '--test test2'),
+                                 ('tests/test_context.rs',
+                                  '--test test_context')]),
+    ('pmacro/src/lib.rs', [('pmacro/src/lib.rs', '--lib')]),
+    ('libs/cdylib/src/lib.rs', [('libs/cdylib/src/lib.rs', '--lib')]),
+]
+
+
+@pytest.mark.parametrize('path,expected', EXPECTED_TARGETS)
+def test_multi_targets(window, path, expected):
+    view = window.open_file(os.path.join(ROOT, path))
+    expected = sorted((os.path.join(ROOT, src), args.split())
+                      for src, args in expected)
+    detector = target_detect.TargetDetector(window)
+    assert sorted(detector.determine_targets(view.file_name())) == expected
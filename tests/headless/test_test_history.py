@@ -0,0 +1,45 @@
+"""Tests for the history of test durations."""
+
+import pytest
+from rust import libtest, test_history
+
+
+@pytest.fixture(autouse=True)
+def _history(tmp_path, monkeypatch):
+    monkeypatch.setattr(test_history, '_HISTORY', None)
+    path = str(tmp_path / 'test_history.json')
+    monkeypatch.setattr(test_history, '_history_path', lambda: path)
+
+
+def _run(times, source='tests/t.rs'):
+    run = libtest.TestRun()
+    run.on_output('     Running %s (target/debug/deps/t-0123456789abcdef)'
+                  % (source,))
+    for name, t in times:
+        run.on_event({'type': 'test', 'event': 'ok', 'name': name,
+                      'exec_time': t})
+    return run
+
+
+def test_record(monkeypatch):
+    test_history.record('/ws', _run([('a', 0.1), ('b', 1.0)]))
+    test_history.record('/ws', _run([('a', 0.5)]))
+    # Reload from disk.
+    monkeypatch.setattr(test_history, '_HISTORY', None)
+    assert test_history.workspaces() == ['/ws']
+    timings = test_history.timings(['/ws'])
+    assert [(t.name, t.latest, t.previous, t.regressed)
+            for t in timings] == [('a', 0.5, 0.1, True),
+                                  ('b', 1.0, None, False)]
+    assert (timings[0].workspace, timings[0].binary, timings[0].source,
+            timings[0].doc) == ('/ws', 't', 'tests/t.rs', False)
+
+
+def test_old_tests_dropped():
+    test_history.record('/ws', _run([('gone', 0.1)]))
+    for i in range(test_history.MAX_SAMPLES + test_history.MAX_RUNS):
+        test_history.record('/ws', _run([('kept', 0.1 + i)]))
+    timings = test_history.timings(['/ws'])
+    assert [t.name for t in timings] == ['kept']
+    entry, = test_history._load()['/ws']['tests'].values()
+    assert len(entry['times']) == test_history.MAX_SAMPLES
@@ -0,0 +1,61 @@
+"""Tests for the cached inventory of rustup toolchains."""
+
+import pytest
+from rust import rust_proc, toolchains
+
+TOOLCHAIN_LIST = '''\
+stable-x86_64-unknown-linux-gnu (default)
+nightly-2018-01-01-x86_64-unknown-linux-gnu
+nightly-x86_64-unknown-linux-gnu
+'''
+
+
+@pytest.fixture
+def rustup(monkeypatch):
+    """Records the rustup commands that are run."""
+    calls = []
+
+    def check_output(window, cmd, cwd):
+        calls.append(' '.join(cmd))
+        if cmd[1] == 'toolchain':
+            return TOOLCHAIN_LIST
+        return ('x86_64-unknown-linux-gnu (default)\n'
+                'wasm32-unknown-unknown (installed)\n')
+
+    monkeypatch.setattr(rust_proc, 'check_output', check_output)
+    monkeypatch.setattr(toolchains, '_TOOLCHAINS', None)
+    monkeypatch.setattr(toolchains, '_TRIPLES', {})
+    return calls
+
+
+def test_toolchain_list(window, rustup):
+    assert toolchains.toolchain_list(window) == [
+        'nightly', 'nightly-2018-01-01',
+        'nightly-2018-01-01-x86_64-unknown-linux-gnu',
+        'nightly-x86_64-unknown-linux-gnu',
+        'stable', 'stable-x86_64-unknown-linux-gnu']
+    assert toolchains.installed_toolchains(window) == [
+        'nightly-2018-01-01-x86_64-unknown-linux-gnu',
+        'nightly-x86_64-unknown-linux-gnu',
+        'stable-x86_64-unknown-linux-gnu']
+    assert rustup == ['rustup toolchain list']
+
+
+def test_prefetch_skips_shorthands(window, rustup, monkeypatch):
+    class Thread:
+        def __init__(self, target, name):
+            self.target = target
+
+        def start(self):
+            self.target()
+
+    monkeypatch.setattr(toolchains.threading, 'Thread', Thread)
+    toolchains.prefetch(window)
+    assert sorted(rustup[1:]) == [
+        'rustup target list --toolchain=%s' % (name,)
+        for name in toolchains.installed_toolchains(window)]
+    assert toolchains.target_triples(
+        window, 'stable-x86_64-unknown-linux-gnu') == [
+        ('x86_64-unknown-linux-gnu', True),
+        ('wasm32-unknown-unknown', False)]
+    assert len(rustup) == 4
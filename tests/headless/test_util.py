@@ -0,0 +1,27 @@
+"""Tests for the JSON cache helpers in `util`."""
+
+import os
+
+from rust import log, util
+
+
+def test_json_cache(tmp_path):
+    path = str(tmp_path / 'sub' / 'cache.json')
+    assert util.load_json_cache(path, 1) is None
+    assert util.save_json_cache(path, {'version': 1, 'x': [1]}, 'test')
+    assert util.load_json_cache(path, 1) == {'version': 1, 'x': [1]}
+    assert util.load_json_cache(path, 2) is None
+    assert not os.path.exists(path + '.tmp')
+    with open(path, 'w') as f:
+        f.write('{"version": 1, ')
+    assert util.load_json_cache(path, 1) is None
+
+
+def test_write_failure_is_logged(tmp_path):
+    blocker = str(tmp_path / 'file')
+    with open(blocker, 'w') as f:
+        f.write('')
+    path = os.path.join(blocker, 'cache.json')
+    assert not util.save_json_cache(path, {'version': 1}, 'test cache')
+    texts = [m.text() for m in log._window_log(None).messages]
+    assert any('Failed to save test cache' in text for text in texts)
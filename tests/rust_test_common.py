@@ -26,6 +26,19 @@ messages = plugin.rust.messages
 themes = plugin.rust.themes
 util = plugin.rust.util
 semver = plugin.rust.semver
+ingest = plugin.rust.ingest
+package_index = plugin.rust.package_index
+levels = plugin.rust.levels
+libtest = plugin.rust.libtest
+test_history = plugin.rust.test_history
+build_timing = plugin.rust.build_timing
+build_progress = plugin.rust.build_progress
+build_history = plugin.rust.build_history
+profile = plugin.rust.profile
+dep_graph = plugin.rust.dep_graph
+shadow = plugin.rust.shadow
+check_target = plugin.rust.check_target
+rendered = plugin.rust.rendered
 
 
 def unescape(s):
@@ -119,8 +132,7 @@ class TestBase(unittest.TestCase):
             make sure you get the next thread that starts.
         """
         for n in range(1000):
-            t = rust_thread.THREADS.get(sublime.active_window().id())
-            if t:
+            for t in rust_thread.window_threads(sublime.active_window()):
                 if previous_thread is None or previous_thread != t:
                     return t
             time.sleep(0.01)
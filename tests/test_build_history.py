@@ -0,0 +1,63 @@
+"""Tests for the build time history."""
+
+import tempfile
+
+from rust_test_common import *
+
+
+class TestBuildHistory(TestBase):
+
+    def test_describe_command(self):
+        self.assertEqual(build_history.describe_command(
+            ['cargo', '+nightly', 'build', '--release', '--features', 'a,b',
+             '--message-format=json', '--', '--arg']), {
+            'command': 'cargo build --release --features a,b '
+                       '--message-format=json',
+            'toolchain': 'nightly',
+            'profile': 'release',
+            'features': ['a', 'b'],
+        })
+        d = build_history.describe_command(
+            ['cargo', 'test', '--profile=bench', '--features=x'])
+        self.assertEqual((d['toolchain'], d['profile'], d['features']),
+                         (None, 'bench', ['x']))
+
+    def test_regressions(self):
+        orig_path = build_history._history_path
+        with tempfile.TemporaryDirectory() as tmp:
+            build_history._history_path = lambda: os.path.join(tmp, 'h.jsonl')
+            try:
+                times = [10.0, 11.0, 9.0, 10.5, 20.0, 5.0]
+                for i, elapsed in enumerate(times):
+                    build_history.record('/ws', ['cargo', 'build'], elapsed,
+                                         0, 3, now=1000 + i)
+                build_history.record('/ws', ['cargo', 'build'], 1.0, 101, 0,
+                                     now=1010)
+                build_history.record('/ws', ['cargo', 'check'], 1.0, 0, 0,
+                                     now=1011)
+                entries = build_history.load()
+                self.assertEqual(len(entries), 8)
+                analysis = build_history.analyze(entries, threshold=25)
+                self.assertEqual([key for key, builds in analysis],
+                                 [('/ws', 'cargo check', None),
+                                  ('/ws', 'cargo build', None)])
+                builds = analysis[1][1]
+                self.assertEqual([(e['elapsed'], med, regressed)
+                                  for e, med, regressed in builds],
+                                 [(10.0, None, False),
+                                  (11.0, None, False),
+                                  (9.0, None, False),
+                                  (10.5, 10.0, False),
+                                  (20.0, 10.25, True),
+                                  (5.0, 10.5, False),
+                                  (1.0, None, False)])
+                report = build_history.render(analysis)
+                self.assertIn('SLOWER', report)
+                self.assertIn('exit code 101', report)
+            finally:
+                build_history._history_path = orig_path
+
+    def test_sparkline(self):
+        self.assertEqual(build_history.sparkline([1, 2, 3]), '▁▅█')
+        self.assertEqual(build_history.sparkline([4, 4]), '▁▁')
+        self.assertEqual(build_history.sparkline([]), '')
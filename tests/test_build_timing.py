@@ -0,0 +1,123 @@
+"""Tests for build timings and progress from Cargo's JSON messages."""
+
+import tempfile
+
+from rust_test_common import *
+
+
+def artifact(package_id, name, kind, fresh=False):
+    return {'reason': 'compiler-artifact', 'package_id': package_id,
+            'target': {'name': name, 'kind': [kind]}, 'fresh': fresh}
+
+
+class TestBuildTiming(TestBase):
+
+    def test_package_name(self):
+        self.assertEqual(build_timing.package_name(
+            'foo 0.1.0 (path+file:///src/foo)'), 'foo')
+        self.assertEqual(build_timing.package_name(
+            'registry+https://github.com/rust-lang/crates.io-index#libc@0.2.1'),
+            'libc')
+        self.assertEqual(build_timing.package_name(
+            'path+file:///src/foo#0.1.0'), 'foo')
+
+    def test_units(self):
+        t = build_timing.BuildTimings('cargo build', started=100.0)
+        events = [
+            (100.1, artifact('dep 1.0.0 (registry+x)', 'dep', 'lib',
+                             fresh=True)),
+            (100.2, {'reason': 'compiler-message', 'message': {}}),
+            (101.0, artifact('foo 0.1.0 (path+x)', 'build-script-build',
+                             'custom-build')),
+            (101.5, {'reason': 'build-script-executed',
+                     'package_id': 'foo 0.1.0 (path+x)'}),
+            (104.5, artifact('foo 0.1.0 (path+x)', 'foo', 'lib')),
+            (104.6, {'reason': 'timing-info',
+                     'package_id': 'foo 0.1.0 (path+x)',
+                     'target': {'name': 'foo'}, 'duration': 2.5}),
+        ]
+        for now, obj in events:
+            t.on_json(obj, now)
+        t.finish(105.0)
+        self.assertEqual(t.elapsed, 5.0)
+        self.assertEqual(
+            [(u.package, u.target, u.fresh, u.build_script, u.exact,
+              round(u.duration, 3)) for u in t.units],
+            [('dep', 'dep', True, False, False, 0.0),
+             ('foo', 'build-script-build', False, False, False, 1.0),
+             ('foo', 'build-script', False, True, False, 0.5),
+             ('foo', 'foo', False, False, True, 2.5)])
+        self.assertEqual([(name, round(secs, 3))
+                          for name, secs, units in t.by_package()],
+                         [('foo', 4.0), ('dep', 0.0)])
+        report = build_timing.render(t)
+        self.assertIn('fresh  dep', report)
+        self.assertIn('build script (run)', report)
+
+    def test_record(self):
+        orig_path = build_timing._timings_path
+        orig_timings = build_timing._TIMINGS
+        with tempfile.TemporaryDirectory() as tmp:
+            build_timing._timings_path = lambda: os.path.join(tmp, 't.json')
+            build_timing._TIMINGS = None
+            try:
+                t = build_timing.BuildTimings('cargo build', started=10.0)
+                t.on_json(artifact('foo 0.1.0 (path+x)', 'foo', 'lib'), 12.0)
+                t.finish(12.5)
+                build_timing.record('/ws', t)
+                # Builds without units are not recorded.
+                build_timing.record('/ws', build_timing.BuildTimings('x'))
+                build_timing._TIMINGS = None
+                loaded = build_timing.last_timings('/ws')
+                self.assertEqual(loaded.command, 'cargo build')
+                self.assertEqual(loaded.elapsed, 2.5)
+                self.assertEqual([(u.target, u.duration)
+                                  for u in loaded.units], [('foo', 2.0)])
+                self.assertIsNone(build_timing.last_timings('/other'))
+                # A build where everything is fresh only updates the package
+                # count.
+                t = build_timing.BuildTimings('cargo build', started=20.0)
+                t.on_json(artifact('foo 0.1.0 (path+x)', 'foo', 'lib',
+                                   fresh=True), 20.1)
+                t.on_json(artifact('bar 0.1.0 (path+x)', 'bar', 'lib',
+                                   fresh=True), 20.1)
+                build_timing.record('/ws', t)
+                self.assertEqual(build_timing.last_timings('/ws').elapsed, 2.5)
+                self.assertEqual(build_timing.history('/ws'),
+                                 (2, {'foo 0.1.0 (path+x)': 2.0}))
+                self.assertEqual(build_timing.history('/other'), (None, {}))
+            finally:
+                build_timing._timings_path = orig_path
+                build_timing._TIMINGS = orig_timings
+
+
+class TestBuildProgress(TestBase):
+
+    def test_progress(self):
+        p = build_progress.BuildProgress(
+            3, {'a 1.0.0 (x)': 10.0, 'b 1.0.0 (x)': 20.0}, started=0.0)
+        self.assertEqual(p.text(now=5.0), '0/3 crates, ETA 25s')
+        self.assertFalse(p.on_json({'reason': 'compiler-message'}, 6.0))
+        self.assertTrue(p.on_json(artifact('a 1.0.0 (x)', 'a', 'lib'), 6.0))
+        # A second unit of the same package does not count.
+        self.assertFalse(p.on_json(artifact('a 1.0.0 (x)', 'a', 'bin'), 6.0))
+        self.assertEqual(p.text(now=6.0), '1/3 crates, ETA 20s')
+        self.assertEqual(p.text(now=100.0), '1/3 crates, ETA 0s')
+        p.on_json(artifact('b 1.0.0 (x)', 'b', 'lib'), 30.0)
+        p.on_json(artifact('c 1.0.0 (x)', 'c', 'lib'), 31.0)
+        p.on_json(artifact('d 1.0.0 (x)', 'd', 'lib'), 32.0)
+        # More packages than expected.
+        self.assertEqual(p.text(now=32.0), '4/4 crates, ETA 0s')
+        # No history.
+        p = build_progress.BuildProgress(None, {})
+        p.on_json(artifact('a 1.0.0 (x)', 'a', 'lib'))
+        self.assertEqual(p.text(), '1 crates')
+        self.assertEqual(build_progress.format_seconds(80.4), '1m20s')
+
+    def test_count_lock_packages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsNone(build_progress.count_lock_packages(tmp))
+            with open(os.path.join(tmp, 'Cargo.lock'), 'w') as f:
+                f.write('version = 3\n\n[[package]]\nname = "a"\n\n'
+                        '[[package]]\nname = "b"\n')
+            self.assertEqual(build_progress.count_lock_packages(tmp), 2)
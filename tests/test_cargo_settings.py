@@ -54,3 +54,30 @@ class TestCargoSettings(TestBase):
         settings.set_project_package_variant(manifest_dir, 'build', 'target',
             '--example ex1')
         check_cmd('cargo build --example ex1 --message-format=json proj_pack_target_args')
+
+    def test_config_worker(self):
+        """Loading the current question runs before prefetching."""
+        window = sublime.active_window()
+        worker = cargo_config.ConfigWorker(window)
+        order = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def first():
+            started.set()
+            release.wait()
+            order.append('first')
+
+        worker.add(worker.PREFETCH, first)
+        worker.start()
+        started.wait()
+        worker.add(worker.PREFETCH, lambda: order.append('prefetch'))
+        worker.add(worker.LOAD, lambda: order.append('load'))
+        release.set()
+        for n in range(100):
+            if len(order) == 3:
+                break
+            time.sleep(0.01)
+        worker.terminate()
+        worker.join()
+        self.assertEqual(order, ['first', 'load', 'prefetch'])
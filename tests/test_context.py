@@ -26,6 +26,26 @@ class TestContext(TestBase):
                 self.assertEqual(name, fn_name,
                     'rowcol=%r' % (view.rowcol(pt),))
 
+    def test_pt_to_test_name_modified(self):
+        """The function index is updated when the view changes."""
+        self._with_open_file('tests/multi-targets/tests/test_context.rs',
+            self._test_pt_to_test_name_modified)
+
+    def _test_pt_to_test_name_modified(self, view):
+        cargo_build = plugin.cargo_build
+        end = view.size()
+        self.assertEqual(cargo_build._pt_to_test_name('test', end, view),
+                         'test6')
+        view.run_command('append', {'characters': '\n#[test]\nfn test_new() {}\n'})
+        try:
+            self.assertEqual(
+                cargo_build._pt_to_test_name('test', view.size(), view),
+                'test_new')
+            self.assertEqual(cargo_build._pt_to_test_name('test', end, view),
+                             'test6')
+        finally:
+            view.run_command('revert')
+
     def test_cargo_test_here(self):
         self._with_open_file('tests/multi-targets/tests/test_context.rs',
             self._test_cargo_test_here)
@@ -56,6 +76,39 @@ class TestContext(TestBase):
         self.assertRegex(output,
             r'\[Running: cargo test --test test_context --message-format=json -- --exact expected_panic1\]')
 
+    def test_cargo_test_multiple_cursors(self):
+        self._with_open_file('tests/multi-targets/tests/test_context.rs',
+            self._test_cargo_test_multiple_cursors)
+
+    def _test_cargo_test_multiple_cursors(self, view):
+        sel = view.sel()
+        sel.clear()
+        sel.add(sublime.Region(view.text_point(4, 0)))
+        sel.add(sublime.Region(view.text_point(12, 0)))
+        # Selection covering test2 and test3.
+        sel.add(sublime.Region(view.text_point(15, 0),
+                               view.text_point(24, 0)))
+        view.run_command('cargo_test_at_cursor')
+        self._get_rust_thread().join()
+        output = self._get_build_output(view.window())
+        self.assertRegex(output,
+            r'\[Running: cargo test --test test_context --message-format=json -- --exact test1 expected_panic1 test2 test3\]')
+
+    def test_cargo_test_in_selection(self):
+        self._with_open_file('tests/multi-targets/tests/test_context.rs',
+            self._test_cargo_test_in_selection)
+
+    def _test_cargo_test_in_selection(self, view):
+        sel = view.sel()
+        sel.clear()
+        sel.add(sublime.Region(view.text_point(15, 0),
+                               view.text_point(24, 0)))
+        view.run_command('cargo_test_in_selection')
+        self._get_rust_thread().join()
+        output = self._get_build_output(view.window())
+        self.assertRegex(output,
+            r'\[Running: cargo test --test test_context --message-format=json -- --exact test2 test3\]')
+
     def test_cargo_test_current_file(self):
         self._with_open_file('tests/multi-targets/tests/test_context.rs',
             self._test_cargo_test_current_file)
@@ -0,0 +1,62 @@
+"""Tests for background message ingestion."""
+
+from rust_test_common import *
+
+
+class TestIngest(TestBase):
+
+    def _collect_json(self):
+        """Run `cargo check` on every target of the error-tests package.
+
+        :returns: `(base_path, messages)` where messages is a list of JSON
+            objects from Cargo.
+        """
+        window = sublime.active_window()
+        path = os.path.join(plugin_path, 'tests', 'error-tests')
+        self._cargo_clean(path)
+        metadata = util.get_cargo_metadata(window, path)
+        result = []
+        for package in metadata['packages']:
+            if package['name'] != 'error-tests':
+                continue
+            td = target_detect.TargetDetector(window)
+            for target in package['targets']:
+                target_args = td._target_to_args(target)
+                if not target_args:
+                    continue
+                cmd = ['cargo', 'check', '--message-format=json'] + target_args[1]
+                result.extend(rust_proc.slurp_json(window, cmd, path))
+        return metadata['workspace_root'], result
+
+    def _snapshot(self, window):
+        """Returns a comparable summary of all messages in the window."""
+        paths = messages.WINDOW_MESSAGES.get(window.id(), {}).get('paths', {})
+        result = []
+        for path, batches in paths.items():
+            for batch in batches:
+                result.extend((m.path, m.span, m.level.name, m.text)
+                              for m in batch)
+        result.sort(key=repr)
+        return result
+
+    def test_ingest(self):
+        """Ingestion on a background thread should produce the same messages
+        as processing them directly."""
+        window = sublime.active_window()
+        base_path, infos = self._collect_json()
+        diagnostics = [x for x in infos if x.get('reason') == 'compiler-message']
+        self.assertTrue(diagnostics)
+
+        messages.clear_messages(window)
+        for info in infos:
+            messages.add_rust_messages(window, base_path, info, None, None)
+        expected = self._snapshot(window)
+        self.assertTrue(expected)
+
+        messages.clear_messages(window)
+        ingester = ingest.MessageIngester(window, base_path, None)
+        for info in infos:
+            ingester.add(info)
+        ingester.finish()
+        self.assertEqual(self._snapshot(window), expected)
+        messages.clear_messages(window)
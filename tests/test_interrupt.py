@@ -132,13 +132,22 @@ class TestInterrupt(TestBase):
         self._wait_for_start()
         build_t = self._get_rust_thread()
         self._wrap_terminate(build_t)
-        # Start a syntax check, it should not be allowed to proceed.
+        # A message from the running build.
+        build_msg = messages.Message()
+        build_msg.path = view.file_name()
+        build_msg.span = ((0, 0), (0, 0))
+        build_msg.text = 'from the build'
+        build_msg.level = levels.WARNING
+        messages.add_message(view.window(), build_msg)
+        # Start a syntax check, it runs alongside the build (Cargo's lock on
+        # the target directory makes it wait for the build script).
         check_t = plugin.SyntaxCheckPlugin.RustSyntaxCheckThread(view)
         self._wrap_terminate(check_t)
-        # This thread will silently exit without running.
         check_t.start()
-        time.sleep(4)
         check_t.join()
+        # The check does not remove the messages of the build.
+        self.assertTrue(messages.has_message_for_path(
+            view.window(), view.file_name(), partitions=[None]))
         build_t.join()
         self.assertEqual(self.terminated, [])
         self.assertEqual(self._files(),
@@ -156,17 +165,15 @@ class TestInterrupt(TestBase):
         self._wrap_terminate(check_t)
         check_t.start()
         self._wait_for_start()
-        # Should silently kill the syntax check thread.
+        # Should not interrupt the syntax check thread.
         self._run_build()
         build_t = self._get_rust_thread(previous_thread=check_t)
         self._wrap_terminate(build_t)
-        time.sleep(4)
         build_t.join()
         check_t.join()
-        self.assertEqual(self.terminated, [check_t])
+        self.assertEqual(self.terminated, [])
         self.assertEqual(self._files(),
             [pattern + '-start-1',
-             pattern + '-start-2',
              pattern + '-end-1'])
 
     def test_build_with_save(self):
@@ -180,15 +187,14 @@ class TestInterrupt(TestBase):
         view.run_command('save')
         on_save_thread = self._get_rust_thread()
         self._wrap_terminate(on_save_thread)
-        # Doing this immediately afterwards should cancel the syntax check
-        # before it gets a chance to do much.
+        # The build runs alongside the syntax check.
         self._run_build()
         build_t = self._get_rust_thread(previous_thread=on_save_thread)
         self._wrap_terminate(build_t)
         # Wait for threads to finish.
         on_save_thread.join()
         build_t.join()
-        self.assertEqual(self.terminated, [on_save_thread])
+        self.assertEqual(self.terminated, [])
         self.assertEqual(self._files(),
             [pattern + '-start-1',
              pattern + '-end-1'])
@@ -196,6 +202,30 @@ class TestInterrupt(TestBase):
         # confirmation box.
         view.run_command('revert')
 
+    def test_max_concurrent_jobs(self):
+        """Test that jobs beyond `rust_max_concurrent_jobs` are queued."""
+        self._with_open_file('tests/slow-build/src/lib.rs',
+            self._test_max_concurrent_jobs)
+
+    def _test_max_concurrent_jobs(self, view):
+        self._cargo_clean(view)
+        with AlteredSetting('rust_max_concurrent_jobs', 1):
+            self._run_build()
+            self._wait_for_start()
+            build_t = self._get_rust_thread()
+            check_t = plugin.SyntaxCheckPlugin.RustSyntaxCheckThread(view)
+            check_t.start()
+            time.sleep(0.5)
+            # The check waits for the build to finish.
+            self.assertTrue(check_t.is_alive())
+            self.assertFalse(check_t.running)
+            self.assertTrue(build_t.running)
+            build_t.join()
+            check_t.join()
+        self.assertEqual(self._files(),
+            [pattern + '-start-1',
+             pattern + '-end-1'])
+
     def test_concurrent_build(self):
         """Test starting builds at the same time."""
         self._with_open_file('tests/slow-build/src/lib.rs',
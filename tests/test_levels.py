@@ -0,0 +1,84 @@
+"""Tests for message levels."""
+
+from rust_test_common import *
+
+
+class NamedLevel:
+
+    """The previous `Level` implementation, used for comparison."""
+
+    def __init__(self, order, name, plural):
+        self.order = order
+        self.name = name
+        self.plural = plural
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __eq__(self, other):
+        if isinstance(other, NamedLevel):
+            return self.name == other.name
+        elif isinstance(other, str):
+            return self.name == other
+        else:
+            return False
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+
+class TestLevels(TestBase):
+
+    def test_levels(self):
+        self.assertIs(levels.level_from_str('error'), levels.ERROR)
+        self.assertIs(levels.level_from_str('error: internal compiler error'),
+                      levels.ERROR)
+        self.assertIs(levels.level_from_str(''), levels.NOTE)
+        self.assertLess(levels.ERROR, levels.WARNING)
+        self.assertEqual(sorted([levels.HELP, levels.NOTE, levels.ERROR,
+                                 levels.WARNING]),
+                         list(levels.ALL_LEVELS))
+        for i, level in enumerate(levels.ALL_LEVELS):
+            self.assertEqual(level, i)
+        self.assertEqual(str(levels.WARNING), 'warning')
+        self.assertEqual('%s: x' % (levels.WARNING,), 'warning: x')
+        self.assertEqual('{level}'.format(level=levels.HELP), 'help')
+
+    def test_message_counts(self):
+        window = sublime.active_window()
+        messages.clear_messages(window)
+        self.assertEqual(messages.message_counts(window), {})
+        batches = []
+        for level in (levels.ERROR, levels.WARNING, levels.WARNING):
+            msg = messages.Message()
+            msg.level = level
+            msg.path = os.path.join(plugin_path, 'tests', 'x.rs')
+            msg.span = ((len(batches), 0), (len(batches), 1))
+            msg.text = 'test'
+            batch = plugin.rust.batch.PrimaryBatch(msg)
+            batches.append(batch)
+        messages.store_rust_messages(window, batches, None, 'p')
+        self.assertEqual(messages.message_counts(window),
+                         {levels.ERROR: 1, levels.WARNING: 2})
+        messages.clear_messages(window, partitions=['p'])
+        self.assertEqual(messages.message_counts(window), {})
+
+    def test_matches_named_levels(self):
+        """The int-backed levels sort, compare and group the same way as the
+        previous implementation (which compared and hashed the names)."""
+        named = [NamedLevel(0, 'error', 'errors'),
+                 NamedLevel(1, 'warning', 'warnings'),
+                 NamedLevel(2, 'note', 'notes'),
+                 NamedLevel(3, 'help', 'help')]
+
+        def summarize(all_levels, error):
+            sample = list(reversed(all_levels)) * 2 + list(all_levels)
+            groups = {}
+            for level in sample:
+                groups.setdefault(level, []).append(level == error)
+            return ([level.name for level in sorted(sample)],
+                    sorted((level.name, matches)
+                           for level, matches in groups.items()))
+
+        self.assertEqual(summarize(levels.ALL_LEVELS, levels.ERROR),
+                         summarize(named, named[0]))
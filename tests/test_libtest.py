@@ -0,0 +1,139 @@
+"""Tests for parsing the output of the test harness."""
+
+import tempfile
+
+from rust_test_common import *
+
+multi_target_root = os.path.join(plugin_path, 'tests/multi-targets')
+
+
+class TestLibtest(TestBase):
+
+    def test_events(self):
+        run = libtest.TestRun()
+        run.on_output('     Running unittests src/lib.rs '
+                      '(target/debug/deps/mylib-0123456789abcdef)\n')
+        self.assertEqual(run.binary, 'mylib-0123456789abcdef')
+        events = [
+            {'type': 'suite', 'event': 'started', 'test_count': 3},
+            {'type': 'test', 'event': 'started', 'name': 'tests::a'},
+            {'type': 'test', 'event': 'ok', 'name': 'tests::a',
+             'exec_time': 0.5},
+            {'type': 'test', 'event': 'started', 'name': 'tests::b'},
+            {'type': 'test', 'event': 'timeout', 'name': 'tests::b'},
+            {'type': 'test', 'event': 'failed', 'name': 'tests::b',
+             'exec_time': '1.250s',
+             'stdout': "thread 'tests::b' panicked at 'boom', src/lib.rs:10:5\n"},
+            {'type': 'test', 'event': 'ignored', 'name': 'tests::c'},
+            {'type': 'suite', 'event': 'failed', 'passed': 1, 'failed': 1,
+             'ignored': 1, 'exec_time': 1.8},
+        ]
+        finished = [run.on_event(e) for e in events]
+        self.assertEqual([r.name for r in finished if r],
+                         ['tests::a', 'tests::b', 'tests::c'])
+        self.assertEqual([(r.outcome, r.exec_time) for r in run.results],
+                         [('ok', 0.5), ('failed', 1.25), ('ignored', None)])
+        self.assertEqual([r.name for r in run.failed()], ['tests::b'])
+        self.assertEqual(run.results[0].binary, 'mylib-0123456789abcdef')
+        self.assertEqual(len(run.suites), 1)
+
+    def test_text_failures(self):
+        run = libtest.TestRun()
+        for line in [
+            '     Running unittests src/lib.rs '
+            '(target/debug/deps/mylib-0123456789abcdef)\n',
+            'test tests::a ... ok\n',
+            'test tests::b ... FAILED\n',
+            '     Running tests/test1.rs '
+            '(target/debug/deps/test1-0123456789abcdef)\n',
+            'test it_fails ... FAILED\n',
+            '   Doc-tests mylib\n',
+            'test src/lib.rs - foo (line 3) ... FAILED\n',
+        ]:
+            run.on_output(line)
+        self.assertEqual(
+            [(r.name, r.source, r.binary, r.doc) for r in run.failed()],
+            [('tests::b', 'src/lib.rs', 'mylib-0123456789abcdef', False),
+             ('it_fails', 'tests/test1.rs', 'test1-0123456789abcdef', False),
+             ('src/lib.rs - foo (line 3)', None, None, True)])
+        # Older versions of Cargo do not show the source.
+        run = libtest.TestRun()
+        run.on_output('     Running target/debug/deps/mylib-0123456789abcdef\n')
+        self.assertEqual(run.binary, 'mylib-0123456789abcdef')
+        self.assertIsNone(run.source)
+
+    def test_failures_to_targets(self):
+        window = sublime.active_window()
+
+        def failures(*sources):
+            return [libtest.TestResult('t', None, 'failed', source=source,
+                                       doc=source == 'doc')
+                    for source in sources]
+
+        to_targets = plugin.cargo_build._failures_to_targets
+        self.assertEqual(
+            to_targets(window, multi_target_root,
+                       failures('src/lib.rs', 'tests/test1.rs',
+                                'src/lib.rs')),
+            ['--lib', '--test', 'test1'])
+        self.assertEqual(
+            to_targets(window, multi_target_root, failures('doc')),
+            ['--doc'])
+        # --doc cannot be combined with other targets.
+        self.assertIsNone(
+            to_targets(window, multi_target_root,
+                       failures('doc', 'src/lib.rs')))
+        # Unknown source.
+        self.assertIsNone(
+            to_targets(window, multi_target_root, failures(None)))
+
+    def test_panic_location(self):
+        self.assertEqual(libtest.panic_location(
+            "thread 'a' panicked at 'x, y', src/lib.rs:10:5\nnote: ..."),
+            ('src/lib.rs', 10, 5))
+        # Format used starting with Rust 1.73.
+        self.assertEqual(libtest.panic_location(
+            "thread 'a' panicked at tests/t.rs:3:9:\nassertion failed"),
+            ('tests/t.rs', 3, 9))
+        self.assertIsNone(libtest.panic_location('no panic here'))
+
+    def test_add_json_args(self):
+        cmd = ['cargo', 'test']
+        libtest.add_json_args(cmd)
+        self.assertEqual(cmd, ['cargo', 'test', '--'] + libtest.JSON_ARGS)
+        cmd = ['cargo', 'test', '--', '--exact', 'foo']
+        libtest.add_json_args(cmd)
+        self.assertEqual(cmd, ['cargo', 'test', '--', '--exact', 'foo'] +
+                         libtest.JSON_ARGS)
+
+    def test_history(self):
+        self.assertEqual(test_history.binary_stem('foo-0123456789abcdef'),
+                         'foo')
+        self.assertEqual(test_history.binary_stem('foo-bar'), 'foo-bar')
+        orig_path = test_history._history_path
+        orig_history = test_history._HISTORY
+        with tempfile.TemporaryDirectory() as tmp:
+            test_history._history_path = lambda: os.path.join(tmp, 'h.json')
+            test_history._HISTORY = None
+            try:
+                def make_run(times):
+                    run = libtest.TestRun()
+                    run.binary = 'mylib-0123456789abcdef'
+                    for name, t in times:
+                        run.on_event({'type': 'test', 'event': 'ok',
+                                      'name': name, 'exec_time': t})
+                    return run
+
+                test_history.record('/ws', make_run([('a', 0.1), ('b', 1.0)]))
+                test_history.record('/ws', make_run([('a', 0.5), ('b', 1.1)]))
+                # Reload from disk.
+                test_history._HISTORY = None
+                timings = test_history.timings(['/ws'])
+                self.assertEqual([(t.name, t.latest, t.regressed)
+                                  for t in timings],
+                                 [('a', 0.5, True), ('b', 1.1, False)])
+                self.assertEqual(timings[0].previous, 0.1)
+                self.assertEqual(timings[0].binary, 'mylib')
+            finally:
+                test_history._history_path = orig_path
+                test_history._HISTORY = orig_history
@@ -0,0 +1,62 @@
+"""Tests for the debug log."""
+
+import tempfile
+import time
+
+from rust_test_common import *
+
+log = plugin.rust.log
+
+
+class TestLog(TestBase):
+
+    def test_ring_buffer(self):
+        wlog = log.WindowLog(None, maxlen=3)
+        for i in range(5):
+            wlog.add_message('message %i', (i,), category='test')
+        self.assertEqual([m.text() for m in wlog.messages],
+                         ['message 2', 'message 3', 'message 4'])
+
+    def test_render(self):
+        wlog = log.WindowLog(None)
+        wlog.add_message('100%', (), category='cargo')
+        wlog.add_message('failed: %s', ('x',), log.CRITICAL, 'build')
+        first, second = wlog.messages
+        self.assertEqual(first.render(), '+0.000 [cargo] 100%\n')
+        self.assertTrue(second.render().endswith(
+            ' [build] CRITICAL failed: x\n'))
+        self.assertEqual(wlog.all_categories(), ['build', 'cargo'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'log.txt')
+            wlog.export(path)
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(' [cargo] 100%'))
+
+    def test_view(self):
+        window = sublime.active_window()
+        wlog = log.WindowLog(window.id())
+        wlog.add_message('before', (), category='a')
+        wlog.open_view(window)
+        try:
+            wlog.add_message('one', (), category='a')
+            wlog.add_message('two', (), category='b')
+            # Appended in a batch after a delay.
+            for _ in range(100):
+                text = wlog.view.substr(sublime.Region(0, wlog.view.size()))
+                if 'two' in text:
+                    break
+                time.sleep(0.01)
+            self.assertEqual([line.split(' ', 1)[1]
+                              for line in text.splitlines()],
+                             ['[a] before', '[a] one', '[b] two'])
+            wlog.categories = {'b'}
+            wlog.redraw()
+            time.sleep(0.5)
+            text = wlog.view.substr(sublime.Region(0, wlog.view.size()))
+            self.assertEqual(text.count('\n'), 1)
+            self.assertIn('[b] two', text)
+        finally:
+            wlog.view.set_scratch(True)
+            wlog.view.close()
@@ -0,0 +1,59 @@
+"""Tests for the package discovery index."""
+
+import os
+import tempfile
+
+from rust_test_common import *
+
+
+class TestPackageIndex(TestBase):
+
+    def test_package_index(self):
+        window = sublime.active_window()
+        folder = os.path.join(plugin_path, 'tests', 'workspace')
+        with tempfile.TemporaryDirectory() as tmp:
+            index = package_index.PackageIndex(os.path.join(tmp, 'index.json'))
+            probes = []
+            orig_probe = index._probe
+
+            def probe(window, manifests):
+                probes.append(sorted(manifests))
+                return orig_probe(window, manifests)
+
+            index._probe = probe
+            packages = index.packages(window, [folder])
+            self.assertEqual(sorted(packages),
+                [os.path.join(folder, 'workspace1'),
+                 os.path.join(folder, 'workspace2')])
+            # The whole workspace is loaded with one Cargo run.
+            self.assertEqual(len(probes), 1)
+            self.assertEqual(len(probes[0]), 1)
+
+            # Nothing changed, Cargo is not run.
+            index.packages(window, [folder])
+            self.assertEqual(len(probes), 1)
+
+            # Loaded from disk.
+            index2 = package_index.PackageIndex(index.path)
+            index2._probe = probe
+            self.assertEqual(index2.packages(window, [folder]), packages)
+            self.assertEqual(len(probes), 1)
+
+            # Changing a manifest reloads the workspace.
+            manifest = os.path.join(folder, 'workspace1', 'Cargo.toml')
+            st = os.stat(manifest)
+            os.utime(manifest, (st.st_atime, st.st_mtime + 10))
+            try:
+                index2.packages(window, [folder])
+                self.assertEqual(len(probes), 2)
+            finally:
+                os.utime(manifest, (st.st_atime, st.st_mtime))
+
+    def test_find_manifests(self):
+        window = sublime.active_window()
+        folder = os.path.join(plugin_path, 'tests', 'multi-targets')
+        manifests = package_index.find_manifests(window, [folder])
+        self.assertIn(os.path.join(folder, 'Cargo.toml'), manifests)
+        self.assertIn(os.path.join(folder, 'pmacro', 'Cargo.toml'), manifests)
+        self.assertFalse([m for m in manifests
+                          if os.sep + 'target' + os.sep in m])
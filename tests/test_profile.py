@@ -0,0 +1,54 @@
+"""Tests for the profiling timers."""
+
+from rust_test_common import *
+
+
+class TestProfile(TestBase):
+
+    def setUp(self):
+        super(TestProfile, self).setUp()
+        self._orig_enabled = profile.ENABLED
+        self._orig_stats = dict(profile.STATS)
+        profile.reset()
+
+    def tearDown(self):
+        profile.ENABLED = self._orig_enabled
+        profile.reset()
+        profile.STATS.update(self._orig_stats)
+        super(TestProfile, self).tearDown()
+
+    def test_disabled(self):
+        profile.ENABLED = False
+
+        @profile.timed('f')
+        def f(x):
+            return x + 1
+
+        self.assertEqual(f(1), 2)
+        with profile.timer('g'):
+            pass
+        profile.record('h', 1.0)
+        self.assertEqual(profile.STATS, {})
+
+    def test_enabled(self):
+        profile.ENABLED = True
+
+        @profile.timed('f')
+        def f():
+            raise ValueError()
+
+        self.assertRaises(ValueError, f)
+        self.assertRaises(ValueError, f)
+        with profile.timer('g'):
+            pass
+        profile.record('h', 0.05)
+        profile.record('h', 20.0)
+        self.assertEqual(profile.STATS['f'].count, 2)
+        self.assertEqual(profile.STATS['g'].count, 1)
+        h = profile.STATS['h']
+        self.assertEqual((h.count, h.total, h.max), (2, 20.05, 20.0))
+        self.assertEqual(h.histogram, [0, 0, 0, 1, 0, 0, 1])
+        report = profile.report().splitlines()
+        self.assertEqual(len(report), 4)
+        # Sorted by total time.
+        self.assertTrue(report[1].startswith('h '))
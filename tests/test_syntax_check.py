@@ -157,6 +157,42 @@ class TestSyntaxCheck(TestBase):
         for path in to_test:
             self._with_open_file(path, self._test_messages, setups=setups)
 
+    def test_partitions(self):
+        """Checking a target should only replace the messages from that
+        target."""
+        window = sublime.active_window()
+        lib_path = os.path.join(plugin_path, 'tests/multi-targets/src/lib.rs')
+        helpers_path = os.path.join(plugin_path,
+            'tests/multi-targets/tests/common/helpers.rs')
+
+        def lib_batches():
+            return messages.WINDOW_MESSAGES[window.id()]['paths'][lib_path]
+
+        def check_lib(view):
+            self._cargo_clean(view)
+            self._syntax_check(view)
+            self.assertTrue(messages.has_message_for_path(window, lib_path))
+            before = lib_batches()[:]
+            # Checking again should retain the unchanged messages (same
+            # batch objects), not duplicate them.
+            self._syntax_check(view)
+            self.assertEqual(lib_batches(), before)
+
+        def check_test(view):
+            self._syntax_check(view)
+            self.assertTrue(messages.has_message_for_path(window, helpers_path))
+            # Messages from --lib are retained.
+            self.assertTrue(messages.has_message_for_path(window, lib_path))
+
+        self._with_open_file('tests/multi-targets/src/lib.rs', check_lib)
+        self._with_open_file('tests/multi-targets/tests/test1.rs', check_test)
+
+    def _syntax_check(self, view):
+        e = plugin.SyntaxCheckPlugin.RustSyntaxCheckEvent()
+        e.on_post_save(view)
+        # Wait for it to finish.
+        self._get_rust_thread().join()
+
     def _test_messages(self, view, setups=None, extra_paths=()):
         self._override_setting('rust_message_theme', 'test')
         # Don't insert <br> tags during tests.
@@ -232,7 +268,7 @@ class TestSyntaxCheck(TestBase):
                     else:
                         actual_text = msg.text
                     if check_actual_text(emsg_info['message'], actual_text):
-                        self.assertEqual(emsg_info['level'], msg.level,
+                        self.assertEqual(emsg_info['level'], str(msg.level),
                             'Level mismatch. Expected:\n%s\nGot:\n%s' % (emsg_info, msg))
                         break
             else: